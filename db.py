@@ -4,9 +4,300 @@ Supports SQLite, PostgreSQL, and JSON file storage
 """
 import json
 import os
+import re
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
 
+try:
+    from pypinyin import lazy_pinyin, Style  # Optional: pinyin search keys for Chinese names
+except ImportError:
+    lazy_pinyin = None
+
+# Channel columns in the order used by SELECT and INSERT statements
+CHANNEL_COLUMNS = [
+    'ip', 'name', 'logo', 'tvg_id', 'url', 'screenshot', 'resolution', 'test_status',
+    'playback', 'catchup', 'connectivity', 'timestamp', 'ttfb_ms', 'ttff_ms',
+    'width', 'height', 'resolution_tier', 'name_pinyin', 'name_initials'
+]
+
+# Columns derived from 'resolution' on every write
+CHANNEL_DERIVED_COLUMNS = ['width', 'height', 'resolution_tier']
+
+# Pinyin search keys derived from 'name' on every write
+CHANNEL_SEARCH_COLUMNS = ['name_pinyin', 'name_initials']
+
+# SET clause shared by the channel upserts of both backends
+CHANNEL_UPSERT_SET = ', '.join(f'{column} = EXCLUDED.{column}' for column in CHANNEL_COLUMNS[1:])
+
+# Columns added to the channels table after the initial schema: (name, definition)
+CHANNEL_MIGRATION_COLUMNS = [
+    ('ttfb_ms', 'INTEGER'),
+    ('ttff_ms', 'INTEGER'),
+    ('width', 'INTEGER'),
+    ('height', 'INTEGER'),
+    ('resolution_tier', "TEXT DEFAULT 'unknown'"),
+    ('name_pinyin', 'TEXT'),
+    ('name_initials', 'TEXT'),
+]
+
+# Per-target test result columns in the order used by SELECT and INSERT statements
+RESULT_ITEM_COLUMNS = [
+    'ip', 'url', 'status', 'error', 'resolution', 'screenshot', 'note', 'timestamp', 'ttfb_ms', 'ttff_ms'
+]
+
+# Test metadata columns of the test_results table
+TEST_COLUMNS = ['test_id', 'base_url', 'start_ip', 'end_ip', 'status', 'start_time', 'end_time']
+
+# Bound parameters per IN (...) query, below SQLite's default variable limit
+LOOKUP_CHUNK_SIZE = 500
+
+# SQLite connection tuning
+SQLITE_BUSY_TIMEOUT_MS = 5000  # Wait this long for a lock held by another connection
+SQLITE_CACHE_SIZE_KB = 16384  # Page cache per connection
+SQLITE_POOL_SIZE = 8  # Idle SQLite connections kept open for reuse by any thread
+
+# PostgreSQL pool size defaults, overridable via database.postgresql.pool_min/pool_max
+PG_POOL_MIN = 1
+PG_POOL_MAX = 20
+PG_POOL_WAIT_SECONDS = 30  # Give up waiting for a free pooled connection after this long
+PG_BULK_PAGE_SIZE = 1000  # Rows per multi-row statement in bulk writes
+
+# Write-behind queue defaults
+WRITE_BATCH_SIZE = 500  # Commit once this many writes are pending
+WRITE_MAX_LATENCY = 0.2  # Or once the oldest pending write is this many seconds old
+
+
+def parse_resolution(resolution: Optional[str]) -> tuple:
+    """Parse a 'WIDTHxHEIGHT' resolution string into typed values
+
+    Returns:
+        tuple: (width, height, tier) where tier is '4k', '1080', '720', 'other'
+               or 'unknown'; width and height are None when unknown
+    """
+    try:
+        width_str, height_str = (resolution or '').split('x')
+        width = int(width_str)
+        height = int(height_str)
+    except ValueError:
+        return None, None, 'unknown'
+
+    if width >= 3840:
+        tier = '4k'
+    elif width >= 1920:
+        tier = '1080'
+    elif (width == 720 and height == 576) or width >= 1280:
+        tier = '720'
+    else:
+        tier = 'other'
+    return width, height, tier
+
+
+@lru_cache(maxsize=65536)
+def pinyin_keys(name: str) -> tuple:
+    """Pinyin full spelling and initials of a name (e.g., 湖南卫视 -> hunanweishi, hnws)
+
+    Returns:
+        tuple: Lowercase spellings without spaces, empty for names without
+            Chinese characters or when pypinyin is not installed
+    """
+    if lazy_pinyin is None or not re.search(r'[\u4e00-\u9fff]', name):
+        return ()
+    full = ''.join(lazy_pinyin(name)).replace(' ', '').lower()
+    initials = ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER)).replace(' ', '').lower()
+    return (full, initials)
+
+
+def name_search_values(name: Optional[str]) -> tuple:
+    """Values of CHANNEL_SEARCH_COLUMNS for a channel name
+
+    Returns:
+        tuple: (full spelling, initials), empty strings for names without Chinese
+               characters; None while pypinyin is missing, so a later start with
+               pypinyin installed fills them in
+    """
+    name = (name or '').lower()
+    if not re.search(r'[\u4e00-\u9fff]', name):
+        return '', ''
+    return pinyin_keys(name) or (None, None)
+
+
+def channel_values(ip: str, channel: Dict[str, Any]) -> tuple:
+    """Build an INSERT parameter tuple in CHANNEL_COLUMNS order, deriving the typed resolution and search columns"""
+    width, height, tier = parse_resolution(channel.get('resolution'))
+    return (
+        ip,
+        channel.get('name', ''),
+        channel.get('logo', ''),
+        channel.get('tvg_id', ''),
+        channel.get('url', ''),
+        channel.get('screenshot', ''),
+        channel.get('resolution', ''),
+        channel.get('test_status', ''),
+        channel.get('playback', ''),
+        channel.get('catchup', ''),
+        channel.get('connectivity', 'untested'),
+        channel.get('timestamp', ''),
+        channel.get('ttfb_ms'),
+        channel.get('ttff_ms'),
+        width,
+        height,
+        tier,
+        *name_search_values(channel.get('name'))
+    )
+
+
+def channel_from_row(row) -> Dict[str, Any]:
+    """Build a channel dict from a row selected with CHANNEL_COLUMNS, without the IP"""
+    return {
+        'name': row[1] or '',
+        'logo': row[2] or '',
+        'tvg_id': row[3] or '',
+        'url': row[4] or '',
+        'screenshot': row[5] or '',
+        'resolution': row[6] or '',
+        'test_status': row[7] or '',
+        'playback': row[8] or '',
+        'catchup': row[9] or '',
+        'connectivity': row[10] or 'untested',
+        'timestamp': row[11] or '',
+        'ttfb_ms': row[12],
+        'ttff_ms': row[13],
+        'width': row[14],
+        'height': row[15],
+        'resolution_tier': row[16] or 'unknown',
+        'groups': []
+    }
+
+
+def channel_query_where(filters: Dict[str, Any], placeholder: str) -> tuple:
+    """Build the WHERE clause for a channel listing query
+
+    Args:
+        filters: group, resolution, connectivity, search and max_latency
+                 ('all' or missing = no filter)
+        placeholder: Parameter placeholder of the backend ('?' or '%s')
+
+    Returns:
+        tuple: (WHERE clause or empty string, parameter list)
+    """
+    clauses = []
+    params = []
+
+    group = filters.get('group', 'all')
+    if group == 'ungrouped':
+        clauses.append('ip NOT IN (SELECT channel_ip FROM channel_groups)')
+    elif group != 'all':
+        clauses.append(f'ip IN (SELECT channel_ip FROM channel_groups WHERE group_id = {placeholder})')
+        params.append(group)
+
+    if filters.get('connectivity', 'all') != 'all':
+        clauses.append(f'connectivity = {placeholder}')
+        params.append(filters['connectivity'])
+
+    if filters.get('resolution', 'all') != 'all':
+        clauses.append(f'resolution_tier = {placeholder}')
+        params.append(filters['resolution'])
+
+    search = filters.get('search', '')
+    if search:
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        # Same keys as the in-memory search index: name, IP, tvg_id and pinyin
+        keys = ['ip', 'LOWER(name)', 'LOWER(tvg_id)'] + CHANNEL_SEARCH_COLUMNS
+        clauses.append('(' + ' OR '.join(f"{key} LIKE {placeholder} ESCAPE '\\'" for key in keys) + ')')
+        params.extend([pattern] * len(keys))
+
+    if filters.get('max_latency') is not None:
+        clauses.append(f'ttff_ms <= {placeholder}')
+        params.append(filters['max_latency'])
+
+    where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    return where, params
+
+
+# Group memberships joined to listing queries, which group by channels.ip; only the
+# sort order of groups is selected, so channel columns stay unambiguous
+CHANNEL_GROUP_ORDER_JOIN = (
+    ' LEFT JOIN channel_groups ON channel_groups.channel_ip = channels.ip'
+    ' LEFT JOIN (SELECT id, sort_order FROM groups) member_group ON member_group.id = channel_groups.group_id'
+)
+
+
+def channel_query_order(sort_by: str = '') -> str:
+    """ORDER BY expression matching the channel list order
+
+    Group order, then resolution (highest first), then name (empty last) and
+    failed tests last. Names compare as plain lowercase text, without the
+    natural number ordering of the in-memory sort. The query must include
+    CHANNEL_GROUP_ORDER_JOIN and GROUP BY channels.ip.
+    """
+    order = [
+        'COALESCE(MIN(member_group.sort_order), 9999)',
+        'COALESCE(width, 0) DESC',
+        "CASE WHEN COALESCE(TRIM(name), '') = '' THEN 1 ELSE 0 END",
+        'LOWER(name)',
+        "CASE WHEN test_status = 'failed' THEN 1 ELSE 0 END",
+        'ip'
+    ]
+    if sort_by == 'latency':
+        order = ['CASE WHEN ttff_ms IS NULL THEN 1 ELSE 0 END', 'ttff_ms'] + order
+    return ', '.join(order)
+
+
+def result_item_values(test_id: str, ip: str, result: Dict[str, Any]) -> tuple:
+    """Build an INSERT parameter tuple for one target of a test"""
+    return (test_id, ip) + tuple(result.get(column) for column in RESULT_ITEM_COLUMNS[1:])
+
+
+def result_item_from_row(row) -> Dict[str, Any]:
+    """Build a per-IP result dict from a row selected with RESULT_ITEM_COLUMNS"""
+    result = dict(zip(RESULT_ITEM_COLUMNS, row))
+    # Optional keys are only present on results that carry them
+    for column in ('resolution', 'note'):
+        if not result[column]:
+            del result[column]
+    return result
+
+
+def test_from_row(row) -> Dict[str, Any]:
+    """Build test metadata from a row selected with TEST_COLUMNS, without the test ID"""
+    return {
+        'base_url': row[1],
+        'start_ip': row[2],
+        'end_ip': row[3],
+        'status': row[4],
+        'start_time': row[5],
+        'end_time': row[6]
+    }
+
+
+class CheckoutStats:
+    """Thread-safe counters for connection checkout times"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'checkouts': self.count,
+                'avg_checkout_ms': round(self.total_ms / self.count, 3) if self.count else 0,
+                'max_checkout_ms': round(self.max_ms, 3)
+            }
+
 
 class Database:
     """Abstract database interface"""
@@ -25,6 +316,214 @@ class Database:
         return getattr(self.db, name)
 
 
+class DatabaseWriter:
+    """Single background writer that applies queued writes to a database
+
+    Writes are queued as intents and applied in order by one thread, so
+    callers never contend for database locks. A later intent with the same
+    key replaces a pending one, channel and per-IP result upserts pending
+    together are written in one call per table (and test), and a batch is
+    committed once it reaches WRITE_BATCH_SIZE intents or its oldest intent
+    is WRITE_MAX_LATENCY old.
+
+    A merged row upsert keeps the position of the intent it replaces, so
+    intents queued after it (such as group memberships referencing the
+    channel) still find the row written. Other merged intents (deletes and
+    full rewrites) move to the end, after everything queued before them.
+    A row upsert never replaces a pending delete of the row: the delete
+    runs first, so the row's stale memberships and results are removed.
+    """
+
+    def __init__(self, database, batch_size: int = WRITE_BATCH_SIZE, max_latency: float = WRITE_MAX_LATENCY):
+        self.db = database
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+
+        self.condition = threading.Condition()
+        self.pending = {}  # Merge key -> (kind, func, args); dicts keep insertion order
+        self.oldest = None  # Enqueue time of the oldest pending intent
+        self.submitted = 0  # Sequence number of the last submitted intent
+        self.written = 0  # Sequence number covered by the last finished batch
+        self.urgent = False  # A flush barrier is waiting
+        self.counter = 0  # For unique keys of intents that must not be merged
+
+        self.stats = {
+            'batches': 0,
+            'writes': 0,
+            'merged': 0,
+            'errors': 0,
+            'last_commit_ms': 0,
+            'max_commit_ms': 0,
+            'total_commit_ms': 0
+        }
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _enqueue(self, key, kind: str, func, args):
+        with self.condition:
+            if key is None:
+                self.counter += 1
+                key = ('unique', self.counter)
+            elif kind != 'call' and key in self.pending and self.pending[key][0] == 'call':
+                # A row upsert after a pending delete of that row: keep the delete and
+                # queue the upsert behind it, where further upserts of the row merge
+                key = (*key, 'after')
+            elif kind == 'call':
+                # Like a pending upsert under its key, one queued behind a delete is superseded
+                self.pending.pop((*key, 'after'), None)
+            if key in self.pending:
+                if kind == 'call' or self.pending[key][0] != kind:
+                    # Drop the superseded intent and requeue at the end to keep ordering
+                    del self.pending[key]
+                self.stats['merged'] += 1
+            self.pending[key] = (kind, func, args)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            self.submitted += 1
+            self.condition.notify_all()
+
+    def submit(self, func, *args, key=None):
+        """Queue a call to a database write method
+
+        Args:
+            func: Bound database method to call
+            key: Optional merge key; a later intent with the same key replaces this one
+        """
+        self._enqueue(key, 'call', func, args)
+
+    def save_channels(self, channels: Dict[str, Any], on_error=None):
+        """Queue channel upserts, one mergeable intent per channel
+
+        Args:
+            channels: Channel records keyed by IP
+            on_error: Called from the writer thread with the list of IPs
+                      whose upsert failed, so the caller can retry them
+        """
+        for ip, channel in channels.items():
+            self._enqueue(('channel', ip), 'channel', ip, (channel, on_error))
+
+    def save_results(self, results: Dict[str, Any]):
+        """Queue a full rewrite of test results, replacing any pending one"""
+        self.submit(self.db.save_results, results, key=('results',))
+
+    def save_test(self, test_id: str, data: Dict[str, Any]):
+        """Queue a test metadata upsert, replacing any pending one for the test"""
+        self.submit(self.db.save_test, test_id, data, key=('test', test_id))
+
+    def save_result_item(self, test_id: str, ip: str, result: Dict[str, Any]):
+        """Queue an upsert of one target's result within a test"""
+        self._enqueue(('result', test_id, ip), 'result', (test_id, ip), (result,))
+
+    def save_groups(self, groups: Dict[str, Any]):
+        """Queue a full rewrite of groups, replacing any pending one"""
+        self.submit(self.db.save_groups, groups, key=('groups',))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every write queued before this call has been applied
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        if threading.current_thread() is self.thread:
+            return True
+        with self.condition:
+            target = self.submitted
+            if self.written >= target:
+                return True
+            self.urgent = True
+            self.condition.notify_all()
+            return self.condition.wait_for(lambda: self.written >= target, timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.condition:
+            stats = dict(self.stats)
+            stats['queue_depth'] = len(self.pending)
+            stats['avg_commit_ms'] = round(stats.pop('total_commit_ms') / stats['batches'], 3) if stats['batches'] else 0
+            return stats
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending)
+                # Give more writes a chance to arrive, unless the batch is full or someone waits
+                while len(self.pending) < self.batch_size and not self.urgent:
+                    remaining = self.max_latency - (time.monotonic() - self.oldest)
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = list(self.pending.values())
+                self.pending = {}
+                self.oldest = None
+                self.urgent = False
+                target = self.submitted
+
+            started = time.perf_counter()
+            self._apply(batch)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            with self.condition:
+                self.written = target
+                self.stats['batches'] += 1
+                self.stats['writes'] += len(batch)
+                self.stats['last_commit_ms'] = round(elapsed_ms, 3)
+                self.stats['max_commit_ms'] = round(max(self.stats['max_commit_ms'], elapsed_ms), 3)
+                self.stats['total_commit_ms'] += elapsed_ms
+                self.condition.notify_all()
+
+    def _apply(self, batch):
+        """Apply a batch in order, folding runs of row upserts into one transaction each"""
+        channels = {}
+        items = {}  # Test ID -> {ip: result}
+
+        def write_rows():
+            if channels:
+                if not self._call(self.db.save_channels, {ip: channel for ip, (channel, _) in channels.items()}):
+                    self._report_failed_channels(channels)
+                channels.clear()
+            for test_id, results in items.items():
+                self._call(self.db.save_result_items, test_id, results)
+            items.clear()
+
+        for kind, func, args in batch:
+            if kind == 'channel':
+                channels[func] = args
+            elif kind == 'result':
+                test_id, ip = func
+                items.setdefault(test_id, {})[ip] = args[0]
+            else:
+                write_rows()
+                self._call(func, *args)
+        write_rows()
+
+    def _call(self, func, *args) -> bool:
+        """Call a database method, counting and logging a failure
+
+        Returns:
+            bool: True if the call succeeded
+        """
+        try:
+            func(*args)
+            return True
+        except Exception as e:
+            with self.condition:
+                self.stats['errors'] += 1
+            print(f"[DatabaseWriter] Error in {getattr(func, '__name__', func)}: {str(e)}")
+            return False
+
+    def _report_failed_channels(self, channels):
+        """Hand the IPs of a failed channel upsert back to their on_error callbacks"""
+        failed = {}
+        for ip, (_, on_error) in channels.items():
+            if on_error is not None:
+                failed.setdefault(on_error, []).append(ip)
+        for on_error, ips in failed.items():
+            try:
+                on_error(ips)
+            except Exception as e:
+                print(f"[DatabaseWriter] Error reporting failed channels: {str(e)}")
+
+
 class SQLiteDatabase:
     """SQLite database storage"""
 
@@ -35,408 +534,678 @@ class SQLiteDatabase:
         # Create config directory if not exists
         os.makedirs(os.path.dirname(self.db_path) if os.path.dirname(self.db_path) else '.', exist_ok=True)
 
+        # Idle connections shared by all threads; Flask serves each request on a new thread
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        self._stats = CheckoutStats()
+        self._connections_opened = 0
+
         self._init_database()
 
     def _init_database(self):
         """Initialize database schema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        # Create tables
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS channels (
-                ip TEXT PRIMARY KEY,
-                name TEXT DEFAULT '',
-                logo TEXT DEFAULT '',
-                tvg_id TEXT DEFAULT '',
-                url TEXT DEFAULT '',
-                screenshot TEXT DEFAULT '',
-                resolution TEXT DEFAULT '',
-                test_status TEXT DEFAULT 'success',
-                playback TEXT DEFAULT '',
-                catchup TEXT DEFAULT '',
-                connectivity TEXT DEFAULT 'untested',
-                timestamp TEXT DEFAULT ''
-            )
-        ''')
+            # WAL lets readers proceed while a writer commits; the mode is persistent
+            cursor.execute('PRAGMA journal_mode=WAL')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS groups (
-                id TEXT PRIMARY KEY,
-                name TEXT,
-                sort_order INTEGER
-            )
-        ''')
+            # Create tables
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS channels (
+                    ip TEXT PRIMARY KEY,
+                    name TEXT DEFAULT '',
+                    logo TEXT DEFAULT '',
+                    tvg_id TEXT DEFAULT '',
+                    url TEXT DEFAULT '',
+                    screenshot TEXT DEFAULT '',
+                    resolution TEXT DEFAULT '',
+                    test_status TEXT DEFAULT 'success',
+                    playback TEXT DEFAULT '',
+                    catchup TEXT DEFAULT '',
+                    connectivity TEXT DEFAULT 'untested',
+                    timestamp TEXT DEFAULT '',
+                    ttfb_ms INTEGER,
+                    ttff_ms INTEGER,
+                    width INTEGER,
+                    height INTEGER,
+                    resolution_tier TEXT DEFAULT 'unknown',
+                    name_pinyin TEXT,
+                    name_initials TEXT
+                )
+            ''')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS channel_groups (
-                channel_ip TEXT,
-                group_id TEXT,
-                PRIMARY KEY (channel_ip, group_id),
-                FOREIGN KEY (channel_ip) REFERENCES channels(ip) ON DELETE CASCADE,
-                FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
-            )
-        ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS groups (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    sort_order INTEGER
+                )
+            ''')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS test_results (
-                test_id TEXT PRIMARY KEY,
-                base_url TEXT,
-                start_ip TEXT,
-                end_ip TEXT,
-                status TEXT,
-                start_time TEXT,
-                end_time TEXT,
-                results TEXT
-            )
-        ''')
-
-        # Create indexes
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_test_status ON channels(test_status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_resolution ON channels(resolution)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_groups_sort_order ON groups(sort_order)')
-
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS channel_groups (
+                    channel_ip TEXT,
+                    group_id TEXT,
+                    PRIMARY KEY (channel_ip, group_id),
+                    FOREIGN KEY (channel_ip) REFERENCES channels(ip) ON DELETE CASCADE,
+                    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS test_results (
+                    test_id TEXT PRIMARY KEY,
+                    base_url TEXT,
+                    start_ip TEXT,
+                    end_ip TEXT,
+                    status TEXT,
+                    start_time TEXT,
+                    end_time TEXT,
+                    results TEXT
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS test_result_items (
+                    test_id TEXT,
+                    ip TEXT,
+                    url TEXT,
+                    status TEXT,
+                    error TEXT,
+                    resolution TEXT,
+                    screenshot TEXT,
+                    note TEXT,
+                    timestamp TEXT,
+                    ttfb_ms INTEGER,
+                    ttff_ms INTEGER,
+                    PRIMARY KEY (test_id, ip)
+                )
+            ''')
+
+            # Add columns introduced after the initial schema
+            cursor.execute('PRAGMA table_info(channels)')
+            existing_columns = {row[1] for row in cursor.fetchall()}
+            for column, definition in CHANNEL_MIGRATION_COLUMNS:
+                if column not in existing_columns:
+                    cursor.execute(f'ALTER TABLE channels ADD COLUMN {column} {definition}')
+
+            # Create indexes
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_test_status ON channels(test_status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_resolution ON channels(resolution)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_resolution_tier ON channels(resolution_tier)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_connectivity ON channels(connectivity)')
+
+            # Fill the typed resolution columns of rows written before they existed
+            cursor.execute("SELECT ip, resolution FROM channels WHERE width IS NULL AND resolution != ''")
+            for ip, resolution in cursor.fetchall():
+                width, height, tier = parse_resolution(resolution)
+                cursor.execute('UPDATE channels SET width = ?, height = ?, resolution_tier = ? WHERE ip = ?',
+                               (width, height, tier, ip))
+
+            # Fill the pinyin search columns of rows written before they existed or without pypinyin
+            cursor.execute('SELECT ip, name FROM channels WHERE name_pinyin IS NULL')
+            for ip, name in cursor.fetchall():
+                search_values = name_search_values(name)
+                if search_values[0] is not None:
+                    cursor.execute('UPDATE channels SET name_pinyin = ?, name_initials = ? WHERE ip = ?',
+                                   (*search_values, ip))
+
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_groups_sort_order ON groups(sort_order)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channel_groups_group_id ON channel_groups(group_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_result_items_status ON test_result_items(test_id, status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_results_start_time ON test_results(start_time)')
+
+            # Move per-IP results out of the legacy JSON column into test_result_items
+            cursor.execute("SELECT test_id, results FROM test_results WHERE results IS NOT NULL AND results != ''")
+            for test_id, blob in cursor.fetchall():
+                self._insert_result_items(cursor, test_id, json.loads(blob))
+                cursor.execute('UPDATE test_results SET results = NULL WHERE test_id = ?', (test_id,))
+
+            conn.commit()
+
+    @contextmanager
+    def _connection(self):
+        """Check out a connection for one operation and always hand it back
+
+        A transaction left open, by an error or by reads, is rolled back.
+        """
+        conn = self._get_connection()
+        try:
+            yield conn
+        finally:
+            self._release_connection(conn)
 
     def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+        """Check out an idle connection, opening and tuning a new one if there is none"""
+        started = time.perf_counter()
+        with self._idle_lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            # Used by one thread at a time, but not always the one that opened it
+            conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+            conn.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+            with self._idle_lock:
+                self._connections_opened += 1
+        self._stats.record(started)
+        return conn
+
+    def _release_connection(self, conn):
+        """Return a connection to the idle pool, closing it if the pool is full or it broke"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._idle_lock:
+            if len(self._idle) < SQLITE_POOL_SIZE:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        stats = self._stats.snapshot()
+        stats['type'] = 'sqlite'
+        stats['connections_opened'] = self._connections_opened
+        return stats
 
     # Channels
     def get_all_channels(self) -> Dict[str, Any]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('SELECT * FROM channels')
-        rows = cursor.fetchall()
+            cursor.execute(f"SELECT {', '.join(CHANNEL_COLUMNS)} FROM channels")
+            rows = cursor.fetchall()
 
-        channels = {}
-        for row in rows:
-            ip = row[0]
-            channels[ip] = {
-                'name': row[1] or '',
-                'logo': row[2] or '',
-                'tvg_id': row[3] or '',
-                'url': row[4] or '',
-                'screenshot': row[5] or '',
-                'resolution': row[6] or '',
-                'test_status': row[7] or '',
-                'playback': row[8] or '',
-                'catchup': row[9] or '',
-                'connectivity': row[10] or 'untested',
-                'timestamp': row[11] or ''
-            }
+            channels = {row[0]: channel_from_row(row) for row in rows}
 
-            # Get channel groups
+            # Attach group memberships with a single query instead of one per channel
             cursor.execute('''
-                SELECT g.id, g.name FROM groups g
-                JOIN channel_groups cg ON g.id = cg.group_id
-                WHERE cg.channel_ip = ?
-            ''', (ip,))
-            groups = cursor.fetchall()
-            channels[ip]['groups'] = [{'id': g[0], 'name': g[1]} for g in groups]
+                SELECT cg.channel_ip, g.id, g.name FROM channel_groups cg
+                JOIN groups g ON g.id = cg.group_id
+                ORDER BY g.sort_order
+            ''')
+            for channel_ip, group_id, group_name in cursor.fetchall():
+                if channel_ip in channels:
+                    channels[channel_ip]['groups'].append({'id': group_id, 'name': group_name})
 
-        conn.close()
         return channels
 
     def save_channels(self, channels: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        # Use UPSERT to avoid deleting channel_groups relationships
-        # Only update/insert channels, don't touch channel_groups table
-        for ip, channel in channels.items():
-            cursor.execute('''
-                INSERT INTO channels
-                (ip, name, logo, tvg_id, url, screenshot, resolution, test_status, playback, catchup, connectivity, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(ip) DO UPDATE SET
-                    name = excluded.name,
-                    logo = excluded.logo,
-                    tvg_id = excluded.tvg_id,
-                    url = excluded.url,
-                    screenshot = excluded.screenshot,
-                    resolution = excluded.resolution,
-                    test_status = excluded.test_status,
-                    playback = excluded.playback,
-                    catchup = excluded.catchup,
-                    connectivity = excluded.connectivity,
-                    timestamp = excluded.timestamp
-            ''', (
-                ip,
-                channel.get('name', ''),
-                channel.get('logo', ''),
-                channel.get('tvg_id', ''),
-                channel.get('url', ''),
-                channel.get('screenshot', ''),
-                channel.get('resolution', ''),
-                channel.get('test_status', ''),
-                channel.get('playback', ''),
-                channel.get('catchup', ''),
-                channel.get('connectivity', 'untested'),
-                channel.get('timestamp', '')
-            ))
-
-        conn.commit()
-        conn.close()
+            # Use UPSERT to avoid deleting channel_groups relationships
+            # Only update/insert channels, don't touch channel_groups table
+            cursor.executemany(f'''
+                INSERT INTO channels ({', '.join(CHANNEL_COLUMNS)})
+                VALUES ({', '.join(['?'] * len(CHANNEL_COLUMNS))})
+                ON CONFLICT(ip) DO UPDATE SET {CHANNEL_UPSERT_SET}
+            ''', [channel_values(ip, channel) for ip, channel in channels.items()])
+
+            conn.commit()
 
     def get_channel(self, ip: str) -> Optional[Dict[str, Any]]:
-        channels = self.get_all_channels()
-        return channels.get(ip)
+        return self.get_channels([ip]).get(ip)
+
+    def get_channels(self, ips: List[str]) -> Dict[str, Any]:
+        """Get several channels with their groups by IP"""
+        with self._connection() as conn:
+            return self._fetch_channels(conn.cursor(), list(dict.fromkeys(ips)))
+
+    def _fetch_channels(self, cursor, ips: List[str]) -> Dict[str, Any]:
+        """Select channels with their groups by IP"""
+        channels = {}
+        for start in range(0, len(ips), LOOKUP_CHUNK_SIZE):
+            chunk = ips[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(f"SELECT {', '.join(CHANNEL_COLUMNS)} FROM channels WHERE ip IN ({placeholders})", chunk)
+            for row in cursor.fetchall():
+                channels[row[0]] = channel_from_row(row)
+        self._attach_groups(cursor, channels)
+        return channels
+
+    def _attach_groups(self, cursor, channels: Dict[str, Any]):
+        """Fill the 'groups' list of channels fetched by IP"""
+        ips = list(channels)
+        for start in range(0, len(ips), LOOKUP_CHUNK_SIZE):
+            chunk = ips[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(f'''
+                SELECT cg.channel_ip, g.id, g.name FROM channel_groups cg
+                JOIN groups g ON g.id = cg.group_id
+                WHERE cg.channel_ip IN ({placeholders})
+                ORDER BY g.sort_order
+            ''', chunk)
+            for channel_ip, group_id, group_name in cursor.fetchall():
+                channels[channel_ip]['groups'].append({'id': group_id, 'name': group_name})
+
+    def query_channels(self, filters: Dict[str, Any], sort_by: str = '',
+                       limit: Optional[int] = None, offset: int = 0, count: bool = True) -> tuple:
+        """Filter, order and page channels in the database
+
+        Args:
+            count: Also count all matching channels (skip when the caller knows the total)
+
+        Returns:
+            tuple: (number of matching channels or None, list of (ip, channel) in list order)
+        """
+        where, params = channel_query_where(filters, '?')
+        # A page is ordered on the IPs alone and its rows fetched afterwards,
+        # so the sort does not carry every matching row in full
+        columns = 'channels.ip' if limit is not None else ', '.join(f'channels.{column}' for column in CHANNEL_COLUMNS)
+        query = (f"SELECT {columns} FROM channels{CHANNEL_GROUP_ORDER_JOIN}{where} "
+                 f"GROUP BY channels.ip ORDER BY {channel_query_order(sort_by)}")
+        page_params = list(params)
+        if limit is not None:
+            query += ' LIMIT ? OFFSET ?'
+            page_params.extend([limit, offset])
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            total = None
+            if count:
+                cursor.execute(f'SELECT COUNT(*) FROM channels{where}', params)
+                total = cursor.fetchone()[0]
+            cursor.execute(query, page_params)
+            if limit is not None:
+                ips = [row[0] for row in cursor.fetchall()]
+                channels = self._fetch_channels(cursor, ips)
+                page = [(ip, channels[ip]) for ip in ips if ip in channels]
+            else:
+                page = [(row[0], channel_from_row(row)) for row in cursor.fetchall()]
+                self._attach_groups(cursor, dict(page))
+        return total, page
+
+    def get_channel_stats(self) -> Dict[str, Any]:
+        """Count channels by resolution tier, connectivity and group"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM channels')
+            total = cursor.fetchone()[0]
+            cursor.execute('SELECT resolution_tier, COUNT(*) FROM channels GROUP BY resolution_tier')
+            resolution = dict(cursor.fetchall())
+            cursor.execute('SELECT connectivity, COUNT(*) FROM channels GROUP BY connectivity')
+            connectivity = dict(cursor.fetchall())
+            cursor.execute('SELECT group_id, COUNT(*) FROM channel_groups GROUP BY group_id')
+            group_counts = dict(cursor.fetchall())
+            cursor.execute('SELECT COUNT(*) FROM channels WHERE ip NOT IN (SELECT channel_ip FROM channel_groups)')
+            ungrouped = cursor.fetchone()[0]
+        return {
+            'total': total,
+            'resolution': resolution,
+            'connectivity': connectivity,
+            'groups': group_counts,
+            'ungrouped': ungrouped
+        }
 
     def update_channel(self, ip: str, data: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # Check if channel exists
-        cursor.execute('SELECT ip FROM channels WHERE ip = ?', (ip,))
-        exists = cursor.fetchone()
-
-        if exists:
-            # Build update query dynamically based on provided fields
-            fields = []
-            values = []
-            for key in ['name', 'logo', 'tvg_id', 'url', 'screenshot', 'resolution', 'test_status', 'playback', 'catchup', 'connectivity', 'timestamp']:
-                if key in data:
-                    fields.append(f"{key} = ?")
-                    values.append(data[key])
-
-            if fields:
-                values.append(ip)
-                query = f"UPDATE channels SET {', '.join(fields)} WHERE ip = ?"
-                cursor.execute(query, values)
-        else:
-            # Insert new channel
-            cursor.execute('''
-                INSERT INTO channels
-                (ip, name, logo, tvg_id, url, screenshot, resolution, test_status, playback, catchup, connectivity, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                ip,
-                data.get('name', ''),
-                data.get('logo', ''),
-                data.get('tvg_id', ''),
-                data.get('url', ''),
-                data.get('screenshot', ''),
-                data.get('resolution', ''),
-                data.get('test_status', ''),
-                data.get('playback', ''),
-                data.get('catchup', ''),
-                data.get('connectivity', 'untested'),
-                data.get('timestamp', '')
-            ))
-
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if channel exists
+            cursor.execute('SELECT ip FROM channels WHERE ip = ?', (ip,))
+            exists = cursor.fetchone()
+
+            if exists:
+                # Build update query dynamically based on provided fields
+                fields = []
+                values = []
+                for key in CHANNEL_COLUMNS[1:]:
+                    if key in data and key not in CHANNEL_DERIVED_COLUMNS + CHANNEL_SEARCH_COLUMNS:
+                        fields.append(f"{key} = ?")
+                        values.append(data[key])
+
+                # Keep the typed resolution and pinyin search columns in step with the text
+                if 'resolution' in data:
+                    fields.extend(f"{key} = ?" for key in CHANNEL_DERIVED_COLUMNS)
+                    values.extend(parse_resolution(data['resolution']))
+                if 'name' in data:
+                    fields.extend(f"{key} = ?" for key in CHANNEL_SEARCH_COLUMNS)
+                    values.extend(name_search_values(data['name']))
+
+                if fields:
+                    values.append(ip)
+                    query = f"UPDATE channels SET {', '.join(fields)} WHERE ip = ?"
+                    cursor.execute(query, values)
+            else:
+                # Insert new channel
+                cursor.execute(f"INSERT INTO channels ({', '.join(CHANNEL_COLUMNS)}) VALUES ({', '.join(['?'] * len(CHANNEL_COLUMNS))})",
+                               channel_values(ip, data))
+
+            conn.commit()
 
     def delete_channel(self, ip: str):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM channels WHERE ip = ?', (ip,))
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM channel_groups WHERE channel_ip = ?', (ip,))
+            cursor.execute('DELETE FROM channels WHERE ip = ?', (ip,))
+            conn.commit()
 
     # Groups
     def get_all_groups(self) -> Dict[str, Any]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT * FROM groups ORDER BY sort_order')
-        rows = cursor.fetchall()
-
-        groups = {}
-        for row in rows:
-            group_id = row[0]
-            groups[group_id] = {
-                'name': row[1],
-                'sort_order': row[2],
-                'channels': []
-            }
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute('SELECT * FROM groups ORDER BY sort_order')
+            rows = cursor.fetchall()
+
+            groups = {}
+            for row in rows:
+                group_id = row[0]
+                groups[group_id] = {
+                    'name': row[1],
+                    'sort_order': row[2],
+                    'channels': []
+                }
+
+            # Load all memberships with a single query instead of one per group
+            cursor.execute('SELECT channel_ip, group_id FROM channel_groups')
+            for channel_ip, group_id in cursor.fetchall():
+                if group_id in groups:
+                    groups[group_id]['channels'].append(channel_ip)
 
-            # Get channel IPs in this group
-            cursor.execute('SELECT channel_ip FROM channel_groups WHERE group_id = ?', (group_id,))
-            channel_ips = [r[0] for r in cursor.fetchall()]
-            groups[group_id]['channels'] = channel_ips
-
-        conn.close()
         return groups
 
     def save_groups(self, groups: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # Clear existing data
-        cursor.execute('DELETE FROM channel_groups')
-        cursor.execute('DELETE FROM groups')
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        # Insert groups
-        for group_id, group in groups.items():
-            cursor.execute('''
-                INSERT INTO groups (id, name, sort_order)
-                VALUES (?, ?, ?)
-            ''', (
-                group_id,
-                group.get('name', ''),
-                group.get('sort_order', 9999)
-            ))
+            # Clear existing data
+            cursor.execute('DELETE FROM channel_groups')
+            cursor.execute('DELETE FROM groups')
 
-            # Insert channel-group relationships
-            for channel_ip in group.get('channels', []):
+            # Insert groups
+            for group_id, group in groups.items():
                 cursor.execute('''
-                    INSERT INTO channel_groups (channel_ip, group_id)
-                    VALUES (?, ?)
-                ''', (channel_ip, group_id))
+                    INSERT INTO groups (id, name, sort_order)
+                    VALUES (?, ?, ?)
+                ''', (
+                    group_id,
+                    group.get('name', ''),
+                    group.get('sort_order', 9999)
+                ))
+
+                # Insert channel-group relationships
+                for channel_ip in group.get('channels', []):
+                    cursor.execute('''
+                        INSERT INTO channel_groups (channel_ip, group_id)
+                        VALUES (?, ?)
+                    ''', (channel_ip, group_id))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def get_group(self, group_id: str) -> Optional[Dict[str, Any]]:
         groups = self.get_all_groups()
         return groups.get(group_id)
 
     def update_group(self, group_id: str, data: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # Check if group exists
-        cursor.execute('SELECT id FROM groups WHERE id = ?', (group_id,))
-        exists = cursor.fetchone()
-
-        if exists:
-            # Update group
-            if 'name' in data or 'sort_order' in data:
-                fields = []
-                values = []
-                if 'name' in data:
-                    fields.append('name = ?')
-                    values.append(data['name'])
-                if 'sort_order' in data:
-                    fields.append('sort_order = ?')
-                    values.append(data['sort_order'])
-
-                values.append(group_id)
-                query = f"UPDATE groups SET {', '.join(fields)} WHERE id = ?"
-                cursor.execute(query, values)
-
-            # Update channels if provided
-            if 'channels' in data:
-                cursor.execute('DELETE FROM channel_groups WHERE group_id = ?', (group_id,))
-                for channel_ip in data['channels']:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if group exists
+            cursor.execute('SELECT id FROM groups WHERE id = ?', (group_id,))
+            exists = cursor.fetchone()
+
+            if exists:
+                # Update group
+                if 'name' in data or 'sort_order' in data:
+                    fields = []
+                    values = []
+                    if 'name' in data:
+                        fields.append('name = ?')
+                        values.append(data['name'])
+                    if 'sort_order' in data:
+                        fields.append('sort_order = ?')
+                        values.append(data['sort_order'])
+
+                    values.append(group_id)
+                    query = f"UPDATE groups SET {', '.join(fields)} WHERE id = ?"
+                    cursor.execute(query, values)
+
+                # Update channels if provided
+                if 'channels' in data:
+                    cursor.execute('DELETE FROM channel_groups WHERE group_id = ?', (group_id,))
+                    for channel_ip in data['channels']:
+                        cursor.execute('''
+                            INSERT INTO channel_groups (channel_ip, group_id)
+                            VALUES (?, ?)
+                        ''', (channel_ip, group_id))
+            else:
+                # Insert new group
+                cursor.execute('''
+                    INSERT INTO groups (id, name, sort_order)
+                    VALUES (?, ?, ?)
+                ''', (
+                    group_id,
+                    data.get('name', ''),
+                    data.get('sort_order', 9999)
+                ))
+
+                # Insert channels
+                for channel_ip in data.get('channels', []):
                     cursor.execute('''
                         INSERT INTO channel_groups (channel_ip, group_id)
                         VALUES (?, ?)
                     ''', (channel_ip, group_id))
-        else:
-            # Insert new group
-            cursor.execute('''
-                INSERT INTO groups (id, name, sort_order)
-                VALUES (?, ?, ?)
-            ''', (
-                group_id,
-                data.get('name', ''),
-                data.get('sort_order', 9999)
-            ))
-
-            # Insert channels
-            for channel_ip in data.get('channels', []):
-                cursor.execute('''
-                    INSERT INTO channel_groups (channel_ip, group_id)
-                    VALUES (?, ?)
-                ''', (channel_ip, group_id))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def delete_group(self, group_id: str):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM groups WHERE id = ?', (group_id,))
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            # Remove memberships explicitly, SQLite doesn't enforce ON DELETE CASCADE by default
+            cursor.execute('DELETE FROM channel_groups WHERE group_id = ?', (group_id,))
+            cursor.execute('DELETE FROM groups WHERE id = ?', (group_id,))
+            conn.commit()
+
+    def update_group_orders(self, orders: Dict[str, int]):
+        """Set sort_order for several groups in one transaction"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('UPDATE groups SET sort_order = ? WHERE id = ?',
+                               [(sort_order, group_id) for group_id, sort_order in orders.items()])
+            conn.commit()
+
+    def add_group_channels(self, group_id: str, channel_ips: List[str]):
+        """Add channels to a group, ignoring existing memberships"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT OR IGNORE INTO channel_groups (channel_ip, group_id)
+                VALUES (?, ?)
+            ''', [(channel_ip, group_id) for channel_ip in channel_ips])
+            conn.commit()
+
+    def remove_group_channels(self, group_id: str, channel_ips: List[str]):
+        """Remove channels from a group"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('DELETE FROM channel_groups WHERE group_id = ? AND channel_ip = ?',
+                               [(group_id, channel_ip) for channel_ip in channel_ips])
+            conn.commit()
 
     # Test Results
+    def _insert_result_items(self, cursor, test_id: str, results: Dict[str, Any]):
+        """Upsert per-IP results of a test using an open cursor"""
+        cursor.executemany('''
+            INSERT INTO test_result_items (test_id, ip, url, status, error, resolution, screenshot, note, timestamp, ttfb_ms, ttff_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (test_id, ip) DO UPDATE SET
+                url = excluded.url,
+                status = excluded.status,
+                error = excluded.error,
+                resolution = excluded.resolution,
+                screenshot = excluded.screenshot,
+                note = excluded.note,
+                timestamp = excluded.timestamp,
+                ttfb_ms = excluded.ttfb_ms,
+                ttff_ms = excluded.ttff_ms
+        ''', [result_item_values(test_id, ip, result) for ip, result in results.items()])
+
+    def _upsert_test(self, cursor, test_id: str, data: Dict[str, Any]):
+        """Upsert test metadata using an open cursor"""
+        cursor.execute('''
+            INSERT INTO test_results (test_id, base_url, start_ip, end_ip, status, start_time, end_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (test_id) DO UPDATE SET
+                base_url = excluded.base_url,
+                start_ip = excluded.start_ip,
+                end_ip = excluded.end_ip,
+                status = excluded.status,
+                start_time = excluded.start_time,
+                end_time = excluded.end_time
+        ''', (
+            test_id,
+            data.get('base_url', ''),
+            data.get('start_ip', ''),
+            data.get('end_ip', ''),
+            data.get('status', ''),
+            data.get('start_time', ''),
+            data.get('end_time', '')
+        ))
+
     def get_all_results(self) -> Dict[str, Any]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT * FROM test_results')
-        rows = cursor.fetchall()
-
-        results = {}
-        for row in rows:
-            test_id = row[0]
-            results[test_id] = {
-                'base_url': row[1],
-                'start_ip': row[2],
-                'end_ip': row[3],
-                'status': row[4],
-                'start_time': row[5],
-                'end_time': row[6],
-                'results': json.loads(row[7]) if row[7] else {}
-            }
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(f"SELECT {', '.join(TEST_COLUMNS)} FROM test_results ORDER BY start_time")
+            results = {row[0]: test_from_row(row) for row in cursor.fetchall()}
+            for test in results.values():
+                test['results'] = {}
+
+            cursor.execute(f"SELECT test_id, {', '.join(RESULT_ITEM_COLUMNS)} FROM test_result_items")
+            for row in cursor.fetchall():
+                if row[0] in results:
+                    results[row[0]]['results'][row[1]] = result_item_from_row(row[1:])
+
+        return results
+
+    def get_results(self, test_ids: List[str]) -> Dict[str, Any]:
+        """Get several tests with their per-IP results by test ID"""
+        test_ids = list(dict.fromkeys(test_ids))
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            results = {}
+            for start in range(0, len(test_ids), LOOKUP_CHUNK_SIZE):
+                chunk = test_ids[start:start + LOOKUP_CHUNK_SIZE]
+                placeholders = ', '.join(['?'] * len(chunk))
+                cursor.execute(f"SELECT {', '.join(TEST_COLUMNS)} FROM test_results WHERE test_id IN ({placeholders})", chunk)
+                for row in cursor.fetchall():
+                    results[row[0]] = test_from_row(row)
+                    results[row[0]]['results'] = {}
+
+                cursor.execute(f"SELECT test_id, {', '.join(RESULT_ITEM_COLUMNS)} FROM test_result_items WHERE test_id IN ({placeholders})", chunk)
+                for row in cursor.fetchall():
+                    if row[0] in results:
+                        results[row[0]]['results'][row[1]] = result_item_from_row(row[1:])
 
-        conn.close()
         return results
 
     def save_results(self, results: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        # Clear existing data
-        cursor.execute('DELETE FROM test_results')
+            # Clear existing data
+            cursor.execute('DELETE FROM test_result_items')
+            cursor.execute('DELETE FROM test_results')
 
-        # Insert results
-        for test_id, result in results.items():
-            cursor.execute('''
-                INSERT INTO test_results
-                (test_id, base_url, start_ip, end_ip, status, start_time, end_time, results)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                test_id,
-                result.get('base_url', ''),
-                result.get('start_ip', ''),
-                result.get('end_ip', ''),
-                result.get('status', ''),
-                result.get('start_time', ''),
-                result.get('end_time', ''),
-                json.dumps(result.get('results', {}))
-            ))
-
-        conn.commit()
-        conn.close()
+            # Insert results
+            for test_id, result in results.items():
+                self._upsert_test(cursor, test_id, result)
+                self._insert_result_items(cursor, test_id, result.get('results', {}))
+
+            conn.commit()
 
     def get_result(self, test_id: str) -> Optional[Dict[str, Any]]:
-        results = self.get_all_results()
-        return results.get(test_id)
+        return self.get_results([test_id]).get(test_id)
+
+    def get_results_summary(self) -> Dict[str, Any]:
+        """Get every test's metadata without its per-IP results"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(TEST_COLUMNS)} FROM test_results ORDER BY start_time")
+            rows = cursor.fetchall()
+
+        return {row[0]: test_from_row(row) for row in rows}
+
+    def save_test(self, test_id: str, data: Dict[str, Any]):
+        """Insert or update a test's metadata, leaving its per-IP results alone"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            self._upsert_test(cursor, test_id, data)
+            conn.commit()
+
+    def save_result_items(self, test_id: str, results: Dict[str, Any]):
+        """Insert or update per-IP results of a test"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            self._insert_result_items(cursor, test_id, results)
+            conn.commit()
+
+    def get_result_items(self, test_id: str, status: Optional[str] = None,
+                         limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get a page of per-IP results of a test, optionally filtered by status"""
+        query = f"SELECT {', '.join(RESULT_ITEM_COLUMNS)} FROM test_result_items WHERE test_id = ?"
+        params = [test_id]
+        if status:
+            query += ' AND status = ?'
+            params.append(status)
+        query += ' ORDER BY ip'
+        if limit is not None:
+            query += ' LIMIT ? OFFSET ?'
+            params.extend([limit, offset])
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        return [result_item_from_row(row) for row in rows]
+
+    def count_result_items(self, test_id: str) -> Dict[str, int]:
+        """Count per-IP results of a test by status"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, COUNT(*) FROM test_result_items WHERE test_id = ? GROUP BY status', (test_id,))
+            rows = cursor.fetchall()
+        return {status: count for status, count in rows}
 
     def update_result(self, test_id: str, data: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT OR REPLACE INTO test_results
-            (test_id, base_url, start_ip, end_ip, status, start_time, end_time, results)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            test_id,
-            data.get('base_url', ''),
-            data.get('start_ip', ''),
-            data.get('end_ip', ''),
-            data.get('status', ''),
-            data.get('start_time', ''),
-            data.get('end_time', ''),
-            json.dumps(data.get('results', {}))
-        ))
+            self._upsert_test(cursor, test_id, data)
+            cursor.execute('DELETE FROM test_result_items WHERE test_id = ?', (test_id,))
+            self._insert_result_items(cursor, test_id, data.get('results', {}))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def delete_result(self, test_id: str):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM test_results WHERE test_id = ?', (test_id,))
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM test_result_items WHERE test_id = ?', (test_id,))
+            cursor.execute('DELETE FROM test_results WHERE test_id = ?', (test_id,))
+            conn.commit()
+
+    def delete_results_before(self, cutoff: str) -> List[str]:
+        """Delete tests started before an ISO timestamp
+
+        Returns:
+            list: IDs of the deleted tests
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT test_id FROM test_results WHERE start_time != '' AND start_time < ?", (cutoff,))
+            test_ids = [row[0] for row in cursor.fetchall()]
+            for test_id in test_ids:
+                cursor.execute('DELETE FROM test_result_items WHERE test_id = ?', (test_id,))
+                cursor.execute('DELETE FROM test_results WHERE test_id = ?', (test_id,))
+            conn.commit()
+        return test_ids
 
 
 class PostgreSQLDatabase:
@@ -445,7 +1214,9 @@ class PostgreSQLDatabase:
     def __init__(self, config: Dict[str, Any]):
         try:
             import psycopg2
+            import psycopg2.extras
             self.psycopg2 = psycopg2
+            self.extras = psycopg2.extras
         except ImportError:
             raise ImportError("psycopg2-binary is required for PostgreSQL support")
 
@@ -456,403 +1227,531 @@ class PostgreSQLDatabase:
         self.user = db_config.get('user', 'postgres')
         self.password = db_config.get('password', '')
 
+        from psycopg2 import pool
+        self.pool_min = db_config.get('pool_min', PG_POOL_MIN)
+        self.pool_max = db_config.get('pool_max', PG_POOL_MAX)
+        self._pool = pool.ThreadedConnectionPool(
+            self.pool_min,
+            self.pool_max,
+            host=self.host,
+            port=self.port,
+            database=self.database,
+            user=self.user,
+            password=self.password
+        )
+        self._stats = CheckoutStats()
+
         self._init_database()
 
     def _init_database(self):
         """Initialize database schema"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        # Create tables (similar to SQLite but with PostgreSQL syntax)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS channels (
-                ip TEXT PRIMARY KEY,
-                name TEXT DEFAULT '',
-                logo TEXT DEFAULT '',
-                tvg_id TEXT DEFAULT '',
-                url TEXT DEFAULT '',
-                screenshot TEXT DEFAULT '',
-                resolution TEXT DEFAULT '',
-                test_status TEXT DEFAULT 'success',
-                playback TEXT DEFAULT '',
-                catchup TEXT DEFAULT '',
-                connectivity TEXT DEFAULT 'untested',
-                timestamp TEXT DEFAULT ''
-            )
-        ''')
+            # Create tables (similar to SQLite but with PostgreSQL syntax)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS channels (
+                    ip TEXT PRIMARY KEY,
+                    name TEXT DEFAULT '',
+                    logo TEXT DEFAULT '',
+                    tvg_id TEXT DEFAULT '',
+                    url TEXT DEFAULT '',
+                    screenshot TEXT DEFAULT '',
+                    resolution TEXT DEFAULT '',
+                    test_status TEXT DEFAULT 'success',
+                    playback TEXT DEFAULT '',
+                    catchup TEXT DEFAULT '',
+                    connectivity TEXT DEFAULT 'untested',
+                    timestamp TEXT DEFAULT '',
+                    ttfb_ms INTEGER,
+                    ttff_ms INTEGER,
+                    width INTEGER,
+                    height INTEGER,
+                    resolution_tier TEXT DEFAULT 'unknown',
+                    name_pinyin TEXT,
+                    name_initials TEXT
+                )
+            ''')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS groups (
-                id TEXT PRIMARY KEY,
-                name TEXT,
-                sort_order INTEGER
-            )
-        ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS groups (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    sort_order INTEGER
+                )
+            ''')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS channel_groups (
-                channel_ip TEXT,
-                group_id TEXT,
-                PRIMARY KEY (channel_ip, group_id),
-                FOREIGN KEY (channel_ip) REFERENCES channels(ip) ON DELETE CASCADE,
-                FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
-            )
-        ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS channel_groups (
+                    channel_ip TEXT,
+                    group_id TEXT,
+                    PRIMARY KEY (channel_ip, group_id),
+                    FOREIGN KEY (channel_ip) REFERENCES channels(ip) ON DELETE CASCADE,
+                    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+                )
+            ''')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS test_results (
-                test_id TEXT PRIMARY KEY,
-                base_url TEXT,
-                start_ip TEXT,
-                end_ip TEXT,
-                status TEXT,
-                start_time TEXT,
-                end_time TEXT,
-                results TEXT
-            )
-        ''')
-
-        # Create indexes
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_test_status ON channels(test_status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_resolution ON channels(resolution)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_groups_sort_order ON groups(sort_order)')
-
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS test_results (
+                    test_id TEXT PRIMARY KEY,
+                    base_url TEXT,
+                    start_ip TEXT,
+                    end_ip TEXT,
+                    status TEXT,
+                    start_time TEXT,
+                    end_time TEXT,
+                    results TEXT
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS test_result_items (
+                    test_id TEXT,
+                    ip TEXT,
+                    url TEXT,
+                    status TEXT,
+                    error TEXT,
+                    resolution TEXT,
+                    screenshot TEXT,
+                    note TEXT,
+                    timestamp TEXT,
+                    ttfb_ms INTEGER,
+                    ttff_ms INTEGER,
+                    PRIMARY KEY (test_id, ip)
+                )
+            ''')
+
+            # Add columns introduced after the initial schema
+            for column, definition in CHANNEL_MIGRATION_COLUMNS:
+                cursor.execute(f'ALTER TABLE channels ADD COLUMN IF NOT EXISTS {column} {definition}')
+
+            # Create indexes
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_test_status ON channels(test_status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_resolution ON channels(resolution)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_resolution_tier ON channels(resolution_tier)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_connectivity ON channels(connectivity)')
+
+            # Fill the typed resolution columns of rows written before they existed
+            cursor.execute("SELECT ip, resolution FROM channels WHERE width IS NULL AND resolution != ''")
+            for ip, resolution in cursor.fetchall():
+                width, height, tier = parse_resolution(resolution)
+                cursor.execute('UPDATE channels SET width = %s, height = %s, resolution_tier = %s WHERE ip = %s',
+                               (width, height, tier, ip))
+
+            # Fill the pinyin search columns of rows written before they existed or without pypinyin
+            cursor.execute('SELECT ip, name FROM channels WHERE name_pinyin IS NULL')
+            for ip, name in cursor.fetchall():
+                search_values = name_search_values(name)
+                if search_values[0] is not None:
+                    cursor.execute('UPDATE channels SET name_pinyin = %s, name_initials = %s WHERE ip = %s',
+                                   (*search_values, ip))
+
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_groups_sort_order ON groups(sort_order)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_channel_groups_group_id ON channel_groups(group_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_result_items_status ON test_result_items(test_id, status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_results_start_time ON test_results(start_time)')
+
+            # Move per-IP results out of the legacy JSON column into test_result_items
+            cursor.execute("SELECT test_id, results FROM test_results WHERE results IS NOT NULL AND results != ''")
+            for test_id, blob in cursor.fetchall():
+                self._insert_result_items(cursor, test_id, json.loads(blob))
+                cursor.execute('UPDATE test_results SET results = NULL WHERE test_id = %s', (test_id,))
+
+            conn.commit()
+
+    @contextmanager
+    def _connection(self):
+        """Check out a pooled connection for one operation and always hand it back
+
+        A transaction left open, by an error or by reads, is rolled back.
+        """
+        conn = self._get_connection()
+        try:
+            yield conn
+        finally:
+            self._release_connection(conn)
 
     def _get_connection(self):
-        return self.psycopg2.connect(
-            host=self.host,
-            port=self.port,
-            database=self.database,
-            user=self.user,
-            password=self.password
-        )
+        """Check out a pooled connection, waiting while the pool is exhausted"""
+        started = time.perf_counter()
+        while True:
+            try:
+                conn = self._pool.getconn()
+                break
+            except self.psycopg2.pool.PoolError:
+                if time.perf_counter() - started > PG_POOL_WAIT_SECONDS:
+                    raise
+                time.sleep(0.05)
+
+        if conn.get_transaction_status() != self.psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        self._stats.record(started)
+        return conn
+
+    def _release_connection(self, conn):
+        """Return a connection to the pool, discarding it if it broke"""
+        broken = bool(conn.closed)
+        if not broken and conn.get_transaction_status() != self.psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except self.psycopg2.Error:
+                broken = True
+        self._pool.putconn(conn, close=broken)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        stats = self._stats.snapshot()
+        stats['type'] = 'postgresql'
+        stats['pool_min'] = self.pool_min
+        stats['pool_max'] = self.pool_max
+        return stats
 
     # The rest of the methods are similar to SQLiteDatabase
     # but use %s placeholders instead of ? and ON CONFLICT syntax for upserts
 
     def get_all_channels(self) -> Dict[str, Any]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('SELECT * FROM channels')
-        rows = cursor.fetchall()
+            cursor.execute(f"SELECT {', '.join(CHANNEL_COLUMNS)} FROM channels")
+            rows = cursor.fetchall()
 
-        channels = {}
-        for row in rows:
-            ip = row[0]
-            channels[ip] = {
-                'name': row[1] or '',
-                'logo': row[2] or '',
-                'tvg_id': row[3] or '',
-                'url': row[4] or '',
-                'screenshot': row[5] or '',
-                'resolution': row[6] or '',
-                'test_status': row[7] or '',
-                'playback': row[8] or '',
-                'catchup': row[9] or '',
-                'connectivity': row[10] or 'untested',
-                'timestamp': row[11] or ''
-            }
+            channels = {row[0]: channel_from_row(row) for row in rows}
 
+            # Attach group memberships with a single query instead of one per channel
             cursor.execute('''
-                SELECT g.id, g.name FROM groups g
-                JOIN channel_groups cg ON g.id = cg.group_id
-                WHERE cg.channel_ip = %s
-            ''', (ip,))
-            groups = cursor.fetchall()
-            channels[ip]['groups'] = [{'id': g[0], 'name': g[1]} for g in groups]
+                SELECT cg.channel_ip, g.id, g.name FROM channel_groups cg
+                JOIN groups g ON g.id = cg.group_id
+                ORDER BY g.sort_order
+            ''')
+            for channel_ip, group_id, group_name in cursor.fetchall():
+                if channel_ip in channels:
+                    channels[channel_ip]['groups'].append({'id': group_id, 'name': group_name})
 
-        conn.close()
         return channels
 
     def save_channels(self, channels: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        # Use UPSERT to avoid deleting channel_groups relationships
-        # Only update/insert channels, don't touch channel_groups table
-        for ip, channel in channels.items():
-            cursor.execute('''
-                INSERT INTO channels
-                (ip, name, logo, tvg_id, url, screenshot, resolution, test_status, playback, catchup, connectivity, timestamp)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT(ip) DO UPDATE SET
-                    name = EXCLUDED.name,
-                    logo = EXCLUDED.logo,
-                    tvg_id = EXCLUDED.tvg_id,
-                    url = EXCLUDED.url,
-                    screenshot = EXCLUDED.screenshot,
-                    resolution = EXCLUDED.resolution,
-                    test_status = EXCLUDED.test_status,
-                    playback = EXCLUDED.playback,
-                    catchup = EXCLUDED.catchup,
-                    connectivity = EXCLUDED.connectivity,
-                    timestamp = EXCLUDED.timestamp
-            ''', (
-                ip,
-                channel.get('name', ''),
-                channel.get('logo', ''),
-                channel.get('tvg_id', ''),
-                channel.get('url', ''),
-                channel.get('screenshot', ''),
-                channel.get('resolution', ''),
-                channel.get('test_status', ''),
-                channel.get('playback', ''),
-                channel.get('catchup', ''),
-                channel.get('connectivity', 'untested'),
-                channel.get('timestamp', '')
-            ))
-
-        conn.commit()
-        conn.close()
+            # Use UPSERT to avoid deleting channel_groups relationships
+            # Only update/insert channels, don't touch channel_groups table
+            # Rows are sent in pages of PG_BULK_PAGE_SIZE per statement
+            self.extras.execute_values(cursor, f'''
+                INSERT INTO channels ({', '.join(CHANNEL_COLUMNS)})
+                VALUES %s
+                ON CONFLICT(ip) DO UPDATE SET {CHANNEL_UPSERT_SET}
+            ''', [channel_values(ip, channel) for ip, channel in channels.items()], page_size=PG_BULK_PAGE_SIZE)
+
+            conn.commit()
 
     def get_channel(self, ip: str) -> Optional[Dict[str, Any]]:
-        channels = self.get_all_channels()
-        return channels.get(ip)
+        return self.get_channels([ip]).get(ip)
+
+    def get_channels(self, ips: List[str]) -> Dict[str, Any]:
+        """Get several channels with their groups by IP"""
+        with self._connection() as conn:
+            return self._fetch_channels(conn.cursor(), list(dict.fromkeys(ips)))
+
+    def _fetch_channels(self, cursor, ips: List[str]) -> Dict[str, Any]:
+        """Select channels with their groups by IP"""
+        channels = {}
+        for start in range(0, len(ips), LOOKUP_CHUNK_SIZE):
+            chunk = ips[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"SELECT {', '.join(CHANNEL_COLUMNS)} FROM channels WHERE ip IN ({placeholders})", chunk)
+            for row in cursor.fetchall():
+                channels[row[0]] = channel_from_row(row)
+        self._attach_groups(cursor, channels)
+        return channels
+
+    def _attach_groups(self, cursor, channels: Dict[str, Any]):
+        """Fill the 'groups' list of channels fetched by IP"""
+        ips = list(channels)
+        for start in range(0, len(ips), LOOKUP_CHUNK_SIZE):
+            chunk = ips[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'''
+                SELECT cg.channel_ip, g.id, g.name FROM channel_groups cg
+                JOIN groups g ON g.id = cg.group_id
+                WHERE cg.channel_ip IN ({placeholders})
+                ORDER BY g.sort_order
+            ''', chunk)
+            for channel_ip, group_id, group_name in cursor.fetchall():
+                channels[channel_ip]['groups'].append({'id': group_id, 'name': group_name})
+
+    def query_channels(self, filters: Dict[str, Any], sort_by: str = '',
+                       limit: Optional[int] = None, offset: int = 0, count: bool = True) -> tuple:
+        """Filter, order and page channels in the database
+
+        Args:
+            count: Also count all matching channels (skip when the caller knows the total)
+
+        Returns:
+            tuple: (number of matching channels or None, list of (ip, channel) in list order)
+        """
+        where, params = channel_query_where(filters, '%s')
+        # A page is ordered on the IPs alone and its rows fetched afterwards,
+        # so the sort does not carry every matching row in full
+        columns = 'channels.ip' if limit is not None else ', '.join(f'channels.{column}' for column in CHANNEL_COLUMNS)
+        query = (f"SELECT {columns} FROM channels{CHANNEL_GROUP_ORDER_JOIN}{where} "
+                 f"GROUP BY channels.ip ORDER BY {channel_query_order(sort_by)}")
+        page_params = list(params)
+        if limit is not None:
+            query += ' LIMIT %s OFFSET %s'
+            page_params.extend([limit, offset])
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            total = None
+            if count:
+                cursor.execute(f'SELECT COUNT(*) FROM channels{where}', params)
+                total = cursor.fetchone()[0]
+            cursor.execute(query, page_params)
+            if limit is not None:
+                ips = [row[0] for row in cursor.fetchall()]
+                channels = self._fetch_channels(cursor, ips)
+                page = [(ip, channels[ip]) for ip in ips if ip in channels]
+            else:
+                page = [(row[0], channel_from_row(row)) for row in cursor.fetchall()]
+                self._attach_groups(cursor, dict(page))
+        return total, page
+
+    def get_channel_stats(self) -> Dict[str, Any]:
+        """Count channels by resolution tier, connectivity and group"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM channels')
+            total = cursor.fetchone()[0]
+            cursor.execute('SELECT resolution_tier, COUNT(*) FROM channels GROUP BY resolution_tier')
+            resolution = dict(cursor.fetchall())
+            cursor.execute('SELECT connectivity, COUNT(*) FROM channels GROUP BY connectivity')
+            connectivity = dict(cursor.fetchall())
+            cursor.execute('SELECT group_id, COUNT(*) FROM channel_groups GROUP BY group_id')
+            group_counts = dict(cursor.fetchall())
+            cursor.execute('SELECT COUNT(*) FROM channels WHERE ip NOT IN (SELECT channel_ip FROM channel_groups)')
+            ungrouped = cursor.fetchone()[0]
+        return {
+            'total': total,
+            'resolution': resolution,
+            'connectivity': connectivity,
+            'groups': group_counts,
+            'ungrouped': ungrouped
+        }
 
     def update_channel(self, ip: str, data: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # Check if channel exists
-        cursor.execute('SELECT ip FROM channels WHERE ip = %s', (ip,))
-        exists = cursor.fetchone()
-
-        if exists:
-            # Build update query dynamically based on provided fields
-            fields = []
-            values = []
-            for key in ['name', 'logo', 'tvg_id', 'url', 'screenshot', 'resolution', 'test_status', 'playback', 'catchup', 'connectivity', 'timestamp']:
-                if key in data:
-                    fields.append(f"{key} = %s")
-                    values.append(data[key])
-
-            if fields:
-                values.append(ip)
-                query = f"UPDATE channels SET {', '.join(fields)} WHERE ip = %s"
-                cursor.execute(query, values)
-        else:
-            # Insert new channel
-            cursor.execute('''
-                INSERT INTO channels
-                (ip, name, logo, tvg_id, url, screenshot, resolution, test_status, playback, catchup, connectivity, timestamp)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                ip,
-                data.get('name', ''),
-                data.get('logo', ''),
-                data.get('tvg_id', ''),
-                data.get('url', ''),
-                data.get('screenshot', ''),
-                data.get('resolution', ''),
-                data.get('test_status', ''),
-                data.get('playback', ''),
-                data.get('catchup', ''),
-                data.get('connectivity', 'untested'),
-                data.get('timestamp', '')
-            ))
-
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if channel exists
+            cursor.execute('SELECT ip FROM channels WHERE ip = %s', (ip,))
+            exists = cursor.fetchone()
+
+            if exists:
+                # Build update query dynamically based on provided fields
+                fields = []
+                values = []
+                for key in CHANNEL_COLUMNS[1:]:
+                    if key in data and key not in CHANNEL_DERIVED_COLUMNS + CHANNEL_SEARCH_COLUMNS:
+                        fields.append(f"{key} = %s")
+                        values.append(data[key])
+
+                # Keep the typed resolution and pinyin search columns in step with the text
+                if 'resolution' in data:
+                    fields.extend(f"{key} = %s" for key in CHANNEL_DERIVED_COLUMNS)
+                    values.extend(parse_resolution(data['resolution']))
+                if 'name' in data:
+                    fields.extend(f"{key} = %s" for key in CHANNEL_SEARCH_COLUMNS)
+                    values.extend(name_search_values(data['name']))
+
+                if fields:
+                    values.append(ip)
+                    query = f"UPDATE channels SET {', '.join(fields)} WHERE ip = %s"
+                    cursor.execute(query, values)
+            else:
+                # Insert new channel
+                cursor.execute(f"INSERT INTO channels ({', '.join(CHANNEL_COLUMNS)}) VALUES ({', '.join(['%s'] * len(CHANNEL_COLUMNS))})",
+                               channel_values(ip, data))
+
+            conn.commit()
 
     def delete_channel(self, ip: str):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM channels WHERE ip = %s', (ip,))
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM channel_groups WHERE channel_ip = %s', (ip,))
+            cursor.execute('DELETE FROM channels WHERE ip = %s', (ip,))
+            conn.commit()
 
     # Groups
     def get_all_groups(self) -> Dict[str, Any]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT * FROM groups ORDER BY sort_order')
-        rows = cursor.fetchall()
-
-        groups = {}
-        for row in rows:
-            group_id = row[0]
-            groups[group_id] = {
-                'name': row[1],
-                'sort_order': row[2],
-                'channels': []
-            }
-
-            # Get channel IPs in this group
-            cursor.execute('SELECT channel_ip FROM channel_groups WHERE group_id = %s', (group_id,))
-            channel_ips = [r[0] for r in cursor.fetchall()]
-            groups[group_id]['channels'] = channel_ips
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute('SELECT * FROM groups ORDER BY sort_order')
+            rows = cursor.fetchall()
+
+            groups = {}
+            for row in rows:
+                group_id = row[0]
+                groups[group_id] = {
+                    'name': row[1],
+                    'sort_order': row[2],
+                    'channels': []
+                }
+
+            # Load all memberships with a single query instead of one per group
+            cursor.execute('SELECT channel_ip, group_id FROM channel_groups')
+            for channel_ip, group_id in cursor.fetchall():
+                if group_id in groups:
+                    groups[group_id]['channels'].append(channel_ip)
 
-        conn.close()
         return groups
 
     def save_groups(self, groups: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
-        # Clear existing data
-        cursor.execute('DELETE FROM channel_groups')
-        cursor.execute('DELETE FROM groups')
+            # Clear existing data
+            cursor.execute('DELETE FROM channel_groups')
+            cursor.execute('DELETE FROM groups')
 
-        # Insert groups
-        for group_id, group in groups.items():
-            cursor.execute('''
-                INSERT INTO groups (id, name, sort_order)
-                VALUES (%s, %s, %s)
-            ''', (
-                group_id,
-                group.get('name', ''),
-                group.get('sort_order', 9999)
-            ))
+            # Insert groups
+            self.extras.execute_values(cursor, 'INSERT INTO groups (id, name, sort_order) VALUES %s', [
+                (group_id, group.get('name', ''), group.get('sort_order', 9999))
+                for group_id, group in groups.items()
+            ], page_size=PG_BULK_PAGE_SIZE)
 
             # Insert channel-group relationships
-            for channel_ip in group.get('channels', []):
-                cursor.execute('''
-                    INSERT INTO channel_groups (channel_ip, group_id)
-                    VALUES (%s, %s)
-                ''', (channel_ip, group_id))
+            self.extras.execute_values(cursor, 'INSERT INTO channel_groups (channel_ip, group_id) VALUES %s ON CONFLICT DO NOTHING', [
+                (channel_ip, group_id)
+                for group_id, group in groups.items()
+                for channel_ip in group.get('channels', [])
+            ], page_size=PG_BULK_PAGE_SIZE)
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def get_group(self, group_id: str) -> Optional[Dict[str, Any]]:
         groups = self.get_all_groups()
         return groups.get(group_id)
 
     def update_group(self, group_id: str, data: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # Check if group exists
-        cursor.execute('SELECT id FROM groups WHERE id = %s', (group_id,))
-        exists = cursor.fetchone()
-
-        if exists:
-            # Update group
-            if 'name' in data or 'sort_order' in data:
-                fields = []
-                values = []
-                if 'name' in data:
-                    fields.append('name = %s')
-                    values.append(data['name'])
-                if 'sort_order' in data:
-                    fields.append('sort_order = %s')
-                    values.append(data['sort_order'])
-
-                values.append(group_id)
-                query = f"UPDATE groups SET {', '.join(fields)} WHERE id = %s"
-                cursor.execute(query, values)
-
-            # Update channels if provided
-            if 'channels' in data:
-                cursor.execute('DELETE FROM channel_groups WHERE group_id = %s', (group_id,))
-                for channel_ip in data['channels']:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if group exists
+            cursor.execute('SELECT id FROM groups WHERE id = %s', (group_id,))
+            exists = cursor.fetchone()
+
+            if exists:
+                # Update group
+                if 'name' in data or 'sort_order' in data:
+                    fields = []
+                    values = []
+                    if 'name' in data:
+                        fields.append('name = %s')
+                        values.append(data['name'])
+                    if 'sort_order' in data:
+                        fields.append('sort_order = %s')
+                        values.append(data['sort_order'])
+
+                    values.append(group_id)
+                    query = f"UPDATE groups SET {', '.join(fields)} WHERE id = %s"
+                    cursor.execute(query, values)
+
+                # Update channels if provided
+                if 'channels' in data:
+                    cursor.execute('DELETE FROM channel_groups WHERE group_id = %s', (group_id,))
+                    for channel_ip in data['channels']:
+                        cursor.execute('''
+                            INSERT INTO channel_groups (channel_ip, group_id)
+                            VALUES (%s, %s)
+                        ''', (channel_ip, group_id))
+            else:
+                # Insert new group
+                cursor.execute('''
+                    INSERT INTO groups (id, name, sort_order)
+                    VALUES (%s, %s, %s)
+                ''', (
+                    group_id,
+                    data.get('name', ''),
+                    data.get('sort_order', 9999)
+                ))
+
+                # Insert channels
+                for channel_ip in data.get('channels', []):
                     cursor.execute('''
                         INSERT INTO channel_groups (channel_ip, group_id)
                         VALUES (%s, %s)
                     ''', (channel_ip, group_id))
-        else:
-            # Insert new group
-            cursor.execute('''
-                INSERT INTO groups (id, name, sort_order)
-                VALUES (%s, %s, %s)
-            ''', (
-                group_id,
-                data.get('name', ''),
-                data.get('sort_order', 9999)
-            ))
-
-            # Insert channels
-            for channel_ip in data.get('channels', []):
-                cursor.execute('''
-                    INSERT INTO channel_groups (channel_ip, group_id)
-                    VALUES (%s, %s)
-                ''', (channel_ip, group_id))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def delete_group(self, group_id: str):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM groups WHERE id = %s', (group_id,))
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            # Remove memberships explicitly, SQLite doesn't enforce ON DELETE CASCADE by default
+            cursor.execute('DELETE FROM channel_groups WHERE group_id = %s', (group_id,))
+            cursor.execute('DELETE FROM groups WHERE id = %s', (group_id,))
+            conn.commit()
+
+    def update_group_orders(self, orders: Dict[str, int]):
+        """Set sort_order for several groups in one transaction"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            self.extras.execute_values(cursor, '''
+                UPDATE groups SET sort_order = new_order.sort_order
+                FROM (VALUES %s) AS new_order (id, sort_order)
+                WHERE groups.id = new_order.id
+            ''', list(orders.items()), page_size=PG_BULK_PAGE_SIZE)
+            conn.commit()
+
+    def add_group_channels(self, group_id: str, channel_ips: List[str]):
+        """Add channels to a group, ignoring existing memberships"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            self.extras.execute_values(cursor, '''
+                INSERT INTO channel_groups (channel_ip, group_id)
+                VALUES %s ON CONFLICT DO NOTHING
+            ''', [(channel_ip, group_id) for channel_ip in channel_ips], page_size=PG_BULK_PAGE_SIZE)
+            conn.commit()
+
+    def remove_group_channels(self, group_id: str, channel_ips: List[str]):
+        """Remove channels from a group"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM channel_groups WHERE group_id = %s AND channel_ip = ANY(%s::text[])',
+                           (group_id, list(channel_ips)))
+            conn.commit()
 
     # Test Results
-    def get_all_results(self) -> Dict[str, Any]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT * FROM test_results')
-        rows = cursor.fetchall()
-
-        results = {}
-        for row in rows:
-            test_id = row[0]
-            results[test_id] = {
-                'base_url': row[1],
-                'start_ip': row[2],
-                'end_ip': row[3],
-                'status': row[4],
-                'start_time': row[5],
-                'end_time': row[6],
-                'results': json.loads(row[7]) if row[7] else {}
-            }
-
-        conn.close()
-        return results
-
-    def save_results(self, results: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # Clear existing data
-        cursor.execute('DELETE FROM test_results')
-
-        # Insert results
-        for test_id, result in results.items():
-            cursor.execute('''
-                INSERT INTO test_results
-                (test_id, base_url, start_ip, end_ip, status, start_time, end_time, results)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                test_id,
-                result.get('base_url', ''),
-                result.get('start_ip', ''),
-                result.get('end_ip', ''),
-                result.get('status', ''),
-                result.get('start_time', ''),
-                result.get('end_time', ''),
-                json.dumps(result.get('results', {}))
-            ))
-
-        conn.commit()
-        conn.close()
-
-    def get_result(self, test_id: str) -> Optional[Dict[str, Any]]:
-        results = self.get_all_results()
-        return results.get(test_id)
-
-    def update_result(self, test_id: str, data: Dict[str, Any]):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
+    def _insert_result_items(self, cursor, test_id: str, results: Dict[str, Any]):
+        """Upsert per-IP results of a test using an open cursor"""
+        self.extras.execute_values(cursor, '''
+            INSERT INTO test_result_items (test_id, ip, url, status, error, resolution, screenshot, note, timestamp, ttfb_ms, ttff_ms)
+            VALUES %s
+            ON CONFLICT (test_id, ip) DO UPDATE SET
+                url = EXCLUDED.url,
+                status = EXCLUDED.status,
+                error = EXCLUDED.error,
+                resolution = EXCLUDED.resolution,
+                screenshot = EXCLUDED.screenshot,
+                note = EXCLUDED.note,
+                timestamp = EXCLUDED.timestamp,
+                ttfb_ms = EXCLUDED.ttfb_ms,
+                ttff_ms = EXCLUDED.ttff_ms
+        ''', [result_item_values(test_id, ip, result) for ip, result in results.items()], page_size=PG_BULK_PAGE_SIZE)
+
+    def _upsert_test(self, cursor, test_id: str, data: Dict[str, Any]):
+        """Upsert test metadata using an open cursor"""
         cursor.execute('''
-            INSERT INTO test_results
-            (test_id, base_url, start_ip, end_ip, status, start_time, end_time, results)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            INSERT INTO test_results (test_id, base_url, start_ip, end_ip, status, start_time, end_time)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
             ON CONFLICT (test_id) DO UPDATE SET
                 base_url = EXCLUDED.base_url,
                 start_ip = EXCLUDED.start_ip,
                 end_ip = EXCLUDED.end_ip,
                 status = EXCLUDED.status,
                 start_time = EXCLUDED.start_time,
-                end_time = EXCLUDED.end_time,
-                results = EXCLUDED.results
+                end_time = EXCLUDED.end_time
         ''', (
             test_id,
             data.get('base_url', ''),
@@ -860,16 +1759,144 @@ class PostgreSQLDatabase:
             data.get('end_ip', ''),
             data.get('status', ''),
             data.get('start_time', ''),
-            data.get('end_time', ''),
-            json.dumps(data.get('results', {}))
+            data.get('end_time', '')
         ))
 
-        conn.commit()
-        conn.close()
+    def get_all_results(self) -> Dict[str, Any]:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(f"SELECT {', '.join(TEST_COLUMNS)} FROM test_results ORDER BY start_time")
+            results = {row[0]: test_from_row(row) for row in cursor.fetchall()}
+            for test in results.values():
+                test['results'] = {}
+
+            cursor.execute(f"SELECT test_id, {', '.join(RESULT_ITEM_COLUMNS)} FROM test_result_items")
+            for row in cursor.fetchall():
+                if row[0] in results:
+                    results[row[0]]['results'][row[1]] = result_item_from_row(row[1:])
+
+        return results
+
+    def get_results(self, test_ids: List[str]) -> Dict[str, Any]:
+        """Get several tests with their per-IP results by test ID"""
+        test_ids = list(dict.fromkeys(test_ids))
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            results = {}
+            for start in range(0, len(test_ids), LOOKUP_CHUNK_SIZE):
+                chunk = test_ids[start:start + LOOKUP_CHUNK_SIZE]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f"SELECT {', '.join(TEST_COLUMNS)} FROM test_results WHERE test_id IN ({placeholders})", chunk)
+                for row in cursor.fetchall():
+                    results[row[0]] = test_from_row(row)
+                    results[row[0]]['results'] = {}
+
+                cursor.execute(f"SELECT test_id, {', '.join(RESULT_ITEM_COLUMNS)} FROM test_result_items WHERE test_id IN ({placeholders})", chunk)
+                for row in cursor.fetchall():
+                    if row[0] in results:
+                        results[row[0]]['results'][row[1]] = result_item_from_row(row[1:])
+
+        return results
+
+    def save_results(self, results: Dict[str, Any]):
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            # Clear existing data
+            cursor.execute('DELETE FROM test_result_items')
+            cursor.execute('DELETE FROM test_results')
+
+            # Insert results
+            for test_id, result in results.items():
+                self._upsert_test(cursor, test_id, result)
+                self._insert_result_items(cursor, test_id, result.get('results', {}))
+
+            conn.commit()
+
+    def get_result(self, test_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_results([test_id]).get(test_id)
+
+    def get_results_summary(self) -> Dict[str, Any]:
+        """Get every test's metadata without its per-IP results"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(TEST_COLUMNS)} FROM test_results ORDER BY start_time")
+            rows = cursor.fetchall()
+
+        return {row[0]: test_from_row(row) for row in rows}
+
+    def save_test(self, test_id: str, data: Dict[str, Any]):
+        """Insert or update a test's metadata, leaving its per-IP results alone"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            self._upsert_test(cursor, test_id, data)
+            conn.commit()
+
+    def save_result_items(self, test_id: str, results: Dict[str, Any]):
+        """Insert or update per-IP results of a test"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            self._insert_result_items(cursor, test_id, results)
+            conn.commit()
+
+    def get_result_items(self, test_id: str, status: Optional[str] = None,
+                         limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get a page of per-IP results of a test, optionally filtered by status"""
+        query = f"SELECT {', '.join(RESULT_ITEM_COLUMNS)} FROM test_result_items WHERE test_id = %s"
+        params = [test_id]
+        if status:
+            query += ' AND status = %s'
+            params.append(status)
+        query += ' ORDER BY ip'
+        if limit is not None:
+            query += ' LIMIT %s OFFSET %s'
+            params.extend([limit, offset])
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        return [result_item_from_row(row) for row in rows]
+
+    def count_result_items(self, test_id: str) -> Dict[str, int]:
+        """Count per-IP results of a test by status"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, COUNT(*) FROM test_result_items WHERE test_id = %s GROUP BY status', (test_id,))
+            rows = cursor.fetchall()
+        return {status: count for status, count in rows}
+
+    def update_result(self, test_id: str, data: Dict[str, Any]):
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            self._upsert_test(cursor, test_id, data)
+            cursor.execute('DELETE FROM test_result_items WHERE test_id = %s', (test_id,))
+            self._insert_result_items(cursor, test_id, data.get('results', {}))
+
+            conn.commit()
 
     def delete_result(self, test_id: str):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM test_results WHERE test_id = %s', (test_id,))
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM test_result_items WHERE test_id = %s', (test_id,))
+            cursor.execute('DELETE FROM test_results WHERE test_id = %s', (test_id,))
+            conn.commit()
+
+    def delete_results_before(self, cutoff: str) -> List[str]:
+        """Delete tests started before an ISO timestamp
+
+        Returns:
+            list: IDs of the deleted tests
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT test_id FROM test_results WHERE start_time != '' AND start_time < %s", (cutoff,))
+            test_ids = [row[0] for row in cursor.fetchall()]
+            for test_id in test_ids:
+                cursor.execute('DELETE FROM test_result_items WHERE test_id = %s', (test_id,))
+                cursor.execute('DELETE FROM test_results WHERE test_id = %s', (test_id,))
+            conn.commit()
+        return test_ids
@@ -1,22 +1,30 @@
 import os
+import re
+import gzip
 import json
 import subprocess
 import threading
 import time
-import copy
 import base64
 import requests
 import sys
 import logging
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache, wraps
 from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 import uuid
-from db import Database
+from db import Database, DatabaseWriter, parse_resolution, pinyin_keys
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import atexit
 
+try:
+    import brotli  # Optional: preferred over gzip when the client accepts it
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
 CORS(app)
 
@@ -31,14 +39,57 @@ os.makedirs(CONFIG_DIR, exist_ok=True)
 
 # Global state - using regular dicts without locks for reads
 # Only lock during file writes
-test_results = {}
+test_results = {}  # Most recent tests with all per-IP results; older ones stay in the database
+RESULTS_IN_MEMORY = 10  # Number of recent tests kept in memory
+RESULTS_RETENTION_DAYS = 90  # Default for config 'results_retention_days'
+TEST_METADATA_KEYS = ('base_url', 'start_ip', 'end_ip', 'status', 'start_time', 'end_time')
 tv_channels = {}  # Store successful channels
+dirty_channels = set()  # Channel IPs changed in memory since the last save_channels()
+dirty_channels_lock = threading.Lock()
 groups = {}  # Store channel groups
+channel_group_index = {}  # Channel IP -> set of IDs of the groups containing it
+library_version = int(time.time() * 1000)  # Bumped on every change to channels or groups; starts from the clock so it keeps growing across restarts
+library_modified = time.time()  # When library_version was last bumped
+channel_sort_keys = {}  # Channel IP -> cached list sort key
+sorted_channel_order = {'version': -1, 'ips': [], 'positions': {}}  # List order computed for a library version
+channel_order_lock = threading.Lock()
+CHANNEL_CHANGE_LOG_SIZE = 10000  # Channel changes kept for /api/channels/changes
+channel_change_log = deque()  # (library version, channel IP, 'added'/'changed'/'removed'), oldest first
+channel_change_log_floor = 0  # Clients at an older version than this must do a full resync
+channel_filter_index = {'group': {}, 'connectivity': {}, 'resolution': {}}  # Filter -> value -> set of channel IPs
+channel_filter_values = {}  # Channel IP -> filter -> set of values it is indexed under
+channel_filter_lock = threading.Lock()
+SEARCH_NGRAM_SIZE = 2  # Length of the character n-grams the search index is keyed by
+channel_search_keys = {}  # Channel IP -> ((name, tvg_id) indexed, lowercase search keys)
+channel_search_index = {}  # Character n-gram -> set of channel IPs with a search key containing it
+channel_search_lock = threading.Lock()
+CHANNEL_PAGE_MAX_SIZE = 10000  # Larger limit= values are clamped to this many channels
+DB_LISTING_TOTALS_CACHE_SIZE = 256  # Filter combinations whose database match count is kept
+db_listing_counts = {'written': None, 'stats': None, 'totals': {}}  # Counts of source=db listings, valid until the writer commits again
+db_listing_counts_lock = threading.Lock()
 current_test_id = None
 connectivity_tasks = {}  # Store connectivity test tasks status
+probe_flights = {}  # In-flight and recently succeeded stream probes, keyed by probe_key()
+probe_flights_lock = threading.Lock()
+PROBE_REUSE_SECONDS = 5  # Serve a finished successful probe result to latecomers for this long
+FIRST_BYTE_MARKER = 'Before avformat_find_stream_info()'  # Debug log line once the input is open and its first bytes are read
+connectivity_jobs = {}  # Single-channel connectivity jobs, keyed by job ID
+connectivity_job_by_ip = {}  # Running job ID per channel IP, for reattaching clients
+connectivity_jobs_lock = threading.Lock()
+CONNECTIVITY_JOB_DEFAULT_WAIT = 10  # Seconds a request long-polls a job by default
+CONNECTIVITY_JOB_MAX_WAIT = 25  # Upper bound for a single long-poll request
+CONNECTIVITY_JOB_RETENTION_SECONDS = 600  # Keep finished jobs around for late pollers
+COMPRESS_MIN_SIZE = 1024  # Responses smaller than this many bytes are sent uncompressed
+COMPRESS_MIMETYPES = ('application/json', 'text/plain')
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 5  # Higher qualities cost too much CPU on multi-megabyte responses
+COMPRESSED_CACHE_SIZE = 16  # Compressed bodies of ETag-tagged responses kept for reuse
+compressed_bodies = {}  # (ETag, request path and query, encoding) -> compressed body, oldest first
+compressed_bodies_lock = threading.Lock()
 
 # Initialize database
 db = None
+db_writer = None  # Single background writer all database writes go through
 
 # Initialize scheduler
 scheduler = BackgroundScheduler()
@@ -49,6 +100,16 @@ atexit.register(lambda: scheduler.shutdown())
 
 
 
+def parse_timeout(value, default=10):
+    """Timeout in seconds from a config value that may be a string, empty or invalid"""
+    if not value:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
 def load_config():
     """Load all configuration from file"""
     default_config = {}
@@ -68,6 +129,183 @@ def save_config(config):
         json.dump(config, f, indent=2, ensure_ascii=False)
 
 
+def probe_key(probe_func, url, config, screenshot_path=None):
+    """Coalescing key of a probe
+
+    Only probes of the same kind, stream, timeout and screenshot target can
+    stand in for each other: a quick ffprobe check records no screenshot or
+    resolution, and a scan capture writes a test-specific screenshot file.
+    The exception is a lightweight probe, which any full probe of the same
+    stream answers (see run_coalesced_probe).
+
+    Args:
+        probe_func: Probe function (quick_probe_stream, capture_stream, ...)
+        url: Stream URL
+        config: Config the probe runs with (for its timeout)
+        screenshot_path: Screenshot file the probe writes, if any
+    """
+    return (probe_func.__name__, url, config.get('timeout'), screenshot_path)
+
+
+def run_coalesced_probe(key, probe_func, reuse=True, lightweight=False):
+    """Run a stream probe once per probe key and share its outcome (single-flight)
+
+    Scans, retries, connectivity tasks and the scheduler may probe the same
+    stream at the same moment. The first caller runs probe_func, concurrent
+    callers wait for that run instead of starting their own FFmpeg, and a
+    successful result finished less than PROBE_REUSE_SECONDS ago is served to
+    latecomers. Failed results are only shared with callers that were
+    already waiting, so a later caller always probes again.
+
+    Args:
+        key: Coalescing key from probe_key()
+        probe_func: Callable returning a probe outcome dict
+        reuse: False to ignore finished results (retries must probe again);
+               a probe still in flight is joined either way
+        lightweight: The probe only checks that the stream is reachable, so a
+                     full probe (frame capture) of the same URL, running or
+                     reusable, answers it; only status, error and note of its
+                     outcome are passed on
+
+    Returns:
+        tuple: (outcome dict, True if the outcome came from another caller's probe)
+    """
+    with probe_flights_lock:
+        now = time.time()
+
+        # Drop finished probes that are too old to be reused
+        for old_key in [k for k, f in probe_flights.items()
+                        if f['finished_at'] is not None and now - f['finished_at'] >= PROBE_REUSE_SECONDS]:
+            del probe_flights[old_key]
+
+        flight = probe_flights.get(key)
+        if flight is None and lightweight:
+            flight = next((f for k, f in probe_flights.items() if k[1] == key[1] and k[0] != key[0]), None)
+        if flight is not None and not reuse and flight['finished_at'] is not None:
+            flight = None
+        is_owner = flight is None
+        if is_owner:
+            flight = {'event': threading.Event(), 'outcome': None, 'finished_at': None}
+            probe_flights[key] = flight
+
+    if not is_owner:
+        flight['event'].wait()
+        if lightweight:
+            return {k: v for k, v in flight['outcome'].items() if k in ('status', 'error', 'note')}, True
+        return dict(flight['outcome']), True
+
+    outcome = None
+    try:
+        outcome = probe_func()
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error probing {key[1]}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        outcome = {"status": "failed", "error": str(e)}
+    finally:
+        if outcome is None:
+            outcome = {"status": "failed", "error": "Probe aborted"}
+        with probe_flights_lock:
+            flight['outcome'] = outcome
+            flight['finished_at'] = time.time()
+            # Failures are not cached: the next caller gets a fresh probe
+            if outcome.get('status') != 'success' and probe_flights.get(key) is flight:
+                del probe_flights[key]
+        flight['event'].set()
+
+    return dict(outcome), False
+
+
+def resolution_fields(resolution):
+    """Typed width, height and resolution tier fields derived from a 'WIDTHxHEIGHT' string"""
+    width, height, tier = parse_resolution(resolution)
+    return {'width': width, 'height': height, 'resolution_tier': tier}
+
+
+def apply_connectivity_outcome(ip, outcome, offline_on_failure=False):
+    """Apply a probe outcome to a channel's connectivity fields
+
+    Args:
+        ip: Channel IP
+        outcome: Probe outcome dict (status, resolution, screenshot, error, note)
+        offline_on_failure: Always mark failures offline instead of only
+                            downgrading channels that were online
+
+    Returns:
+        dict: Connectivity result reported to the client
+    """
+    fields = {}
+
+    # A screenshot is kept even when no resolution could be detected
+    if outcome.get('screenshot'):
+        fields['screenshot'] = outcome['screenshot']
+
+    # Keep the last measurement when a probe (lightweight or failed) did not measure latency
+    for key in ('ttfb_ms', 'ttff_ms'):
+        if outcome.get(key) is not None:
+            fields[key] = outcome[key]
+
+    if outcome.get('status') == 'success':
+        connectivity = 'online'
+        if outcome.get('resolution'):
+            fields['resolution'] = outcome['resolution']
+            fields.update(resolution_fields(outcome['resolution']))
+    elif offline_on_failure:
+        connectivity = 'offline'
+    else:
+        # Test failed - set offline if previously online, otherwise keep current status
+        previous_connectivity = tv_channels[ip].get('connectivity', 'untested')
+        connectivity = 'offline' if previous_connectivity == 'online' else previous_connectivity
+
+    fields['connectivity'] = connectivity
+    fields['connectivity_time'] = datetime.now().isoformat()
+    fields['timestamp'] = datetime.now().isoformat()
+    channel = update_channel_record(ip, fields)
+
+    result = {
+        "ip": ip,
+        "connectivity": connectivity,
+        "screenshot": outcome.get('screenshot') if connectivity == 'online' else None,
+        "resolution": outcome.get('resolution'),
+        "ttfb_ms": channel.get('ttfb_ms'),
+        "ttff_ms": channel.get('ttff_ms'),
+        "name": channel.get('name', ''),
+        "timestamp": channel['timestamp']
+    }
+    message = outcome.get('error') or outcome.get('note')
+    if message:
+        result['message'] = message
+    return result
+
+
+def quick_probe_stream(url, config):
+    """Lightweight ffprobe check that a stream is reachable (no screenshot)
+
+    Returns:
+        dict: Probe outcome with status 'success' or 'failed'
+    """
+    timeout = parse_timeout(config.get("timeout"))
+
+    # Test stream connectivity using ffprobe (lightweight)
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', 'format=duration:stream=codec_name',
+        '-of', 'json',
+        '-timeout', str(timeout * 1000000),
+        url
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout+5)
+    except subprocess.TimeoutExpired:
+        return {"status": "failed", "error": f"Timeout after {timeout} seconds"}
+
+    if result.returncode == 0:
+        return {"status": "success"}
+    return {"status": "failed", "error": "Stream not accessible"}
+
+
 def test_channel_connectivity_simple(ip):
     """Simple connectivity test for a single channel (used by scheduled tasks)"""
     global tv_channels
@@ -79,45 +317,270 @@ def test_channel_connectivity_simple(ip):
     url = channel.get('url', '')
 
     if not url:
-        tv_channels[ip]['connectivity'] = 'offline'
-        tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-        tv_channels[ip]['timestamp'] = datetime.now().isoformat()
+        apply_connectivity_outcome(ip, {"status": "failed", "error": "No URL"}, offline_on_failure=True)
         return False
 
+    config = load_config()
+    outcome, _ = run_coalesced_probe(probe_key(quick_probe_stream, url, config),
+                                     lambda: quick_probe_stream(url, config), lightweight=True)
+    result = apply_connectivity_outcome(ip, outcome, offline_on_failure=True)
+    return result['connectivity'] == 'online'
+
+
+def run_timed_ffmpeg(cmd, timeout):
+    """Run an FFmpeg/ffprobe command and time the stream start-up within that same session
+
+    The command must log at debug level, where the demuxer reports the input as
+    open once its first bytes have been read (time to first byte). FFmpeg commands
+    writing an output should also pass -progress pipe:1, which reports the first
+    frame written (time to first frame).
+
+    Returns:
+        tuple: (returncode, stdout, stderr, ttfb_ms, ttff_ms); a latency is None
+               when the stream never got that far
+    Raises:
+        subprocess.TimeoutExpired: The process was killed after timeout seconds
+    """
+    start_time = time.time()
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    output = {'stdout': [], 'stderr': []}
+    latency = {'ttfb_ms': None, 'ttff_ms': None}
+
+    def read(name, stream, mark, reached):
+        for line in stream:
+            output[name].append(line)
+            if latency[mark] is None and reached(line):
+                latency[mark] = int((time.time() - start_time) * 1000)
+
+    readers = [
+        threading.Thread(target=read, daemon=True,
+                         args=('stderr', process.stderr, 'ttfb_ms', lambda line: FIRST_BYTE_MARKER in line)),
+        threading.Thread(target=read, daemon=True,
+                         args=('stdout', process.stdout, 'ttff_ms',
+                               lambda line: line.startswith('frame=') and line.strip() != 'frame=0'))
+    ]
+    for reader in readers:
+        reader.start()
+
     try:
-        config = load_config()
-        timeout = config.get("timeout") or 10
-        if isinstance(timeout, str):
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        try:
+            process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            process.terminate()
+        raise
+    finally:
+        for reader in readers:
+            reader.join(timeout=2)
+
+    return (process.returncode, ''.join(output['stdout']), ''.join(output['stderr']),
+            latency['ttfb_ms'], latency['ttff_ms'])
+
+
+def connectivity_screenshot_path(ip):
+    """Screenshot file written by connectivity probes of a channel"""
+    return os.path.join(SCREENSHOTS_DIR, f"connectivity_{ip.replace('.', '_')}.jpg")
+
+
+def probe_stream_connectivity(ip, url, config):
+    """Full connectivity probe: capture one frame and detect the stream resolution
+
+    Returns:
+        dict: Probe outcome with status, resolution, screenshot, error, note
+              and the ttfb_ms / ttff_ms start-up latencies
+    """
+    outcome = {"status": "failed", "resolution": None, "screenshot": None, "error": None, "note": None,
+               "ttfb_ms": None, "ttff_ms": None}
+
+    timeout = config.get("timeout") or 10
+    if isinstance(timeout, str):
+        try:
             timeout = int(timeout)
+        except:
+            timeout = 10
 
-        # Test stream connectivity using ffprobe (lightweight)
-        cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-show_entries', 'format=duration:stream=codec_name',
-            '-of', 'json',
-            '-timeout', str(timeout * 1000000),
-            url
-        ]
+    screenshot_path = connectivity_screenshot_path(ip)
 
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout+5)
+    # Build FFmpeg command for full stream test; debug logging and progress
+    # output let run_timed_ffmpeg() time the first byte and first frame
+    cmd = ["ffmpeg", "-y", "-v", "debug", "-progress", "pipe:1"]
 
-        if result.returncode == 0:
-            tv_channels[ip]['connectivity'] = 'online'
-            tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-            tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-            return True
-        else:
-            tv_channels[ip]['connectivity'] = 'offline'
-            tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-            tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-            return False
+    # Add timeout parameter for network streams (in microseconds)
+    cmd.extend(["-timeout", str(timeout * 1000000)])
+
+    # Add network timeout and analysis parameters BEFORE input
+    cmd.extend([
+        "-analyzeduration", "3000000",  # 3 seconds to analyze stream
+        "-probesize", "5000000"  # 5MB probe size
+    ])
+
+    # Add RTP-specific timeout if it's an RTP URL
+    if "rtp" in url.lower():
+        cmd.extend(["-rw_timeout", str(timeout * 1000000)])
+
+    # Add custom parameters if specified
+    custom_params = config.get("custom_params", "")
+    if custom_params and custom_params.strip():
+        import shlex
+        try:
+            custom_args = shlex.split(custom_params)
+            cmd.extend(custom_args)
+        except Exception as e:
+            print(f"[Connectivity Test] Error parsing custom params: {e}")
+
+    # Probe stream to detect resolution for 4K optimization
+    probe_cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-analyzeduration", "5000000",
+        "-probesize", "10000000",
+        "-t", "3",
+        "-i", url,
+        "-f", "null",
+        "-"
+    ]
+
+    detected_resolution = None
+    is_4k = False
+    try:
+        probe_process = subprocess.Popen(
+            probe_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        probe_stdout, probe_stderr = probe_process.communicate(timeout=8)
 
+        if probe_stderr:
+            import re
+            resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
+            match = re.search(resolution_pattern, probe_stderr)
+            if match:
+                detected_resolution = match.group(1)
+                width, height = map(int, detected_resolution.split('x'))
+                is_4k = width >= 3840
+                print(f"[Connectivity Test] Detected resolution: {detected_resolution} (4K: {is_4k})")
     except Exception as e:
-        tv_channels[ip]['connectivity'] = 'offline'
-        tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-        tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-        return False
+        print(f"[Connectivity Test] Probe failed, using default settings: {e}")
+
+    # Add input URL
+    cmd.extend(["-i", url])
+
+    # For 4K streams, capture first frame without scaling (keep original resolution)
+    if is_4k:
+        cmd.extend([
+            "-frames:v", "1",
+            "-q:v", "1",
+            "-vf", "yadif",
+            "-f", "image2",
+            screenshot_path
+        ])
+        print(f"[Connectivity Test] Using 4K capture mode (no scaling)")
+    else:
+        cmd.extend([
+            "-frames:v", "1",
+            "-q:v", "1",
+            "-vf", "yadif",
+            "-s", "1920x1080",
+            "-f", "image2",
+            screenshot_path
+        ])
+        print(f"[Connectivity Test] Using standard capture mode (1080p)")
+
+    # Execute FFmpeg with timeout
+    try:
+        returncode, stdout, stderr, ttfb_ms, ttff_ms = run_timed_ffmpeg(cmd, timeout)
+
+        # Parse resolution from stderr first
+        resolution = None
+        if stderr:
+            import re
+            resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
+            match = re.search(resolution_pattern, stderr)
+            if match:
+                resolution = match.group(1)
+                try:
+                    width, height = map(int, resolution.split('x'))
+                    if width > 0 and height > 0:
+                        print(f"[Connectivity Test] Detected resolution from FFmpeg: {resolution}")
+                    else:
+                        resolution = None
+                except:
+                    resolution = None
+
+        # For 4K streams, if we detected resolution in stderr, consider it successful even without screenshot
+        if is_4k and resolution and not os.path.exists(screenshot_path):
+            print(f"[Connectivity Test] 4K stream: FFmpeg detected stream info, marking as online even without screenshot")
+            outcome["status"] = "success"
+            outcome["resolution"] = resolution
+            outcome["note"] = "4K stream detected (no screenshot)"
+            outcome["ttfb_ms"] = ttfb_ms
+            outcome["ttff_ms"] = ttff_ms
+            return outcome
+
+        if returncode == 0 and os.path.exists(screenshot_path):
+            # Successfully captured screenshot
+            outcome["screenshot"] = f"/screenshots/{os.path.basename(screenshot_path)}"
+
+            # Only mark as online if valid resolution was detected
+            if resolution:
+                outcome["status"] = "success"
+                outcome["resolution"] = resolution
+                outcome["ttfb_ms"] = ttfb_ms
+                outcome["ttff_ms"] = ttff_ms
+                print(f"[Connectivity Test] Start-up latency: first byte {outcome['ttfb_ms']} ms, first frame {outcome['ttff_ms']} ms")
+            else:
+                outcome["error"] = "No resolution detected"
+            return outcome
+
+        # Try lightweight probe as fallback
+        probe_cmd = [
+            "ffprobe",
+            "-v", "debug",
+            "-show_entries", "stream=codec_type,width,height",
+            "-of", "default=noprint_wrappers=1"
+        ]
+
+        if "rtp" in url.lower() or "udp" in url.lower() or "http" in url.lower():
+            probe_cmd.extend(["-timeout", str(timeout * 1000000)])
+
+        probe_cmd.append(url)
+
+        try:
+            _, probe_stdout, probe_stderr, probe_ttfb_ms, _ = run_timed_ffmpeg(probe_cmd, timeout)
+            combined_output = (probe_stdout or "") + (probe_stderr or "")
+
+            if "codec_type=video" in combined_output or "Video:" in combined_output:
+                # Stream is accessible but screenshot failed
+                outcome["status"] = "success"
+                outcome["note"] = "Screenshot failed but stream accessible"
+                # The capture may have stalled before reaching the stream, then the probe timed the first byte
+                outcome["ttfb_ms"] = ttfb_ms if ttfb_ms is not None else probe_ttfb_ms
+                outcome["ttff_ms"] = ttff_ms
+
+                # Try to extract resolution
+                import re
+                width_match = re.search(r'width=(\d+)', combined_output)
+                height_match = re.search(r'height=(\d+)', combined_output)
+                if width_match and height_match:
+                    outcome["resolution"] = f"{width_match.group(1)}x{height_match.group(1)}"
+            else:
+                outcome["error"] = "Stream not accessible"
+
+        except (subprocess.TimeoutExpired, Exception):
+            outcome["error"] = "Failed to probe stream"
+
+    except subprocess.TimeoutExpired:
+        outcome["error"] = "Timeout"
+
+    return outcome
 
 
 def scheduled_test_connectivity():
@@ -300,7 +763,7 @@ def sync_metadata_core(metadata_urls):
     updated_count = 0
     matched_names = set()
 
-    for ip, channel in tv_channels.items():
+    for ip, channel in list(tv_channels.items()):
         channel_name = channel.get('name', '').lower().strip()
 
         if channel_name and channel_name in metadata_map:
@@ -311,33 +774,35 @@ def sync_metadata_core(metadata_urls):
             # Track if any field was actually updated
             updated = False
             updated_fields = []
+            fields = {}
 
             # Update logo
             if metadata.get('logo') and metadata['logo'] != channel.get('logo', ''):
-                channel['logo'] = metadata['logo']
+                fields['logo'] = metadata['logo']
                 updated = True
                 updated_fields.append('logo')
 
             # Update catchup
             if metadata.get('catchup') and metadata['catchup'] != channel.get('catchup', ''):
-                channel['catchup'] = metadata['catchup']
+                fields['catchup'] = metadata['catchup']
                 updated = True
                 updated_fields.append('catchup')
 
             # Update playback (catchup-source)
             if metadata.get('playback') and metadata['playback'] != channel.get('playback', ''):
-                channel['playback'] = metadata['playback']
+                fields['playback'] = metadata['playback']
                 updated = True
                 updated_fields.append('playback')
 
             # Update tvg_id
             if metadata.get('tvg_id') and metadata['tvg_id'] != channel.get('tvg_id', ''):
-                channel['tvg_id'] = metadata['tvg_id']
+                fields['tvg_id'] = metadata['tvg_id']
                 updated = True
                 updated_fields.append('tvg_id')
 
             if updated:
                 updated_count += 1
+                update_channel_record(ip, fields)
                 print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Updated channel '{channel.get('name')}' ({ip}): {', '.join(updated_fields)}")
 
     # Save updated channels to database
@@ -465,12 +930,51 @@ def load_channels():
     return tv_channels
 
 
+def mark_channel_dirty(ip):
+    """Record that a channel was changed in memory and must be written by the next save"""
+    with dirty_channels_lock:
+        dirty_channels.add(ip)
+    invalidate_channel_order([ip])
+    reindex_channel(ip)
+
+
+def update_channel_record(ip, fields):
+    """Replace a channel record with a copy carrying the changed fields
+
+    Records stored in tv_channels are never modified in place, so readers can
+    serialize them without copying. The channel is marked dirty.
+
+    Returns:
+        dict: The new record
+    """
+    channel = {**tv_channels[ip], **fields}
+    tv_channels[ip] = channel
+    mark_channel_dirty(ip)
+    return channel
+
+
 def save_channels():
-    """Save TV channels to database"""
-    try:
-        db.save_channels(copy.deepcopy(tv_channels))
-    except Exception as e:
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error saving channels: {str(e)}")
+    """Save channels changed since the last save to database in one transaction"""
+    with dirty_channels_lock:
+        ips = list(dirty_channels)
+        dirty_channels.clear()
+
+    # Deleted channels are removed from the database by their endpoint
+    # Records are replaced rather than modified, so the writer can keep references
+    changed = {ip: tv_channels[ip] for ip in ips if ip in tv_channels}
+    if changed:
+        db_writer.save_channels(changed, on_error=requeue_channel_writes)
+
+
+def requeue_channel_writes(ips):
+    """Keep channels whose database write failed dirty, so the next save retries them
+
+    Called from the database writer thread. Their in-memory records did not
+    change, so the library version stays as it is.
+    """
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Saving {len(ips)} channel(s) failed, retrying with the next save")
+    with dirty_channels_lock:
+        dirty_channels.update(ips)
 
 
 def parse_m3u(content):
@@ -656,34 +1160,301 @@ def update_channel_library(ip, result):
         'screenshot': result.get('screenshot', ''),
         'timestamp': result.get('timestamp', datetime.now().isoformat()),
         'resolution': result.get('resolution', ''),
+        **resolution_fields(result.get('resolution', '')),
         'test_status': test_status,  # Track if test succeeded or failed
         'connectivity': connectivity,  # Set based on test result
         'group': existing_group,
         'logo': existing_logo,
         'playback': existing_playback,
         'tvg_id': existing_tvg_id,
-        'catchup': existing_catchup
+        'catchup': existing_catchup,
+        'ttfb_ms': result.get('ttfb_ms'),
+        'ttff_ms': result.get('ttff_ms')
     }
+    mark_channel_dirty(ip)
     save_channels()
 
 
 def load_results():
-    """Load test results from database"""
+    """Load the most recent test results from database"""
     try:
-        return db.get_all_results()
+        summary = db.get_results_summary()
+        recent = sorted(summary, key=lambda test_id: summary[test_id].get('start_time') or '')[-RESULTS_IN_MEMORY:]
+        return db.get_results(recent)
     except Exception as e:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error loading results: {str(e)}")
         return {}
 
 
-def save_results():
-    """Save test results to database"""
+def save_test(test_id):
+    """Save a test's metadata to database"""
+    test = test_results.get(test_id)
+    if test is not None:
+        db_writer.save_test(test_id, {key: test.get(key) for key in TEST_METADATA_KEYS})
+
+
+def save_test_result(test_id, ip):
+    """Save one target's result of a test to database"""
+    result = test_results.get(test_id, {}).get('results', {}).get(ip)
+    if result is not None:
+        db_writer.save_result_item(test_id, ip, dict(result))
+
+
+def prune_results(config):
+    """Drop tests older than the retention period and keep memory to the most recent ones"""
+    retention_days = config.get('results_retention_days') or RESULTS_RETENTION_DAYS
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    db_writer.submit(db.delete_results_before, cutoff)
+    for test_id in [test_id for test_id, test in test_results.items() if (test.get('start_time') or cutoff) < cutoff]:
+        del test_results[test_id]
+
+    # Older tests remain available from the database
+    while len(test_results) >= RESULTS_IN_MEMORY:
+        oldest_test_id = min(test_results, key=lambda test_id: test_results[test_id].get('start_time') or '')
+        del test_results[oldest_test_id]
+
+
+def capture_stream(url, ip, screenshot_path, config):
+    """Capture one frame from a stream with FFmpeg, falling back to a plain probe
+
+    Returns:
+        dict: Probe outcome with status, resolution, screenshot, error, note
+              and the ttfb_ms / ttff_ms start-up latencies
+    """
+    outcome = {"status": "failed", "resolution": None, "screenshot": None, "error": None, "note": None,
+               "ttfb_ms": None, "ttff_ms": None}
+
+    # Build FFmpeg command
+    timeout = config.get("timeout") or 10  # Use 10 if timeout is None or empty
+    if isinstance(timeout, str):
+        try:
+            timeout = int(timeout)
+        except:
+            timeout = 10
+    custom_params = config.get("custom_params", "")
+
+    # Debug logging and progress output let run_timed_ffmpeg() time the first byte and first frame
+    cmd = ["ffmpeg", "-y", "-v", "debug", "-progress", "pipe:1"]
+
+    # Add timeout parameter for network streams (in microseconds)
+    cmd.extend(["-timeout", str(timeout * 1000000)])
+
+    # Add network timeout and analysis parameters BEFORE input
+    # These must come before -i flag
+    cmd.extend([
+        "-analyzeduration", "3000000",  # 3 seconds to analyze stream
+        "-probesize", "5000000"  # 5MB probe size
+    ])
+
+    # Add RTP-specific timeout if it's an RTP URL
+    if "rtp" in url.lower():
+        # For RTP, we can use -rw_timeout (in microseconds)
+        cmd.extend(["-rw_timeout", str(timeout * 1000000)])
+
+    # Add custom parameters if specified (like hardware acceleration)
+    if custom_params and custom_params.strip():
+        # Use shlex to properly split shell-like strings
+        import shlex
+        try:
+            custom_args = shlex.split(custom_params)
+            cmd.extend(custom_args)
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Custom params added: {custom_args}")
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error parsing custom params: {e}")
+
+    # For 4K streams, we need to read more data before capturing
+    # First, probe the stream to detect resolution
+    probe_cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-analyzeduration", "5000000",  # 5 seconds for 4K streams
+        "-probesize", "10000000",       # 10MB probe size for 4K
+        "-t", "3",  # Probe for 3 seconds
+        "-i", url,
+        "-f", "null",
+        "-"
+    ]
+
+    # Quick probe to detect resolution
+    detected_resolution = None
+    is_4k = False
     try:
-        db.save_results(copy.deepcopy(test_results))
+        probe_process = subprocess.Popen(
+            probe_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        probe_stdout, probe_stderr = probe_process.communicate(timeout=8)
+
+        # Parse resolution from probe
+        if probe_stderr:
+            import re
+            resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
+            match = re.search(resolution_pattern, probe_stderr)
+            if match:
+                detected_resolution = match.group(1)
+                width, height = map(int, detected_resolution.split('x'))
+                is_4k = width >= 3840  # 4K or higher
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Detected resolution: {detected_resolution} (4K: {is_4k})")
     except Exception as e:
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error in save_results: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Probe failed, using default settings: {e}")
+
+    # Add input URL
+    cmd.extend(["-i", url])
+
+    # For 4K streams, capture first frame without scaling (keep original resolution)
+    # For other streams, capture the first frame and scale to 1080p
+    if is_4k:
+        cmd.extend([
+            "-frames:v", "1",  # Capture 1 frame
+            "-q:v", "1",       # Highest quality
+            "-vf", "yadif",    # Deinterlace
+            "-f", "image2",
+            screenshot_path
+        ])
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Using 4K capture mode (no scaling)")
+    else:
+        cmd.extend([
+            "-frames:v", "1",  # Capture only 1 frame (first frame)
+            "-q:v", "1",       # Highest quality (1-31, lower is better)
+            "-vf", "yadif",    # Deinterlace for clearer image
+            "-s", "1920x1080", # Full HD resolution for better OCR
+            "-f", "image2",
+            screenshot_path
+        ])
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Using standard capture mode (1080p scaled)")
+
+    # Log the FFmpeg command
+    cmd_str = ' '.join(cmd)
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] FFmpeg command: {cmd_str}")
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Timeout: {timeout}s")
+
+    # Execute FFmpeg with timeout
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Executing FFmpeg...")
+    start_time = time.time()
+    try:
+        returncode, stdout, stderr, ttfb_ms, ttff_ms = run_timed_ffmpeg(cmd, timeout)
+        elapsed_time = time.time() - start_time
+
+        if returncode == 0 and os.path.exists(screenshot_path):
+            # Successfully captured screenshot
+            outcome["screenshot"] = f"/screenshots/{os.path.basename(screenshot_path)}"
+
+            # Parse resolution from ffmpeg output - REQUIRED for success
+            resolution = None
+            if stderr:
+                # Look for Stream info in ffmpeg stderr
+                import re
+                # Pattern to match resolution like "1920x1080" or "720x576"
+                resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
+                match = re.search(resolution_pattern, stderr)
+                if match:
+                    resolution = match.group(1)
+                    # Validate resolution - must not be 0x0 or invalid
+                    width, height = map(int, resolution.split('x'))
+                    if width > 0 and height > 0:
+                        outcome["resolution"] = resolution
+                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Resolution detected: {resolution}")
+                    else:
+                        resolution = None
+                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Invalid resolution detected: {match.group(1)}")
+
+            # Only mark as success if valid resolution was detected
+            if resolution:
+                outcome["status"] = "success"
+                outcome["ttfb_ms"] = ttfb_ms
+                outcome["ttff_ms"] = ttff_ms
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✓ SUCCESS: Channel {ip} captured successfully")
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Time taken: {elapsed_time:.2f} seconds")
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Start-up latency: first byte {outcome['ttfb_ms']} ms, first frame {outcome['ttff_ms']} ms")
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Screenshot saved: {screenshot_path}")
+            else:
+                outcome["status"] = "failed"
+                outcome["error"] = "No resolution detected"
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✗ FAILED: Channel {ip} - No resolution detected")
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Screenshot was captured but no video resolution found")
+        else:
+            # First attempt failed, try just probing the stream
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Screenshot failed, trying stream probe with ffmpeg -i...")
+
+            # Second fallback: just check if stream is accessible
+            probe_cmd = [
+                "ffmpeg",
+                "-hide_banner",
+                "-v", "debug",
+                "-analyzeduration", "10000000",  # 10 seconds for better detection
+                "-probesize", "20000000",  # 20MB for better detection
+            ]
+
+            # Add timeout for RTP/UDP
+            if "rtp" in url.lower() or "udp" in url.lower():
+                probe_cmd.extend(["-timeout", str(timeout * 2000000)])  # Double timeout
+
+            # Just probe the input
+            probe_cmd.extend(["-i", url])
+
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Probe command: {' '.join(probe_cmd)}")
+
+            try:
+                _, probe_stdout, probe_stderr, probe_ttfb_ms, _ = run_timed_ffmpeg(probe_cmd, 15)
+
+                # Combine stdout and stderr for checking (FFmpeg may output to either)
+                combined_output = (probe_stdout or "") + (probe_stderr or "")
+
+                # Check if we got stream information in either output
+                # Look for "Stream #" and "Video:" or "Input #" which indicates successful stream detection
+                # Note: ffmpeg -i returns exit code 1 even when successful (no output file specified)
+                # So we check the output content instead of return code
+                if combined_output and (("Stream #" in combined_output and "Video:" in combined_output) or
+                                        ("Input #" in combined_output and ("Duration:" in combined_output or "mpegts" in combined_output))):
+                    # Stream is accessible, even though screenshot failed
+                    outcome["status"] = "success"
+                    outcome["error"] = None
+                    outcome["note"] = "Stream accessible but screenshot failed"
+                    # No frame was captured; the probe times the first byte if the capture never got there
+                    outcome["ttfb_ms"] = ttfb_ms if ttfb_ms is not None else probe_ttfb_ms
+                    outcome["ttff_ms"] = ttff_ms
+
+                    # Try to get resolution from probe
+                    import re
+                    resolution_pattern = r'Stream.*Video.*?(\d{3,4}x\d{3,4})'
+                    match = re.search(resolution_pattern, combined_output)
+                    if match:
+                        outcome["resolution"] = match.group(1)
+                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Resolution detected: {match.group(1)}")
+
+                    # Also check for codec info
+                    if "hevc" in combined_output.lower():
+                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Codec: HEVC/H.265")
+                    elif "h264" in combined_output.lower():
+                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Codec: H.264")
+
+                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✓ SUCCESS (probe): Channel {ip} is accessible (no screenshot)")
+                else:
+                    # Stream really is not accessible
+                    outcome["status"] = "failed"
+                    outcome["error"] = "Stream not accessible"
+                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✗ FAILED: Channel {ip} is not accessible")
+
+                    # Log what we got for debugging
+                    if combined_output:
+                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Probe output: ...{combined_output[-200:]}")
+
+            except (subprocess.TimeoutExpired, Exception) as probe_error:
+                # Even probe failed
+                outcome["status"] = "failed"
+                outcome["error"] = "Failed to probe stream"
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✗ FAILED: Channel {ip} probe failed")
+
+    except subprocess.TimeoutExpired:
+        elapsed_time = time.time() - start_time
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ⏱ TIMEOUT: Channel {ip} exceeded {timeout} seconds, FFmpeg process killed")
+        outcome["status"] = "failed"
+        outcome["error"] = f"Timeout after {timeout} seconds"
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Time elapsed: {elapsed_time:.2f} seconds")
+
+    return outcome
 
 
 def test_iptv_stream(base_url, ip, test_id, config, is_retry=False):
@@ -731,9 +1502,10 @@ def test_iptv_stream(base_url, ip, test_id, config, is_retry=False):
             test_results[test_id]["results"] = {}
 
         # No lock needed - Python's GIL handles dictionary updates atomically
-        test_results[test_id]["results"][ip_key] = result
+        # Publish a copy: result records are replaced, never modified, once stored
+        test_results[test_id]["results"][ip_key] = dict(result)
         # Save immediately to update UI
-        save_results()
+        save_test_result(test_id, ip_key)
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Initial 'testing' status saved for {ip}")
     except Exception as e:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error saving initial result: {str(e)}")
@@ -747,254 +1519,24 @@ def test_iptv_stream(base_url, ip, test_id, config, is_retry=False):
         screenshot_path = os.path.join(SCREENSHOTS_DIR, f"{test_id}_{ip.replace('.', '_')}.jpg")
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Screenshot path: {screenshot_path}")
 
-        # Build FFmpeg command
-        timeout = config.get("timeout") or 10  # Use 10 if timeout is None or empty
-        if isinstance(timeout, str):
-            try:
-                timeout = int(timeout)
-            except:
-                timeout = 10
-        custom_params = config.get("custom_params", "")
-
-        cmd = ["ffmpeg", "-y"]
-
-        # Add timeout parameter for network streams (in microseconds)
-        cmd.extend(["-timeout", str(timeout * 1000000)])
-
-        # Add network timeout and analysis parameters BEFORE input
-        # These must come before -i flag
-        cmd.extend([
-            "-analyzeduration", "3000000",  # 3 seconds to analyze stream
-            "-probesize", "5000000"  # 5MB probe size
-        ])
-
-        # Add RTP-specific timeout if it's an RTP URL
-        if "rtp" in url.lower():
-            # For RTP, we can use -rw_timeout (in microseconds)
-            cmd.extend(["-rw_timeout", str(timeout * 1000000)])
-
-        # Add custom parameters if specified (like hardware acceleration)
-        if custom_params and custom_params.strip():
-            # Use shlex to properly split shell-like strings
-            import shlex
-            try:
-                custom_args = shlex.split(custom_params)
-                cmd.extend(custom_args)
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Custom params added: {custom_args}")
-            except Exception as e:
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error parsing custom params: {e}")
-
-        # For 4K streams, we need to read more data before capturing
-        # First, probe the stream to detect resolution
-        probe_cmd = [
-            "ffmpeg",
-            "-hide_banner",
-            "-analyzeduration", "5000000",  # 5 seconds for 4K streams
-            "-probesize", "10000000",       # 10MB probe size for 4K
-            "-t", "3",  # Probe for 3 seconds
-            "-i", url,
-            "-f", "null",
-            "-"
-        ]
-
-        # Quick probe to detect resolution
-        detected_resolution = None
-        is_4k = False
-        try:
-            probe_process = subprocess.Popen(
-                probe_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            probe_stdout, probe_stderr = probe_process.communicate(timeout=8)
-
-            # Parse resolution from probe
-            if probe_stderr:
-                import re
-                resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
-                match = re.search(resolution_pattern, probe_stderr)
-                if match:
-                    detected_resolution = match.group(1)
-                    width, height = map(int, detected_resolution.split('x'))
-                    is_4k = width >= 3840  # 4K or higher
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Detected resolution: {detected_resolution} (4K: {is_4k})")
-        except Exception as e:
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Probe failed, using default settings: {e}")
-
-        # Add input URL
-        cmd.extend(["-i", url])
-
-        # For 4K streams, capture first frame without scaling (keep original resolution)
-        # For other streams, capture the first frame and scale to 1080p
-        if is_4k:
-            cmd.extend([
-                "-frames:v", "1",  # Capture 1 frame
-                "-q:v", "1",       # Highest quality
-                "-vf", "yadif",    # Deinterlace
-                "-f", "image2",
-                screenshot_path
-            ])
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Using 4K capture mode (no scaling)")
-        else:
-            cmd.extend([
-                "-frames:v", "1",  # Capture only 1 frame (first frame)
-                "-q:v", "1",       # Highest quality (1-31, lower is better)
-                "-vf", "yadif",    # Deinterlace for clearer image
-                "-s", "1920x1080", # Full HD resolution for better OCR
-                "-f", "image2",
-                screenshot_path
-            ])
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Using standard capture mode (1080p scaled)")
-
-        # Log the FFmpeg command
-        cmd_str = ' '.join(cmd)
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] FFmpeg command: {cmd_str}")
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Timeout: {timeout}s")
-
-        # Execute FFmpeg with timeout
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Executing FFmpeg...")
-        start_time = time.time()
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
-
-        try:
-            stdout, stderr = process.communicate(timeout=timeout)
-            elapsed_time = time.time() - start_time
-
-            if process.returncode == 0 and os.path.exists(screenshot_path):
-                # Successfully captured screenshot
-                result["screenshot"] = f"/screenshots/{os.path.basename(screenshot_path)}"
-
-                # Parse resolution from ffmpeg output - REQUIRED for success
-                resolution = None
-                if stderr:
-                    # Look for Stream info in ffmpeg stderr
-                    import re
-                    # Pattern to match resolution like "1920x1080" or "720x576"
-                    resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
-                    match = re.search(resolution_pattern, stderr)
-                    if match:
-                        resolution = match.group(1)
-                        # Validate resolution - must not be 0x0 or invalid
-                        width, height = map(int, resolution.split('x'))
-                        if width > 0 and height > 0:
-                            result["resolution"] = resolution
-                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Resolution detected: {resolution}")
-                        else:
-                            resolution = None
-                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Invalid resolution detected: {match.group(1)}")
-
-                # Only mark as success if valid resolution was detected
-                if resolution:
-                    result["status"] = "success"
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✓ SUCCESS: Channel {ip} captured successfully")
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Time taken: {elapsed_time:.2f} seconds")
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Screenshot saved: {screenshot_path}")
-                else:
-                    result["status"] = "failed"
-                    result["error"] = "No resolution detected"
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✗ FAILED: Channel {ip} - No resolution detected")
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Screenshot was captured but no video resolution found")
-            else:
-                # First attempt failed, try just probing the stream
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Screenshot failed, trying stream probe with ffmpeg -i...")
-
-                # Second fallback: just check if stream is accessible
-                probe_cmd = [
-                    "ffmpeg",
-                    "-hide_banner",
-                    "-analyzeduration", "10000000",  # 10 seconds for better detection
-                    "-probesize", "20000000",  # 20MB for better detection
-                ]
-
-                # Add timeout for RTP/UDP
-                if "rtp" in url.lower() or "udp" in url.lower():
-                    probe_cmd.extend(["-timeout", str(timeout * 2000000)])  # Double timeout
-
-                # Just probe the input
-                probe_cmd.extend(["-i", url])
-
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Probe command: {' '.join(probe_cmd)}")
-
-                try:
-                    probe_process = subprocess.Popen(
-                        probe_cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        universal_newlines=True
-                    )
-
-                    probe_stdout, probe_stderr = probe_process.communicate(timeout=15)
-
-                    # Combine stdout and stderr for checking (FFmpeg may output to either)
-                    combined_output = (probe_stdout or "") + (probe_stderr or "")
-
-                    # Check if we got stream information in either output
-                    # Look for "Stream #" and "Video:" or "Input #" which indicates successful stream detection
-                    # Note: ffmpeg -i returns exit code 1 even when successful (no output file specified)
-                    # So we check the output content instead of return code
-                    if combined_output and (("Stream #" in combined_output and "Video:" in combined_output) or
-                                            ("Input #" in combined_output and ("Duration:" in combined_output or "mpegts" in combined_output))):
-                        # Stream is accessible, even though screenshot failed
-                        result["status"] = "success"
-                        result["error"] = None
-                        result["note"] = "Stream accessible but screenshot failed"
-
-                        # Try to get resolution from probe
-                        import re
-                        resolution_pattern = r'Stream.*Video.*?(\d{3,4}x\d{3,4})'
-                        match = re.search(resolution_pattern, combined_output)
-                        if match:
-                            result["resolution"] = match.group(1)
-                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Resolution detected: {match.group(1)}")
-
-                        # Also check for codec info
-                        if "hevc" in combined_output.lower():
-                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Codec: HEVC/H.265")
-                        elif "h264" in combined_output.lower():
-                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Codec: H.264")
-
-                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✓ SUCCESS (probe): Channel {ip} is accessible (no screenshot)")
-                    else:
-                        # Stream really is not accessible
-                        result["status"] = "failed"
-                        result["error"] = "Stream not accessible"
-                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✗ FAILED: Channel {ip} is not accessible")
-
-                        # Log what we got for debugging
-                        if combined_output:
-                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Probe output: {combined_output[:200]}...")
-
-                except (subprocess.TimeoutExpired, Exception) as probe_error:
-                    # Even probe failed
-                    result["status"] = "failed"
-                    result["error"] = "Failed to probe stream"
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✗ FAILED: Channel {ip} probe failed")
-                    if hasattr(locals().get('probe_process'), 'kill'):
-                        try:
-                            probe_process.kill()
-                        except:
-                            pass
-
-        except subprocess.TimeoutExpired:
-            elapsed_time = time.time() - start_time
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ⏱ TIMEOUT: Channel {ip} exceeded {timeout} seconds")
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Killing FFmpeg process...")
-            process.kill()
-            # Wait a bit for the process to terminate
-            try:
-                process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                # Force kill if it's still running
-                process.terminate()
-            result["status"] = "failed"
-            result["error"] = f"Timeout after {timeout} seconds"
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]   Time elapsed: {elapsed_time:.2f} seconds")
+        # Concurrent probes of the same stream (scan, retry, connectivity) share one FFmpeg run;
+        # retries never take a finished result
+        outcome, shared = run_coalesced_probe(probe_key(capture_stream, url, config, screenshot_path),
+                                              lambda: capture_stream(url, ip, screenshot_path, config),
+                                              reuse=not is_retry)
+        if shared:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Reused concurrent probe result for {url}")
+
+        result["status"] = outcome["status"]
+        result["error"] = outcome.get("error")
+        if outcome.get("screenshot"):
+            result["screenshot"] = outcome["screenshot"]
+        if outcome.get("resolution"):
+            result["resolution"] = outcome["resolution"]
+        if outcome.get("note"):
+            result["note"] = outcome["note"]
+        result["ttfb_ms"] = outcome.get("ttfb_ms")
+        result["ttff_ms"] = outcome.get("ttff_ms")
 
     except Exception as e:
         result["status"] = "failed"
@@ -1020,7 +1562,7 @@ def test_iptv_stream(base_url, ip, test_id, config, is_retry=False):
                 if not is_retry:
                     test_results[test_id]["completed"] += 1
                 # Save immediately to update UI
-                save_results()
+                save_test_result(test_id, ip_key)
                 print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Results saved to file")
 
                 # Update channel library for all results (both successful and failed)
@@ -1035,11 +1577,127 @@ def test_iptv_stream(base_url, ip, test_id, config, is_retry=False):
 
 
 
-def run_batch_test(base_url, start_ip, end_ip, test_id):
-    """Run batch test for IP range"""
-    config = load_config()
+def start_bounded_threads(target, args_list, queue_size):
+    """Start one daemon thread per argument tuple, keeping at most queue_size alive
 
-    # Get queue size from config, default to 5
+    Blocks until the last thread has been started, then returns the threads
+    that are still running so the caller can leave them in the background.
+    """
+    threads = []
+    for args in args_list:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting thread for IP: {args[1]}")
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True  # Make threads daemon so they don't block
+        thread.start()
+        threads.append(thread)
+
+        # Limit concurrent threads to avoid overwhelming the system
+        # Clean up completed threads
+        if len(threads) >= queue_size:
+            # Remove completed threads from list
+            alive_threads = [t for t in threads if t.is_alive()]
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Active threads: {len(alive_threads)}/{queue_size}")
+            threads = alive_threads
+
+            # If still at capacity, wait briefly
+            while len(threads) >= queue_size:
+                time.sleep(0.1)
+                threads = [t for t in threads if t.is_alive()]
+
+    return threads
+
+
+def select_retry_targets(test_id, retry_filter):
+    """Select IPs of a test whose results match a retry filter
+
+    Args:
+        test_id: Test to select from
+        retry_filter: 'failed' for all failures, 'timeout' for timeouts only,
+                      'transient' for timeouts and failed stream probes
+
+    Returns:
+        list: Matching IPs
+    """
+    targets = []
+    for ip, result in test_results.get(test_id, {}).get('results', {}).items():
+        if result.get('status') != 'failed':
+            continue
+        error = result.get('error') or ''
+        if retry_filter == 'timeout' and not error.startswith('Timeout after'):
+            continue
+        if retry_filter == 'transient' and not (error.startswith('Timeout after') or error == 'Failed to probe stream'):
+            continue
+        targets.append(ip)
+    return targets
+
+
+def run_bulk_retry(test_id, ips, config, queue_size, label='retry'):
+    """Retest a set of IPs of an existing test on a bounded pool of threads
+
+    Progress is reported on test_results[test_id][label] with the same
+    total/completed counters as a normal scan, plus how many were recovered.
+    Blocks until all retries have finished.
+    """
+    base_url = test_results[test_id]['base_url']
+    progress = {
+        "status": "running",
+        "total": len(ips),
+        "completed": 0,
+        "recovered": 0,
+        "timeout": config.get('timeout'),
+        "queue_size": queue_size,
+        "start_time": datetime.now().isoformat()
+    }
+    test_results[test_id][label] = progress
+    progress_lock = threading.Lock()
+
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting {label} of {len(ips)} IP(s) for test {test_id} (queue size {queue_size})")
+
+    def retry_one(base_url, ip, test_id, config):
+        test_iptv_stream(base_url, ip, test_id, config, is_retry=True)
+        result = test_results.get(test_id, {}).get('results', {}).get(ip, {})
+        with progress_lock:
+            progress["completed"] += 1
+            if result.get('status') == 'success':
+                progress["recovered"] += 1
+
+    threads = start_bounded_threads(retry_one, [(base_url, ip, test_id, config) for ip in ips], queue_size)
+    for thread in threads:
+        thread.join()
+
+    progress["status"] = "completed"
+    progress["end_time"] = datetime.now().isoformat()
+
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {label.capitalize()} of test {test_id} completed: {progress['recovered']}/{len(ips)} recovered")
+    return progress
+
+
+def run_second_pass(test_id, config, queue_size):
+    """Rescan transient failures of a finished scan at lower concurrency
+
+    Only targets that failed with a timeout or a failed probe are retried,
+    since those are often caused by the load of the scan itself.
+    """
+    ips = select_retry_targets(test_id, 'transient')
+    if not ips:
+        return None
+
+    second_pass_config = dict(config)
+    timeout = parse_timeout(config.get('timeout'))
+    second_pass_config['timeout'] = parse_timeout(config.get('second_pass_timeout'), timeout * 2)
+
+    second_pass_queue_size = config.get('second_pass_queue_size')
+    if not isinstance(second_pass_queue_size, int) or second_pass_queue_size < 1:
+        second_pass_queue_size = max(1, queue_size // 2)
+
+    return run_bulk_retry(test_id, ips, second_pass_config, second_pass_queue_size, label='second_pass')
+
+
+def run_batch_test(base_url, start_ip, end_ip, test_id):
+    """Run batch test for IP range"""
+    config = load_config()
+
+    # Get queue size from config, default to 5
     queue_size = config.get('queue_size', 5)
     if not isinstance(queue_size, int) or queue_size < 1:
         queue_size = 5
@@ -1060,11 +1718,7 @@ def run_batch_test(base_url, start_ip, end_ip, test_id):
     print(f"{'='*60}\n")
 
     # Initialize test results without clearing old tests
-    # Keep a maximum of 10 test results to avoid unlimited growth
-    if len(test_results) >= 10:
-        # Remove the oldest test (based on sorting by key which are UUIDs with timestamps)
-        oldest_test_id = min(test_results.keys())
-        del test_results[oldest_test_id]
+    prune_results(config)
 
     # Ensure base_url contains {ip} placeholder
     if '{ip}' not in base_url:
@@ -1081,29 +1735,11 @@ def run_batch_test(base_url, start_ip, end_ip, test_id):
         "results": {},
         "start_time": datetime.now().isoformat()
     }
+    save_test(test_id)
 
     # Test each IP
-    threads = []
-    for i in range(start_num, end_num + 1):
-        ip = f"{base}.{i}"
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting thread for IP: {ip}")
-        thread = threading.Thread(target=test_iptv_stream, args=(base_url, ip, test_id, config))
-        thread.daemon = True  # Make threads daemon so they don't block
-        thread.start()
-        threads.append(thread)
-
-        # Limit concurrent threads to avoid overwhelming the system
-        # Clean up completed threads
-        if len(threads) >= queue_size:
-            # Remove completed threads from list
-            alive_threads = [t for t in threads if t.is_alive()]
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Active threads: {len(alive_threads)}/{queue_size}")
-            threads = alive_threads
-
-            # If still at capacity, wait briefly
-            while len(threads) >= queue_size:
-                time.sleep(0.1)
-                threads = [t for t in threads if t.is_alive()]
+    ips = [f"{base}.{i}" for i in range(start_num, end_num + 1)]
+    start_bounded_threads(test_iptv_stream, [(base_url, ip, test_id, config) for ip in ips], queue_size)
 
     # Don't wait for all threads to complete - let them run in background
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] All {end_num - start_num + 1} test threads started")
@@ -1133,12 +1769,16 @@ def run_batch_test(base_url, start_ip, end_ip, test_id):
 
             # Check if all tests are completed
             if completed >= total_ips:
+                # Keep the test running while transient failures get a second chance
+                second_pass = run_second_pass(test_id, config, queue_size) if config.get('second_pass') else None
+
                 test_results[test_id]["status"] = "completed"
+                test_results[test_id]["end_time"] = datetime.now().isoformat()
                 total_success = sum(1 for r in test_results[test_id]["results"].values() if r["status"] == "success")
                 total_failed = sum(1 for r in test_results[test_id]["results"].values() if r["status"] == "failed")
 
                 # Save results
-                save_results()
+                save_test(test_id)
 
                 print(f"\n{'='*60}")
                 print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] BATCH TEST COMPLETED")
@@ -1147,6 +1787,8 @@ def run_batch_test(base_url, start_ip, end_ip, test_id):
                 print(f"Success: {total_success} ✓")
                 print(f"Failed: {total_failed} ✗")
                 print(f"Success Rate: {(total_success / (total_success + total_failed) * 100) if (total_success + total_failed) > 0 else 0:.1f}%")
+                if second_pass:
+                    print(f"Recovered by second pass: {second_pass['recovered']}/{second_pass['total']}")
                 print(f"{'='*60}\n")
                 break
 
@@ -1192,6 +1834,20 @@ def handle_config():
         return jsonify({"status": "success", "config": config})
 
 
+@app.route('/api/db/stats')
+def get_db_stats():
+    """Get database connection checkout and write queue statistics"""
+    return jsonify({"status": "success", "stats": db.get_pool_stats(), "writer": db_writer.get_stats()})
+
+
+@app.route('/api/db/flush', methods=['POST'])
+def flush_db_writes():
+    """Wait until all queued database writes have been committed"""
+    if not db_writer.flush(timeout=30):
+        return jsonify({"status": "error", "message": "Timed out waiting for database writes"}), 504
+    return jsonify({"status": "success", "writer": db_writer.get_stats()})
+
+
 @app.route('/api/scheduled-tasks', methods=['GET', 'POST'])
 def handle_scheduled_tasks():
     """Get or update scheduled tasks configuration"""
@@ -1274,14 +1930,98 @@ def start_test():
     return jsonify({"status": "started", "test_id": test_id})
 
 
+def requested_fields():
+    """Field names selected with the fields= parameter, or None for all fields"""
+    names = {name.strip() for name in request.args.get('fields', '').split(',')}
+    names.discard('')
+    return names or None
+
+
+def page_argument(name, minimum, maximum=None):
+    """Integer paging parameter (limit, offset) of the request
+
+    Returns:
+        int: The value, clamped to maximum; None when the parameter is omitted
+    Raises:
+        ValueError: The value is not an integer or below minimum
+    """
+    value = request.args.get(name, '')
+    if value == '':
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return min(number, maximum) if maximum is not None else number
+
+
+def project_fields(record, fields, always=()):
+    """Restrict a record to the requested fields and the ones in always"""
+    if fields is None:
+        return record
+    return {key: value for key, value in record.items() if key in fields or key in always}
+
+
+def test_snapshot(test, fields=None):
+    """Snapshot of a test that is safe to serialize while scans keep writing to it
+
+    Per-IP result records are replaced, never modified, once stored, so only
+    the containers (results and progress dicts) are copied.
+
+    Args:
+        test: Test metadata with its results keyed by IP
+        fields: Result fields to keep (from requested_fields()), None for all
+    """
+    snapshot = dict(test)
+    for key, value in snapshot.items():
+        if key == 'results' and fields is not None:
+            snapshot[key] = {ip: project_fields(result, fields) for ip, result in list(value.items())}
+        elif isinstance(value, dict):
+            snapshot[key] = dict(value)
+    return snapshot
+
+
 @app.route('/api/test/status/<test_id>')
 def get_test_status(test_id):
-    """Get status of a running test"""
-    # No lock needed for reading
-    if test_id in test_results:
-        # Make a copy to avoid issues during JSON serialization
-        return jsonify(copy.deepcopy(test_results[test_id]))
-    return jsonify({"error": "Test not found"}), 404
+    """Get status of a running test
+
+    With any of status/limit/offset given, results are filtered and paged
+    in the database and returned as a list together with per-status counts.
+    fields= limits the serialized fields of each result (ip is always kept
+    in the paged list).
+    """
+    paged = any(key in request.args for key in ('status', 'limit', 'offset'))
+    fields = requested_fields()
+
+    if not paged:
+        # No lock needed for reading
+        if test_id in test_results:
+            # Snapshot to avoid issues during JSON serialization
+            return jsonify(test_snapshot(test_results[test_id], fields))
+        # Older tests are only kept in the database
+        test = db.get_result(test_id)
+        if test:
+            return jsonify(test_snapshot(test, fields) if fields is not None else test)
+        return jsonify({"error": "Test not found"}), 404
+
+    # Make sure results written by running scans are visible to SQL
+    db_writer.flush(timeout=5)
+
+    test = {key: value for key, value in test_results[test_id].items() if key != 'results'} \
+        if test_id in test_results else db.get_results_summary().get(test_id)
+    if not test:
+        return jsonify({"error": "Test not found"}), 404
+
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', 0, type=int)
+    items = db.get_result_items(test_id, status=request.args.get('status') or None, limit=limit, offset=offset)
+    test['results'] = [project_fields(item, fields, always=('ip',)) for item in items]
+    test['counts'] = db.count_result_items(test_id)
+    test['limit'] = limit
+    test['offset'] = offset
+    return jsonify(test)
 
 
 @app.route('/api/test/retry', methods=['POST'])
@@ -1340,17 +2080,58 @@ def retry_test():
     return jsonify({"status": "retrying", "test_id": test_id, "ip": ip})
 
 
+@app.route('/api/test/retry-bulk', methods=['POST'])
+def retry_test_bulk():
+    """Retry all failed targets of a test matching a filter through a bounded pool"""
+    data = request.json or {}
+    test_id = data.get('test_id')
+    retry_filter = data.get('filter', 'failed')
+
+    if test_id not in test_results:
+        return jsonify({"status": "error", "message": "Test not found"}), 404
+
+    if retry_filter not in ('failed', 'timeout', 'transient'):
+        return jsonify({"status": "error", "message": "Invalid filter, use 'failed', 'timeout' or 'transient'"}), 400
+
+    if any(test_results[test_id].get(key, {}).get('status') == 'running' for key in ('retry', 'second_pass')):
+        return jsonify({"status": "error", "message": "A bulk retry is already running for this test"}), 409
+
+    ips = select_retry_targets(test_id, retry_filter)
+    if not ips:
+        return jsonify({"status": "success", "test_id": test_id, "total": 0, "message": "No matching targets"})
+
+    config = load_config()
+
+    # Optionally give retries a longer deadline than the original scan
+    if data.get('timeout'):
+        try:
+            config['timeout'] = int(data['timeout'])
+        except (TypeError, ValueError):
+            return jsonify({"status": "error", "message": "Invalid timeout"}), 400
+
+    queue_size = config.get('queue_size', 5)
+    if not isinstance(queue_size, int) or queue_size < 1:
+        queue_size = 5
+
+    # Mark as running right away so a second request is rejected until the worker takes over
+    test_results[test_id]['retry'] = {"status": "running", "total": len(ips), "completed": 0, "recovered": 0}
+
+    thread = threading.Thread(target=run_bulk_retry, args=(test_id, ips, config, queue_size), daemon=True)
+    thread.start()
+
+    return jsonify({"status": "retrying", "test_id": test_id, "total": len(ips), "filter": retry_filter})
+
+
 @app.route('/api/test/delete/<test_id>', methods=['DELETE'])
 def delete_test_history(test_id):
     """Delete a test history entry and its associated screenshots"""
     global test_results
 
-    if test_id not in test_results:
+    # Get the test data before deletion, older tests are only kept in the database
+    test_data = test_results.get(test_id) or db.get_result(test_id)
+    if not test_data:
         return jsonify({"status": "error", "message": "Test not found"}), 404
 
-    # Get the test data before deletion
-    test_data = test_results[test_id]
-
     # Delete associated screenshots
     screenshots_dir = SCREENSHOTS_DIR  # Use the same directory as where screenshots are saved
     deleted_files = []
@@ -1381,10 +2162,8 @@ def delete_test_history(test_id):
                     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error deleting screenshot {screenshot_path}: {str(e)}")
 
     # Delete the test from results
-    del test_results[test_id]
-
-    # Save updated results
-    save_results()
+    test_results.pop(test_id, None)
+    db_writer.submit(db.delete_result, test_id, key=('test', test_id))
 
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Deleted test {test_id} and {len(deleted_files)} screenshots")
 
@@ -1396,229 +2175,373 @@ def delete_test_history(test_id):
 
 @app.route('/api/results')
 def get_all_results():
-    """Get all test results"""
+    """Get all test results
+
+    Tests that are no longer kept in memory are listed without their results.
+    fields= limits the serialized fields of each result.
+    """
+    fields = requested_fields()
     # No lock needed for reading
-    return jsonify(copy.deepcopy(test_results))
+    all_results = db.get_results_summary()
+    all_results.update({test_id: test_snapshot(test, fields) for test_id, test in list(test_results.items())})
+    return jsonify(all_results)
 
 
-@app.route('/api/channels')
-def get_channels():
-    """Get all successful TV channels with group information and filtering"""
-    # Get filter parameters
-    group_filter = request.args.get('group', 'all')
-    resolution_filter = request.args.get('resolution', 'all')
-    connectivity_filter = request.args.get('connectivity', 'all')
-    search_filter = request.args.get('search', '').lower()
+def get_channels_from_db(filters, sort_by, fields=None):
+    """Answer a channel listing with filtering, ordering and paging done in SQL
 
-    channels_with_groups = copy.deepcopy(tv_channels)
+    Args:
+        filters: group, resolution, connectivity, search and max_latency filters
+        sort_by: 'latency' to order by time-to-first-frame
+        fields: Channel fields to serialize besides ip, None for all
 
-    # Add group information to each channel
-    for ip, channel in channels_with_groups.items():
-        channel_groups = []
-        for group_id, group in groups.items():
-            if ip in group.get('channels', []):
-                channel_groups.append({
-                    'id': group_id,
-                    'name': group['name']
-                })
-        channel['groups'] = channel_groups
+    Returns:
+        Response: Same shape as the in-memory listing plus total/limit/offset
+    """
+    # SQLite would read a negative LIMIT as no limit at all
+    try:
+        limit = page_argument('limit', 1, CHANNEL_PAGE_MAX_SIZE)
+        offset = page_argument('offset', 0) or 0
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    # Commit writes already queued so SQL sees them; this does not queue anything new.
+    # Changes still only marked dirty in memory (until their next save_channels())
+    # may be missing from the result, so it can lag the in-memory listing slightly.
+    db_writer.flush(timeout=5)
+
+    # Every write goes through db_writer, so counts stay valid until its next commit;
+    # paging through a listing then costs one page query per request
+    written = db_writer.written
+    filter_key = tuple(sorted(filters.items()))
+    with db_listing_counts_lock:
+        if db_listing_counts['written'] != written:
+            db_listing_counts.update(written=written, stats=None, totals={})
+        total = db_listing_counts['totals'].get(filter_key)
+        counts = db_listing_counts['stats']
+
+    matched, page = db.query_channels(filters, sort_by=sort_by, limit=limit, offset=offset, count=total is None)
+    if total is None:
+        total = matched
+    if counts is None:
+        counts = db.get_channel_stats()
+
+    with db_listing_counts_lock:
+        if db_listing_counts['written'] == written:
+            totals = db_listing_counts['totals']
+            if len(totals) >= DB_LISTING_TOTALS_CACHE_SIZE:
+                totals.clear()
+            totals[filter_key] = total
+            db_listing_counts['stats'] = counts
 
-    # Calculate statistics BEFORE filtering (for filter counts)
     stats = {
-        'total': len(channels_with_groups),
-        'resolution': {
-            '4k': 0,
-            '1080': 0,
-            '720': 0,
-            'unknown': 0
-        },
-        'connectivity': {
-            'online': 0,
-            'offline': 0,
-            'failed': 0,
-            'testing': 0,
-            'untested': 0
-        },
+        'total': counts['total'],
+        'resolution': {tier: counts['resolution'].get(tier, 0) for tier in ('4k', '1080', '720', 'other', 'unknown')},
+        'connectivity': {state: counts['connectivity'].get(state, 0)
+                         for state in ('online', 'offline', 'failed', 'testing', 'untested')},
         'groups': {}
     }
-
-    for ip, channel in channels_with_groups.items():
-        # Count resolutions
-        resolution = channel.get('resolution', '')
-        if resolution:
-            try:
-                width_str, height_str = resolution.split('x')
-                width = int(width_str)
-                height = int(height_str)
-                is_720p = (width == 720 and height == 576) or (width >= 1280 and width < 1920)
-
-                if width >= 3840:
-                    stats['resolution']['4k'] += 1
-                elif width >= 1920 and width < 3840:
-                    stats['resolution']['1080'] += 1
-                elif is_720p:
-                    stats['resolution']['720'] += 1
-            except:
-                stats['resolution']['unknown'] += 1
-        else:
-            stats['resolution']['unknown'] += 1
-
-        # Count connectivity
-        connectivity = channel.get('connectivity', 'untested')
-        if connectivity in stats['connectivity']:
-            stats['connectivity'][connectivity] += 1
-
-        # Count groups
-        channel_groups = channel.get('groups', [])
-        for group in channel_groups:
-            group_id = group['id']
-            if group_id not in stats['groups']:
-                # Get sort_order from groups global variable
-                sort_order = groups.get(group_id, {}).get('sort_order', 9999)
-                stats['groups'][group_id] = {
-                    'name': group['name'],
-                    'count': 0,
-                    'sort_order': sort_order
-                }
-            stats['groups'][group_id]['count'] += 1
-
-    # Count ungrouped channels
-    ungrouped_count = sum(1 for ch in channels_with_groups.values() if not ch.get('groups'))
-    if ungrouped_count > 0:
+    for group_id, count in counts['groups'].items():
+        if group_id in groups:
+            stats['groups'][group_id] = {
+                'name': groups[group_id]['name'],
+                'count': count,
+                'sort_order': groups[group_id].get('sort_order', 9999)
+            }
+    if counts['ungrouped'] > 0:
         stats['groups']['ungrouped'] = {
             'name': 'Ungrouped',
-            'count': ungrouped_count,
+            'count': counts['ungrouped'],
             'sort_order': 10000  # Ungrouped always last
         }
 
-    # Apply filters
-    filtered_list = []
+    return jsonify({
+        "status": "success",
+        "channels": [{"ip": ip, **project_fields(channel, fields)} for ip, channel in page],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "version": library_version,
+        "stats": stats
+    })
 
-    for ip, channel in channels_with_groups.items():
-        # Group filter
-        if group_filter != 'all':
-            channel_group_ids = [g['id'] for g in channel.get('groups', [])]
-            if group_filter == 'ungrouped':
-                if len(channel_group_ids) > 0:
-                    continue
-            else:
-                if group_filter not in channel_group_ids:
-                    continue
 
-        # Connectivity filter
-        if connectivity_filter != 'all':
-            connectivity = channel.get('connectivity', 'untested')
-            if connectivity_filter == 'online' and connectivity != 'online':
-                continue
-            elif connectivity_filter == 'offline' and connectivity != 'offline':
-                continue
-            elif connectivity_filter == 'failed' and connectivity != 'failed':
-                continue
-            elif connectivity_filter == 'testing' and connectivity != 'testing':
-                continue
-            elif connectivity_filter == 'untested' and connectivity != 'untested':
-                continue
+def library_validators(include_config=False):
+    """ETag and Last-Modified describing the current library state
 
-        # Resolution filter
-        if resolution_filter != 'all':
-            resolution = channel.get('resolution', '')
-            if resolution_filter == 'unknown':
-                if resolution:
-                    continue
+    Args:
+        include_config: Also depend on the config file (playlists embed EPG and base URLs)
+
+    Returns:
+        tuple: (ETag value, Last-Modified datetime in UTC or None)
+    """
+    with channel_order_lock:
+        etag, modified = str(library_version), library_modified
+    if include_config and os.path.exists(CONFIG_FILE):
+        config_stat = os.stat(CONFIG_FILE)
+        etag += f'-{config_stat.st_mtime_ns}'
+        modified = max(modified, config_stat.st_mtime)
+
+    # Last-Modified has one-second resolution: leave it out until the second
+    # of the last change is over, or a later change could look unmodified
+    if time.time() - modified < 1:
+        return etag, None
+    return etag, datetime.fromtimestamp(int(modified), timezone.utc)
+
+
+def library_conditional(include_config=False):
+    """Answer conditional GETs of a library view with 304 before doing any work
+
+    The full response gets ETag and Last-Modified headers derived from the
+    library version, so clients can revalidate with If-None-Match or
+    If-Modified-Since.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag, modified = library_validators(include_config)
+
+            # If-None-Match takes precedence over If-Modified-Since
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
             else:
-                if not resolution:
-                    continue
-                try:
-                    width_str, height_str = resolution.split('x')
-                    width = int(width_str)
-                    height = int(height_str)
-
-                    is_720p = (width == 720 and height == 576) or (width >= 1280 and width < 1920)
-
-                    if resolution_filter == '4k' and width < 3840:
-                        continue
-                    elif resolution_filter == '1080' and (width < 1920 or width >= 3840):
-                        continue
-                    elif resolution_filter == '720' and not is_720p:
-                        continue
-                except:
-                    if resolution_filter != 'unknown':
-                        continue
+                not_modified = (modified is not None and request.if_modified_since is not None
+                                and modified <= request.if_modified_since)
 
-        # Search filter (IP or channel name)
-        if search_filter:
-            channel_name = channel.get('name', '').lower()
-            if search_filter not in ip and search_filter not in channel_name:
-                continue
+            response = app.response_class(status=304) if not_modified else app.make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                if modified is not None:
+                    response.last_modified = modified
+                response.headers['Cache-Control'] = 'no-cache'
+                response.vary.add('Accept-Encoding')
+            return response
+        return wrapper
+    return decorator
 
-        filtered_list.append((ip, channel))
 
-    # Sort filtered channels
-    # Sorting rules:
-    # 1. Group sort order (grouped channels first, sorted by group order)
-    # 2. Resolution (higher resolution first within same group)
-    # 3. Channel name (natural sorting for names with numbers)
-    # 4. Test status (test_status='failed' channels go to the bottom)
-    def sort_key(item):
-        ip, channel = item
-
-        # 1. Group sort order - get minimum sort_order from all groups this channel belongs to
-        min_sort_order = 9999
-        for group in channel.get('groups', []):
-            group_id = group['id']
-            if group_id in groups:
-                sort_order = groups[group_id].get('sort_order', 9999)
-                if sort_order < min_sort_order:
-                    min_sort_order = sort_order
-
-        # 2. Resolution (descending - higher resolution first)
-        resolution = channel.get('resolution', '')
-        resolution_width = 0
-        if resolution:
-            try:
-                resolution_width = -int(resolution.split('x')[0])
-            except:
-                resolution_width = 0
+def negotiate_encoding():
+    """Content-Encoding to use for the current request, or None for identity"""
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(supported)
 
-        # 3. Channel name (empty names go last within same group)
-        # Use natural sorting for names with numbers (e.g., CCTV1, CCTV2, CCTV11)
-        name = channel.get('name', '').strip()
-        if not name:
-            name_order = (1, [])  # Empty names go last
-        else:
-            # Split name into text and number parts for natural sorting
-            import re
-            parts = re.split(r'(\d+)', name.lower())
-            # Convert numeric parts to integers for proper sorting
-            sorted_parts = []
-            for part in parts:
-                if part.isdigit():
-                    sorted_parts.append((0, int(part)))  # (0, num) for numbers
-                else:
-                    sorted_parts.append((1, part))  # (1, str) for text
-            name_order = (0, sorted_parts)  # Names with content come first
 
-        # 4. Test status - failed tests go last
-        test_status = channel.get('test_status', 'success')
-        test_status_order = 1 if test_status == 'failed' else 0
+def compress_body(body, encoding):
+    """Compress a response body with the negotiated encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL)
+
+
+@app.after_request
+def compress_response(response):
+    """Compress large JSON and playlist responses for clients that accept it
+
+    Responses carrying an ETag only change with the library version, so their
+    compressed bodies are cached and each version is compressed once per URL
+    and encoding. Their ETag becomes weak, as the bytes differ per encoding.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    etag, _ = response.get_etag()
+    cache_key = (etag, request.full_path, encoding) if etag and request.method == 'GET' else None
+    with compressed_bodies_lock:
+        compressed = compressed_bodies.get(cache_key) if cache_key else None
+
+    if compressed is None:
+        compressed = compress_body(body, encoding)
+        if cache_key:
+            with compressed_bodies_lock:
+                compressed_bodies[cache_key] = compressed
+                while len(compressed_bodies) > COMPRESSED_CACHE_SIZE:
+                    del compressed_bodies[next(iter(compressed_bodies))]
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def channel_row(ip, channel, fields=None):
+    """Serializable channel object with its IP and group information
+
+    Records are immutable once stored, so they are used without copying.
+
+    Args:
+        ip: Channel IP, always included
+        channel: Channel record
+        fields: Fields to include besides ip (groups included), None for all
+    """
+    row = {"ip": ip, **project_fields(channel, fields)}
+    if fields is None or 'groups' in fields:
+        row["groups"] = [
+            {'id': group_id, 'name': groups[group_id]['name']} for group_id in groups_of_channel(ip)
+        ]
+    return row
+
 
-        return (min_sort_order, resolution_width, name_order, test_status_order)
+def encode_channel_cursor(last_ip, position):
+    """Opaque cursor pointing after a channel of the filtered list"""
+    token = json.dumps({'after': last_ip, 'position': position}).encode()
+    return base64.urlsafe_b64encode(token).decode()
 
-    sorted_list = sorted(filtered_list, key=sort_key)
+
+def resolve_channel_cursor(cursor, sorted_list):
+    """Start index of the page following a cursor
+
+    The page resumes right after the channel the cursor points to, so pages
+    stay stable when channels before it are added or removed. If that channel
+    is gone, the recorded position is used instead.
+    """
+    if not cursor:
+        return 0
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_ip = token['after']
+        position = int(token['position'])
+    except (ValueError, KeyError, TypeError):
+        return 0
+
+    # Nothing moved since the previous page
+    if 0 < position <= len(sorted_list) and sorted_list[position - 1][0] == last_ip:
+        return position
+    for index, (ip, _) in enumerate(sorted_list):
+        if ip == last_ip:
+            return index + 1
+    return min(max(position, 0), len(sorted_list))
+
+
+@app.route('/api/channels')
+@library_conditional()
+def get_channels():
+    """Get all successful TV channels with group information and filtering"""
+    # Get filter parameters
+    group_filter = request.args.get('group', 'all')
+    resolution_filter = request.args.get('resolution', 'all')
+    connectivity_filter = request.args.get('connectivity', 'all')
+    search_filter = request.args.get('search', '').lower()
+    max_latency = request.args.get('max_latency', type=int)  # Time-to-first-frame threshold in ms
+    sort_by = request.args.get('sort', '')
+    cursor = request.args.get('cursor', '')  # next_cursor of the previous page
+    fields = requested_fields()  # Channel fields to serialize, all when omitted
+    try:
+        limit = page_argument('limit', 1, CHANNEL_PAGE_MAX_SIZE)  # Page size, all matching channels when omitted
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if request.args.get('source') == 'db':
+        return get_channels_from_db({
+            'group': group_filter,
+            'resolution': resolution_filter,
+            'connectivity': connectivity_filter,
+            'search': search_filter,
+            'max_latency': max_latency
+        }, sort_by, fields)
+
+    # Statistics BEFORE filtering (for filter counts), read from the live index counters
+    stats = channel_filter_stats()
+
+    # Start from the index sets of the active filters instead of scanning the library
+    candidates = None
+    for filter_name, value in (('group', group_filter), ('connectivity', connectivity_filter),
+                               ('resolution', resolution_filter)):
+        if value != 'all':
+            with channel_filter_lock:
+                matches = set(channel_filter_index[filter_name].get(value, ()))
+            candidates = matches if candidates is None else candidates & matches
+
+    # Search filter (name, IP, tvg_id or pinyin), answered by the search index
+    search_ranks = search_channels(search_filter) if search_filter else None
+    if search_ranks is not None:
+        candidates = set(search_ranks) if candidates is None else candidates & search_ranks.keys()
+
+    # Walk the candidates in the cached list order
+    filtered_list = []
+    version, ordered_ips, positions = sorted_channel_ips()
+    if candidates is not None:
+        ordered_ips = sorted((ip for ip in candidates if ip in positions), key=positions.get)
+
+    for ip in ordered_ips:
+        channel = tv_channels.get(ip)
+        if channel is None:
+            continue
+
+        # Latency filter (channels without a measurement are excluded)
+        if not within_latency(channel, max_latency):
+            continue
+
+        filtered_list.append((ip, channel))
+
+    sorted_list = filtered_list
+    if search_ranks is not None:
+        # Best matches first, list order among equally good matches
+        sorted_list.sort(key=lambda item: search_ranks[item[0]])
+    if sort_by == 'latency':
+        # Stable sort keeps the regular order among channels with equal latency
+        sorted_list.sort(key=lambda item: latency_sort_key(item[1]))
+
+    # Cut the requested page, resuming after the last channel of the previous page
+    start = resolve_channel_cursor(cursor, sorted_list)
+    page = sorted_list[start:start + limit] if limit is not None else sorted_list[start:]
+    end = start + len(page)
+    next_cursor = encode_channel_cursor(page[-1][0], end) if page and end < len(sorted_list) else None
 
     # Convert to list of objects to preserve order (dict loses order in JSON)
-    filtered_channels_list = [
-        {"ip": ip, **channel} for ip, channel in sorted_list
-    ]
+    filtered_channels_list = [channel_row(ip, channel, fields) for ip, channel in page]
 
     return jsonify({
         "status": "success",
         "channels": filtered_channels_list,
+        "total": len(sorted_list),
+        "next_cursor": next_cursor,
+        "version": version,
         "stats": stats
     })
 
 
 
+@app.route('/api/channels/changes')
+def get_channel_changes():
+    """Get channels added, changed or removed after a library version
+
+    A client that is too far behind (or whose version is unknown) gets
+    full_resync=true and should reload /api/channels.
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({"status": "error", "message": "since required"}), 400
+
+    version, changes = channel_changes_since(since)
+    if changes is None:
+        return jsonify({"status": "success", "version": version, "full_resync": True})
+
+    added, changed, removed = [], [], []
+    for ip, kind in changes.items():
+        channel = tv_channels.get(ip)
+        if kind == 'removed' or channel is None:
+            removed.append(ip)
+        else:
+            (added if kind == 'added' else changed).append(channel_row(ip, channel))
+
+    return jsonify({
+        "status": "success",
+        "version": version,
+        "full_resync": False,
+        "added": added,
+        "changed": changed,
+        "removed": removed
+    })
+
+
 @app.route('/api/channels/update', methods=['POST'])
 def update_channel_name():
     """Update channel information"""
@@ -1631,19 +2554,21 @@ def update_channel_name():
     # No lock needed for dictionary update
     if ip in tv_channels:
         # Update any provided fields
+        fields = {}
         if 'name' in data:
-            tv_channels[ip]['name'] = data['name']
+            fields['name'] = data['name']
         if 'tvg_id' in data:
-            tv_channels[ip]['tvg_id'] = data.get('tvg_id', '')
+            fields['tvg_id'] = data.get('tvg_id', '')
         if 'group' in data:
-            tv_channels[ip]['group'] = data.get('group', '')
+            fields['group'] = data.get('group', '')
         if 'playback' in data:
-            tv_channels[ip]['playback'] = data.get('playback', '')
+            fields['playback'] = data.get('playback', '')
         if 'catchup' in data:
-            tv_channels[ip]['catchup'] = data.get('catchup', '')
+            fields['catchup'] = data.get('catchup', '')
         if 'logo' in data:
-            tv_channels[ip]['logo'] = data.get('logo', '')
+            fields['logo'] = data.get('logo', '')
 
+        update_channel_record(ip, fields)
         save_channels()
         return jsonify({"status": "success"})
     else:
@@ -1663,14 +2588,16 @@ def delete_channel():
     if ip in tv_channels:
         del tv_channels[ip]
 
-        # Delete from database
-        db.delete_channel(ip)
+        # Delete from database, including its group memberships
+        db_writer.submit(db.delete_channel, ip, key=('channel', ip))
 
         # Also remove from any groups
-        for group in groups.values():
-            if ip in group.get('channels', []):
-                group['channels'].remove(ip)
-        save_groups()
+        for group_id in groups_of_channel(ip):
+            group = groups[group_id]
+            groups[group_id] = {**group, 'channels': [member for member in group['channels'] if member != ip]}
+        channel_group_index.pop(ip, None)
+        invalidate_channel_order([ip])
+        reindex_channel(ip)
 
         return jsonify({"status": "success"})
     else:
@@ -1756,7 +2683,7 @@ def upload_channel_logo():
 
     # Update channel logo path
     if ip in tv_channels:
-        tv_channels[ip]['logo'] = f"/logos/{filename}"
+        update_channel_record(ip, {'logo': f"/logos/{filename}"})
         save_channels()
         return jsonify({"status": "success", "logo": f"/logos/{filename}"})
     else:
@@ -1784,17 +2711,319 @@ def save_groups():
         # Log channel counts for debugging
         for gid, gdata in list(groups.items())[:3]:
             print(f"  Group {gdata.get('name', '')}: {len(gdata.get('channels', []))} channels")
-        db.save_groups(groups)
+        # Group records are replaced rather than modified, a shallow copy is a stable snapshot
+        db_writer.save_groups(dict(groups))
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Groups saved successfully")
     except Exception as e:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Error saving groups: {str(e)}")
         import traceback
         traceback.print_exc()
 
+
+def rebuild_channel_group_index():
+    """Rebuild the channel IP -> group IDs index from the group member lists"""
+    channel_group_index.clear()
+    for group_id, group in groups.items():
+        for ip in group.get('channels', []):
+            channel_group_index.setdefault(ip, set()).add(group_id)
+    invalidate_channel_order()
+    rebuild_channel_filter_index()
+
+
+def index_group_members(group_id, ips):
+    """Record channels added to a group in the membership index"""
+    for ip in ips:
+        channel_group_index.setdefault(ip, set()).add(group_id)
+    invalidate_channel_order(ips)
+    for ip in ips:
+        reindex_channel(ip)
+
+
+def unindex_group_members(group_id, ips):
+    """Drop channels removed from a group from the membership index"""
+    for ip in ips:
+        group_ids = channel_group_index.get(ip)
+        if group_ids is not None:
+            group_ids.discard(group_id)
+            if not group_ids:
+                del channel_group_index[ip]
+    invalidate_channel_order(ips)
+    for ip in ips:
+        reindex_channel(ip)
+
+
+def groups_of_channel(ip):
+    """IDs of the groups containing a channel, in group sort order"""
+    group_ids = [group_id for group_id in channel_group_index.get(ip, ()) if group_id in groups]
+    return sorted(group_ids, key=lambda group_id: groups[group_id].get('sort_order', 9999))
+
+
+def invalidate_channel_order(ips=None):
+    """Start a new library version and drop the cached sort keys of changed channels
+
+    The changed channels are recorded in the change log for delta sync.
+
+    Args:
+        ips: Channels whose sort inputs may have changed; None drops every key
+             (group order changes) and forces clients to resync, an empty list
+             only bumps the version
+    """
+    global library_version, library_modified, channel_change_log_floor
+    with channel_order_lock:
+        library_version += 1
+        library_modified = time.time()
+        if ips is None:
+            channel_sort_keys.clear()
+            channel_change_log.clear()
+            channel_change_log_floor = library_version
+            return
+
+        for ip in ips:
+            channel_sort_keys.pop(ip, None)
+            # Called before reindex_channel(), so new channels are not indexed yet
+            if ip not in tv_channels:
+                kind = 'removed'
+            elif ip not in channel_filter_values:
+                kind = 'added'
+            else:
+                kind = 'changed'
+            channel_change_log.append((library_version, ip, kind))
+
+        # Forget the oldest entries; clients from before them must resync
+        while len(channel_change_log) > CHANNEL_CHANGE_LOG_SIZE:
+            channel_change_log_floor = channel_change_log.popleft()[0]
+
+
+def channel_changes_since(since):
+    """Collect the channels changed after a library version
+
+    Returns:
+        tuple: (current version, dict of IP -> 'added'/'changed'/'removed'),
+               with None instead of the dict when the log can't cover the gap
+    """
+    with channel_order_lock:
+        if since < channel_change_log_floor or since > library_version:
+            return library_version, None
+
+        changes = {}
+        for version, ip, kind in reversed(channel_change_log):
+            if version <= since:
+                break
+            changes.setdefault(ip, []).append(kind)
+        version = library_version
+
+    # Entries were collected newest first: the first is the latest state,
+    # the last tells whether the channel existed before
+    result = {}
+    for ip, kinds in changes.items():
+        if kinds[0] == 'removed':
+            if kinds[-1] != 'added':
+                result[ip] = 'removed'
+        else:
+            result[ip] = 'added' if kinds[-1] == 'added' else 'changed'
+    return version, result
+
+
+@lru_cache(maxsize=65536)
+def natural_name_key(name):
+    """Natural sort key for a channel name (e.g., CCTV1, CCTV2, CCTV11), empty names last"""
+    name = name.strip()
+    if not name:
+        return (1, ())
+    # (0, num) for numbers, (1, str) for text
+    return (0, tuple((0, int(part)) if part.isdigit() else (1, part) for part in re.split(r'(\d+)', name.lower())))
+
+
+def channel_sort_key(ip):
+    """List sort key of a channel, cached until the channel or group order changes
+
+    Sorting rules:
+    1. Group sort order (grouped channels first, sorted by group order)
+    2. Resolution (higher resolution first within same group)
+    3. Channel name (natural sorting for names with numbers)
+    4. Test status (test_status='failed' channels go to the bottom)
+    """
+    key = channel_sort_keys.get(ip)
+    if key is None:
+        channel = tv_channels.get(ip, {})
+        group_ids = groups_of_channel(ip)
+        min_sort_order = groups[group_ids[0]].get('sort_order', 9999) if group_ids else 9999
+        key = (
+            min_sort_order,
+            -(channel.get('width') or 0),
+            natural_name_key(channel.get('name', '')),
+            1 if channel.get('test_status', 'success') == 'failed' else 0
+        )
+        channel_sort_keys[ip] = key
+    return key
+
+
+def sorted_channel_ips():
+    """All channel IPs in list order, sorted once per library version
+
+    Returns:
+        tuple: (library version, list of IPs, dict of IP -> position in the list)
+    """
+    with channel_order_lock:
+        if sorted_channel_order['version'] != library_version:
+            ips = sorted(list(tv_channels), key=channel_sort_key)
+            sorted_channel_order['ips'] = ips
+            sorted_channel_order['positions'] = {ip: position for position, ip in enumerate(ips)}
+            sorted_channel_order['version'] = library_version
+        return sorted_channel_order['version'], sorted_channel_order['ips'], sorted_channel_order['positions']
+
+
+def reindex_channel(ip):
+    """Move a channel to the filter index sets matching its current state
+
+    Deleted channels are removed from the index. The search index is
+    updated as well.
+    """
+    channel = tv_channels.get(ip)
+    if channel is not None:
+        values = {
+            'group': set(groups_of_channel(ip)) or {'ungrouped'},
+            'connectivity': {channel.get('connectivity', 'untested')},
+            'resolution': {channel.get('resolution_tier', 'unknown')}
+        }
+
+    with channel_filter_lock:
+        previous = channel_filter_values.pop(ip, {})
+        if channel is not None:
+            channel_filter_values[ip] = values
+        for filter_name, index in channel_filter_index.items():
+            old_values = previous.get(filter_name, set())
+            new_values = values[filter_name] if channel is not None else set()
+            for value in old_values - new_values:
+                index[value].discard(ip)
+                if not index[value]:
+                    del index[value]
+            for value in new_values - old_values:
+                index.setdefault(value, set()).add(ip)
+
+    reindex_channel_search(ip, channel)
+
+
+def rebuild_channel_filter_index():
+    """Index every channel of the library from scratch"""
+    with channel_filter_lock:
+        channel_filter_values.clear()
+        for index in channel_filter_index.values():
+            index.clear()
+    with channel_search_lock:
+        channel_search_keys.clear()
+        channel_search_index.clear()
+    for ip in list(tv_channels):
+        reindex_channel(ip)
+
+
+def channel_filter_stats():
+    """Channel counts per filter value for the list filters, from the index counters"""
+    with channel_filter_lock:
+        resolution_index = channel_filter_index['resolution']
+        connectivity_index = channel_filter_index['connectivity']
+        group_counts = {value: len(ips) for value, ips in channel_filter_index['group'].items()}
+
+        stats = {
+            'total': len(channel_filter_values),
+            'resolution': {tier: len(resolution_index.get(tier, ())) for tier in ('4k', '1080', '720', 'other', 'unknown')},
+            'connectivity': {state: len(connectivity_index.get(state, ()))
+                             for state in ('online', 'offline', 'failed', 'testing', 'untested')},
+            'groups': {}
+        }
+
+    for group_id, count in group_counts.items():
+        if group_id in groups:
+            stats['groups'][group_id] = {
+                'name': groups[group_id]['name'],
+                'count': count,
+                'sort_order': groups[group_id].get('sort_order', 9999)
+            }
+    if group_counts.get('ungrouped'):
+        stats['groups']['ungrouped'] = {
+            'name': 'Ungrouped',
+            'count': group_counts['ungrouped'],
+            'sort_order': 10000  # Ungrouped always last
+        }
+    return stats
+
+
+def search_ngrams(text):
+    """Character n-grams of a search key or query"""
+    return {text[i:i + SEARCH_NGRAM_SIZE] for i in range(len(text) - SEARCH_NGRAM_SIZE + 1)}
+
+
+def reindex_channel_search(ip, channel):
+    """Update the search index entries of a channel
+
+    Only a changed name or tvg_id touches the index, so connectivity and
+    scan updates cost a dict lookup. Deleted channels (channel None) are
+    removed from the index.
+    """
+    source = (channel.get('name', ''), channel.get('tvg_id', '')) if channel is not None else None
+    with channel_search_lock:
+        previous = channel_search_keys.get(ip)
+    if previous is not None and previous[0] == source:
+        return
+
+    keys = ()
+    if channel is not None:
+        name = source[0].lower()
+        keys = tuple(key for key in (name, ip, source[1].lower(), *pinyin_keys(name)) if key)
+    new_grams = set().union(*(search_ngrams(key) for key in keys))
+
+    with channel_search_lock:
+        previous = channel_search_keys.pop(ip, None)
+        if channel is not None:
+            channel_search_keys[ip] = (source, keys)
+        old_grams = set().union(*(search_ngrams(key) for key in previous[1])) if previous else set()
+        for gram in old_grams - new_grams:
+            channel_search_index[gram].discard(ip)
+            if not channel_search_index[gram]:
+                del channel_search_index[gram]
+        for gram in new_grams - old_grams:
+            channel_search_index.setdefault(gram, set()).add(ip)
+
+
+def search_channels(query):
+    """Channels whose name, IP, tvg_id or pinyin spelling contains a query
+
+    Candidates come from intersecting the n-gram sets of the query and are
+    then checked for the full substring.
+
+    Returns:
+        dict: Channel IP -> match quality, 0 for an exact key, 1 for a key
+            prefix and 2 for any other substring (lower is better)
+    """
+    query = query.strip().lower()
+    grams = search_ngrams(query)
+    with channel_search_lock:
+        if grams:
+            postings = sorted((channel_search_index.get(gram, set()) for gram in grams), key=len)
+            candidates = postings[0].intersection(*postings[1:])
+        else:
+            # Too short for an n-gram: check every channel
+            candidates = channel_search_keys.keys()
+        entries = [(ip, channel_search_keys[ip][1]) for ip in candidates]
+
+    ranks = {}
+    for ip, keys in entries:
+        best = None
+        for key in keys:
+            if query in key:
+                quality = 0 if key == query else 1 if key.startswith(query) else 2
+                if best is None or quality < best:
+                    best = quality
+        if best is not None:
+            ranks[ip] = best
+    return ranks
+
+
 @app.route('/api/groups')
+@library_conditional()
 def get_groups():
     """Get all groups"""
-    return jsonify({"status": "success", "groups": copy.deepcopy(groups)})
+    return jsonify({"status": "success", "groups": dict(groups)})
 
 @app.route('/api/groups/create', methods=['POST'])
 def create_group():
@@ -1817,7 +3046,8 @@ def create_group():
         'created': datetime.now().isoformat(),
         'sort_order': max_sort + 1
     }
-    save_groups()
+    db_writer.submit(db.update_group, group_id, groups[group_id])
+    invalidate_channel_order([])
 
     return jsonify({"status": "success", "group_id": group_id})
 
@@ -1827,8 +3057,9 @@ def delete_group(group_id):
     if group_id not in groups:
         return jsonify({"status": "error", "message": "Group not found"}), 404
 
-    del groups[group_id]
-    save_groups()
+    members = groups.pop(group_id).get('channels', [])
+    unindex_group_members(group_id, members)
+    db_writer.submit(db.delete_group, group_id)
 
     return jsonify({"status": "success"})
 
@@ -1844,8 +3075,10 @@ def rename_group(group_id):
     if not new_name:
         return jsonify({"status": "error", "message": "New name required"}), 400
 
-    groups[group_id]['name'] = new_name
-    save_groups()
+    groups[group_id] = {**groups[group_id], 'name': new_name}
+    db_writer.submit(db.update_group, group_id, {'name': new_name})
+    # Member channels report the new group name
+    invalidate_channel_order(groups[group_id].get('channels', []))
 
     return jsonify({"status": "success"})
 
@@ -1859,11 +3092,14 @@ def reorder_groups():
         return jsonify({"status": "error", "message": "Order list required"}), 400
 
     # Update sort order for each group
+    orders = {}
     for index, group_id in enumerate(order_list):
         if group_id in groups:
-            groups[group_id]['sort_order'] = index + 1
+            groups[group_id] = {**groups[group_id], 'sort_order': index + 1}
+            orders[group_id] = index + 1
 
-    save_groups()
+    db_writer.submit(db.update_group_orders, orders)
+    invalidate_channel_order()
 
     return jsonify({"status": "success"})
 
@@ -1881,11 +3117,11 @@ def add_channels_to_group(group_id):
 
     # Add unique channels only
     existing_channels = set(groups[group_id]['channels'])
-    for ip in channel_ips:
-        if ip not in existing_channels:
-            groups[group_id]['channels'].append(ip)
+    new_ips = [ip for ip in dict.fromkeys(channel_ips) if ip not in existing_channels]
+    groups[group_id] = {**groups[group_id], 'channels': groups[group_id]['channels'] + new_ips}
+    index_group_members(group_id, new_ips)
 
-    save_groups()
+    db_writer.submit(db.add_group_channels, group_id, new_ips)
 
     return jsonify({"status": "success", "added": len(channel_ips)})
 
@@ -1902,8 +3138,13 @@ def remove_channels_from_group(group_id):
         return jsonify({"status": "error", "message": "No channels provided"}), 400
 
     # Remove specified channels
-    groups[group_id]['channels'] = [ip for ip in groups[group_id]['channels'] if ip not in channel_ips]
-    save_groups()
+    removed_ips = set(channel_ips)
+    groups[group_id] = {
+        **groups[group_id],
+        'channels': [ip for ip in groups[group_id]['channels'] if ip not in removed_ips]
+    }
+    unindex_group_members(group_id, removed_ips)
+    db_writer.submit(db.remove_group_channels, group_id, list(channel_ips))
 
     return jsonify({"status": "success", "removed": len(channel_ips)})
 
@@ -1934,7 +3175,15 @@ def import_channels():
         imported_count = 0
         updated_count = 0
         created_groups = []
+        created_group_ids = []
         new_channel_ips = []  # Track new channels for highlighting
+        group_ids_by_name = {g_data['name']: g_id for g_id, g_data in reversed(list(groups.items()))}
+        changed_groups = {}  # Working copies of the group records, published once the import is done
+
+        def working_group(g_id):
+            if g_id not in changed_groups:
+                changed_groups[g_id] = {**groups[g_id], 'channels': list(groups[g_id].get('channels', []))}
+            return changed_groups[g_id]
 
         for ch in parsed_channels:
             ip = ch['ip']
@@ -1951,11 +3200,15 @@ def import_channels():
                 'screenshot': existing.get('screenshot', ''),  # Always preserve screenshot
                 'timestamp': datetime.now().isoformat(),
                 'resolution': existing.get('resolution', ''),  # Always preserve resolution
+                **resolution_fields(existing.get('resolution', '')),
                 'group': ch['group'] if ch['group'] else existing.get('group', ''),
                 'logo': ch['logo'] if ch['logo'] else existing.get('logo', ''),
                 'catchup': ch['catchup'] if ch['catchup'] else existing.get('catchup', ''),
-                'playback': ch['playback'] if ch['playback'] else existing.get('playback', '')
+                'playback': ch['playback'] if ch['playback'] else existing.get('playback', ''),
+                'ttfb_ms': existing.get('ttfb_ms'),  # Always preserve latency measurements
+                'ttff_ms': existing.get('ttff_ms')
             }
+            mark_channel_dirty(ip)
 
             if is_new:
                 imported_count += 1
@@ -1965,16 +3218,9 @@ def import_channels():
 
             # Auto-create group if not exists
             if ch['group']:
-                group_exists = False
-                target_group_id = None
-
-                for g_id, g_data in groups.items():
-                    if g_data['name'] == ch['group']:
-                        group_exists = True
-                        target_group_id = g_id
-                        break
+                target_group_id = group_ids_by_name.get(ch['group'])
 
-                if not group_exists:
+                if target_group_id is None:
                     target_group_id = str(uuid.uuid4())
                     max_sort = max([g.get('sort_order', 0) for g in groups.values()]) if groups else 0
                     groups[target_group_id] = {
@@ -1983,20 +3229,40 @@ def import_channels():
                         'created': datetime.now().isoformat(),
                         'sort_order': max_sort + 1
                     }
+                    group_ids_by_name[ch['group']] = target_group_id
                     created_groups.append(ch['group'])
+                    created_group_ids.append(target_group_id)
 
                 # Remove channel from all other groups first (覆盖逻辑)
-                for g_id, g_data in groups.items():
-                    if g_id != target_group_id and ip in g_data.get('channels', []):
-                        g_data['channels'].remove(ip)
+                for g_id in groups_of_channel(ip):
+                    if g_id != target_group_id:
+                        working_group(g_id)['channels'].remove(ip)
+                        unindex_group_members(g_id, [ip])
 
                 # Add to target group
-                if target_group_id and ip not in groups[target_group_id].get('channels', []):
-                    groups[target_group_id]['channels'].append(ip)
-
-        # Save all changes
+                if target_group_id not in channel_group_index.get(ip, ()):
+                    working_group(target_group_id)['channels'].append(ip)
+                    index_group_members(target_group_id, [ip])
+
+        # Net membership changes of every touched group, against the published records
+        membership_changes = []
+        for g_id, group in changed_groups.items():
+            before = groups[g_id].get('channels', [])
+            before_set, after_set = set(before), set(group['channels'])
+            membership_changes.append((g_id,
+                                       [ip for ip in group['channels'] if ip not in before_set],
+                                       [ip for ip in before if ip not in after_set]))
+        groups.update(changed_groups)
+
+        # Save all changes; only created groups and changed memberships are written
         save_channels()
-        save_groups()
+        for g_id in created_group_ids:
+            db_writer.submit(db.update_group, g_id, {**groups[g_id], 'channels': []})
+        for g_id, added, removed in membership_changes:
+            if removed:
+                db_writer.submit(db.remove_group_channels, g_id, removed)
+            if added:
+                db_writer.submit(db.add_group_channels, g_id, added)
 
         return jsonify({
             "status": "success",
@@ -2051,11 +3317,27 @@ def sync_metadata():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-def generate_m3u_content(use_external_url=False):
+def within_latency(channel, max_latency):
+    """Check a channel's time-to-first-frame against a threshold in ms (None = no limit)"""
+    if max_latency is None:
+        return True
+    ttff_ms = channel.get('ttff_ms')
+    return ttff_ms is not None and ttff_ms <= max_latency
+
+
+def latency_sort_key(channel):
+    """Sort key ordering channels by time-to-first-frame, unmeasured channels last"""
+    ttff_ms = channel.get('ttff_ms')
+    return (ttff_ms is None, ttff_ms or 0)
+
+
+def generate_m3u_content(use_external_url=False, max_latency=None, sort_by=''):
     """Generate M3U content for ONLINE channels, sorted same as frontend list
 
     Args:
         use_external_url: If True, replace internal URLs with external URLs
+        max_latency: Only export channels whose time-to-first-frame is at most this many ms
+        sort_by: 'latency' to order by time-to-first-frame instead of the list order
     """
     # Load config to get EPG URL and URL replacement settings
     config = load_config()
@@ -2072,63 +3354,19 @@ def generate_m3u_content(use_external_url=False):
         m3u_content = "#EXTM3U\n\n"
 
     # Filter: Only export channels with connectivity='online'
-    filtered_list = []
-    for ip, channel in tv_channels.items():
+    # Walking the cached list order keeps the playlist sorted the SAME as the frontend list
+    sorted_list = []
+    _, ordered_ips, _ = sorted_channel_ips()
+    for ip in ordered_ips:
+        channel = tv_channels.get(ip)
+        if channel is None:
+            continue
         connectivity = channel.get('connectivity', 'untested')
-        if connectivity == 'online':
-            filtered_list.append((ip, channel))
-
-    # Sort channels using the SAME logic as frontend list
-    # Sorting rules:
-    # 1. Group sort order (grouped channels first, sorted by group order)
-    # 2. Resolution (higher resolution first within same group)
-    # 3. Channel name (natural sorting for names with numbers)
-    # 4. Test status (test_status='failed' channels go to the bottom)
-    def sort_key(item):
-        ip, channel = item
-
-        # 1. Group sort order - get minimum sort_order from all groups this channel belongs to
-        min_sort_order = 9999
-        for group_id, group in groups.items():
-            if ip in group.get('channels', []):
-                sort_order = group.get('sort_order', 9999)
-                if sort_order < min_sort_order:
-                    min_sort_order = sort_order
-
-        # 2. Resolution (descending - higher resolution first)
-        resolution = channel.get('resolution', '')
-        resolution_width = 0
-        if resolution:
-            try:
-                resolution_width = -int(resolution.split('x')[0])
-            except:
-                resolution_width = 0
-
-        # 3. Channel name (empty names go last within same group)
-        # Use natural sorting for names with numbers (e.g., CCTV1, CCTV2, CCTV11)
-        name = channel.get('name', '').strip()
-        if not name:
-            name_order = (1, [])  # Empty names go last
-        else:
-            # Split name into text and number parts for natural sorting
-            import re
-            parts = re.split(r'(\d+)', name.lower())
-            # Convert numeric parts to integers for proper sorting
-            sorted_parts = []
-            for part in parts:
-                if part.isdigit():
-                    sorted_parts.append((0, int(part)))  # (0, num) for numbers
-                else:
-                    sorted_parts.append((1, part))  # (1, str) for text
-            name_order = (0, sorted_parts)  # Names with content come first
-
-        # 4. Test status - failed tests go last
-        test_status = channel.get('test_status', 'success')
-        test_status_order = 1 if test_status == 'failed' else 0
+        if connectivity == 'online' and within_latency(channel, max_latency):
+            sorted_list.append((ip, channel))
 
-        return (min_sort_order, resolution_width, name_order, test_status_order)
-
-    sorted_list = sorted(filtered_list, key=sort_key)
+    if sort_by == 'latency':
+        sorted_list.sort(key=lambda item: latency_sort_key(item[1]))
 
     # Generate M3U content
     for ip, channel in sorted_list:
@@ -2154,10 +3392,9 @@ def generate_m3u_content(use_external_url=False):
             group = channel.get('group', '')
             if not group:
                 # Check if channel is in any group
-                for group_id, group_data in groups.items():
-                    if ip in group_data.get('channels', []):
-                        group = group_data['name']
-                        break
+                group_ids = groups_of_channel(ip)
+                if group_ids:
+                    group = groups[group_ids[0]]['name']
 
             if group:
                 extinf_parts.append(f'group-title="{group}"')
@@ -2186,9 +3423,13 @@ def generate_m3u_content(use_external_url=False):
 
 
 @app.route('/api/channels/export')
+@library_conditional(include_config=True)
 def export_channels():
     """Export ONLINE channels as M3U file (download)"""
-    m3u_content = generate_m3u_content()
+    m3u_content = generate_m3u_content(
+        max_latency=request.args.get('max_latency', type=int),
+        sort_by=request.args.get('sort', '')
+    )
 
     response = app.response_class(
         response=m3u_content,
@@ -2200,9 +3441,13 @@ def export_channels():
 
 
 @app.route('/m3u')
+@library_conditional(include_config=True)
 def get_m3u():
     """Get M3U content (direct view, not download)"""
-    m3u_content = generate_m3u_content()
+    m3u_content = generate_m3u_content(
+        max_latency=request.args.get('max_latency', type=int),
+        sort_by=request.args.get('sort', '')
+    )
 
     response = app.response_class(
         response=m3u_content,
@@ -2213,9 +3458,14 @@ def get_m3u():
 
 
 @app.route('/net')
+@library_conditional(include_config=True)
 def get_net():
     """Get M3U content with external URLs (direct view, not download)"""
-    m3u_content = generate_m3u_content(use_external_url=True)
+    m3u_content = generate_m3u_content(
+        use_external_url=True,
+        max_latency=request.args.get('max_latency', type=int),
+        sort_by=request.args.get('sort', '')
+    )
 
     response = app.response_class(
         response=m3u_content,
@@ -2296,285 +3546,18 @@ def test_channel_connectivity():
     # Function to test a single channel connectivity with full stream test
     def test_single_connectivity(ip, task_id):
         if ip not in tv_channels:
-            tv_channels[ip]['connectivity'] = 'offline'
-            tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-            tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-            return {"ip": ip, "connectivity": "offline", "timestamp": tv_channels[ip]['timestamp'], "message": "Channel not found"}
+            return {"ip": ip, "connectivity": "offline", "timestamp": datetime.now().isoformat(), "message": "Channel not found"}
 
-        channel = tv_channels[ip]
-        url = channel.get('url', '')
+        url = tv_channels[ip].get('url', '')
 
         if not url:
-            tv_channels[ip]['connectivity'] = 'offline'
-            tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-            tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-            return {"ip": ip, "connectivity": "offline", "timestamp": tv_channels[ip]['timestamp'], "message": "No URL"}
-
-        try:
-            timeout = config.get("timeout") or 10
-            if isinstance(timeout, str):
-                try:
-                    timeout = int(timeout)
-                except:
-                    timeout = 10
-
-            screenshot_path = os.path.join(SCREENSHOTS_DIR, f"connectivity_{ip.replace('.', '_')}.jpg")
-
-            # Build FFmpeg command for full stream test
-            cmd = ["ffmpeg", "-y"]
-
-            # Add timeout parameter for network streams (in microseconds)
-            cmd.extend(["-timeout", str(timeout * 1000000)])
-
-            # Add network timeout and analysis parameters BEFORE input
-            cmd.extend([
-                "-analyzeduration", "3000000",  # 3 seconds to analyze stream
-                "-probesize", "5000000"  # 5MB probe size
-            ])
+            return apply_connectivity_outcome(ip, {"status": "failed", "error": "No URL"}, offline_on_failure=True)
 
-            # Add RTP-specific timeout if it's an RTP URL
-            if "rtp" in url.lower():
-                cmd.extend(["-rw_timeout", str(timeout * 1000000)])
-
-            # Add custom parameters if specified
-            custom_params = config.get("custom_params", "")
-            if custom_params and custom_params.strip():
-                import shlex
-                try:
-                    custom_args = shlex.split(custom_params)
-                    cmd.extend(custom_args)
-                except Exception as e:
-                    print(f"[Connectivity Test] Error parsing custom params: {e}")
-
-            # Probe stream to detect resolution for 4K optimization
-            probe_cmd = [
-                "ffmpeg",
-                "-hide_banner",
-                "-analyzeduration", "5000000",
-                "-probesize", "10000000",
-                "-t", "3",
-                "-i", url,
-                "-f", "null",
-                "-"
-            ]
-
-            detected_resolution = None
-            is_4k = False
-            try:
-                probe_process = subprocess.Popen(
-                    probe_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True
-                )
-                probe_stdout, probe_stderr = probe_process.communicate(timeout=8)
-
-                if probe_stderr:
-                    import re
-                    resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
-                    match = re.search(resolution_pattern, probe_stderr)
-                    if match:
-                        detected_resolution = match.group(1)
-                        width, height = map(int, detected_resolution.split('x'))
-                        is_4k = width >= 3840
-                        print(f"[Connectivity Test] Detected resolution: {detected_resolution} (4K: {is_4k})")
-            except Exception as e:
-                print(f"[Connectivity Test] Probe failed, using default settings: {e}")
-
-            # Add input URL
-            cmd.extend(["-i", url])
-
-            # For 4K streams, capture first frame without scaling (keep original resolution)
-            if is_4k:
-                cmd.extend([
-                    "-frames:v", "1",
-                    "-q:v", "1",
-                    "-vf", "yadif",
-                    "-f", "image2",
-                    screenshot_path
-                ])
-                print(f"[Connectivity Test] Using 4K capture mode (no scaling)")
-            else:
-                cmd.extend([
-                    "-frames:v", "1",
-                    "-q:v", "1",
-                    "-vf", "yadif",
-                    "-s", "1920x1080",
-                    "-f", "image2",
-                    screenshot_path
-                ])
-                print(f"[Connectivity Test] Using standard capture mode (1080p)")
-
-            # Execute FFmpeg with timeout
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-
-            try:
-                stdout, stderr = process.communicate(timeout=timeout)
-
-                # Parse resolution from stderr first
-                resolution = None
-                if stderr:
-                    import re
-                    resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
-                    match = re.search(resolution_pattern, stderr)
-                    if match:
-                        resolution = match.group(1)
-                        try:
-                            width, height = map(int, resolution.split('x'))
-                            if width > 0 and height > 0:
-                                print(f"[Connectivity Test] Detected resolution from FFmpeg: {resolution}")
-                            else:
-                                resolution = None
-                        except:
-                            resolution = None
-
-                # For 4K streams, if we detected resolution in stderr, consider it successful even without screenshot
-                if is_4k and resolution and not os.path.exists(screenshot_path):
-                    print(f"[Connectivity Test] 4K stream: FFmpeg detected stream info, marking as online even without screenshot")
-                    tv_channels[ip]['connectivity'] = 'online'
-                    tv_channels[ip]['resolution'] = resolution
-                    tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                    tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                    return {
-                        "ip": ip,
-                        "connectivity": "online",
-                        "screenshot": None,
-                        "resolution": resolution,
-                        "timestamp": tv_channels[ip]['timestamp'],
-                        "message": "4K stream detected (no screenshot)"
-                    }
-
-                if process.returncode == 0 and os.path.exists(screenshot_path):
-                    # Successfully captured screenshot
-                    tv_channels[ip]['screenshot'] = f"/screenshots/{os.path.basename(screenshot_path)}"
-
-                    # Only mark as online if valid resolution was detected
-                    if resolution:
-                        tv_channels[ip]['resolution'] = resolution
-                        tv_channels[ip]['connectivity'] = 'online'
-                        tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                        tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                        return {
-                            "ip": ip,
-                            "connectivity": "online",
-                            "screenshot": tv_channels[ip]['screenshot'],
-                            "resolution": resolution,
-                            "timestamp": tv_channels[ip]['timestamp']
-                        }
-                    else:
-                        # No resolution detected - mark as failed
-                        previous_connectivity = channel.get('connectivity', 'untested')
-                        if previous_connectivity == 'online':
-                            new_connectivity = 'offline'
-                        else:
-                            new_connectivity = previous_connectivity
-                        tv_channels[ip]['connectivity'] = new_connectivity
-                        tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                        tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                        return {"ip": ip, "connectivity": new_connectivity, "timestamp": tv_channels[ip]['timestamp'], "message": "No resolution detected"}
-                else:
-                    # Try lightweight probe as fallback
-                    probe_cmd = [
-                        "ffprobe",
-                        "-v", "error",
-                        "-show_entries", "stream=codec_type,width,height",
-                        "-of", "default=noprint_wrappers=1"
-                    ]
-
-                    if "rtp" in url.lower() or "udp" in url.lower() or "http" in url.lower():
-                        probe_cmd.extend(["-timeout", str(timeout * 1000000)])
-
-                    probe_cmd.append(url)
-
-                    try:
-                        probe_process = subprocess.Popen(
-                            probe_cmd,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            universal_newlines=True
-                        )
-
-                        probe_stdout, probe_stderr = probe_process.communicate(timeout=timeout)
-                        combined_output = (probe_stdout or "") + (probe_stderr or "")
-
-                        if "codec_type=video" in combined_output or "Video:" in combined_output:
-                            # Stream is accessible but screenshot failed
-                            tv_channels[ip]['connectivity'] = 'online'
-                            tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                            tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-
-                            # Try to extract resolution
-                            import re
-                            width_match = re.search(r'width=(\d+)', combined_output)
-                            height_match = re.search(r'height=(\d+)', combined_output)
-                            if width_match and height_match:
-                                resolution = f"{width_match.group(1)}x{height_match.group(1)}"
-                                tv_channels[ip]['resolution'] = resolution
-
-                            return {"ip": ip, "connectivity": "online", "timestamp": tv_channels[ip]['timestamp'], "note": "Screenshot failed but stream accessible"}
-                        else:
-                            # Test failed - set offline if previously online, otherwise keep current status
-                            previous_connectivity = channel.get('connectivity', 'untested')
-                            if previous_connectivity == 'online':
-                                new_connectivity = 'offline'
-                            else:
-                                new_connectivity = previous_connectivity
-                            tv_channels[ip]['connectivity'] = new_connectivity
-                            tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                            tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                            return {"ip": ip, "connectivity": new_connectivity, "timestamp": tv_channels[ip]['timestamp']}
-
-                    except (subprocess.TimeoutExpired, Exception):
-                        if hasattr(locals().get('probe_process'), 'kill'):
-                            try:
-                                probe_process.kill()
-                            except:
-                                pass
-                        # Test failed - set offline if previously online
-                        previous_connectivity = channel.get('connectivity', 'untested')
-                        if previous_connectivity == 'online':
-                            new_connectivity = 'offline'
-                        else:
-                            new_connectivity = previous_connectivity
-                        tv_channels[ip]['connectivity'] = new_connectivity
-                        tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                        tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                        return {"ip": ip, "connectivity": new_connectivity, "timestamp": tv_channels[ip]['timestamp']}
-
-            except subprocess.TimeoutExpired:
-                process.kill()
-                try:
-                    process.wait(timeout=2)
-                except subprocess.TimeoutExpired:
-                    process.terminate()
-                # Test failed - set offline if previously online
-                previous_connectivity = channel.get('connectivity', 'untested')
-                if previous_connectivity == 'online':
-                    new_connectivity = 'offline'
-                else:
-                    new_connectivity = previous_connectivity
-                tv_channels[ip]['connectivity'] = new_connectivity
-                tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                return {"ip": ip, "connectivity": new_connectivity, "timestamp": tv_channels[ip]['timestamp'], "message": "Timeout"}
-
-        except Exception as e:
-            print(f"[Connectivity Test] Error testing {ip}: {str(e)}")
-            # Test failed - set offline if previously online
-            previous_connectivity = channel.get('connectivity', 'untested')
-            if previous_connectivity == 'online':
-                new_connectivity = 'offline'
-            else:
-                new_connectivity = previous_connectivity
-            tv_channels[ip]['connectivity'] = new_connectivity
-            tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-            tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-            return {"ip": ip, "connectivity": new_connectivity, "timestamp": tv_channels[ip]['timestamp'], "message": str(e)}
+        key = probe_key(probe_stream_connectivity, url, config, connectivity_screenshot_path(ip))
+        outcome, shared = run_coalesced_probe(key, lambda: probe_stream_connectivity(ip, url, config))
+        if shared:
+            print(f"[Connectivity Test] Reused concurrent probe result for {url}")
+        return apply_connectivity_outcome(ip, outcome)
 
     # Background task to test all channels
     def run_connectivity_tests():
@@ -2647,243 +3630,154 @@ def get_connectivity_task_status(task_id):
     })
 
 
-@app.route('/api/channels/test-connectivity-sync', methods=['POST'])
-def test_channel_connectivity_sync():
-    """Synchronously test connectivity of a single channel - returns result immediately"""
+def run_connectivity_job(job):
+    """Run a single-channel connectivity job and publish its result"""
     global tv_channels
 
-    data = request.json
-    ip = data.get('ip', '')
+    ip = job['ip']
+    try:
+        if ip not in tv_channels:
+            job['result'] = {"ip": ip, "connectivity": "offline", "timestamp": datetime.now().isoformat(), "message": "Channel not found"}
+            return
 
-    if not ip:
-        return jsonify({"status": "error", "message": "No IP provided"}), 400
+        config = load_config()
+        channel = tv_channels[ip]
+        url = channel.get('url', '')
+        channel_name = channel.get('name', ip)
 
-    if ip not in tv_channels:
-        return jsonify({"status": "error", "message": "Channel not found"}), 404
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Testing channel: {channel_name} ({ip})")
+        sys.stdout.flush()
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] URL: {url}")
+        sys.stdout.flush()
 
-    config = load_config()
-    channel = tv_channels[ip]
-    url = channel.get('url', '')
-    channel_name = channel.get('name', ip)
+        if not url:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] No URL for {ip}")
+            sys.stdout.flush()
+            job['result'] = apply_connectivity_outcome(ip, {"status": "failed", "error": "No URL"}, offline_on_failure=True)
+            save_channels()
+            return
 
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Testing channel: {channel_name} ({ip})")
-    sys.stdout.flush()
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] URL: {url}")
-    sys.stdout.flush()
+        # Share the probe with any scan, retry or background task testing the same stream
+        key = probe_key(probe_stream_connectivity, url, config, connectivity_screenshot_path(ip))
+        outcome, shared = run_coalesced_probe(key, lambda: probe_stream_connectivity(ip, url, config))
+        if shared:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Reused concurrent probe result for {url}")
+            sys.stdout.flush()
 
-    if not url:
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] No URL for {ip}")
+        job['result'] = apply_connectivity_outcome(ip, outcome)
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] {ip}: {job['result']['connectivity']}")
         sys.stdout.flush()
-        tv_channels[ip]['connectivity'] = 'offline'
-        tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-        tv_channels[ip]['timestamp'] = datetime.now().isoformat()
         save_channels()
-        return jsonify({"status": "success", "result": {"ip": ip, "connectivity": "offline", "timestamp": tv_channels[ip]['timestamp'], "message": "No URL"}})
 
-    try:
-        timeout = config.get("timeout") or 10
-        if isinstance(timeout, str):
-            try:
-                timeout = int(timeout)
-            except:
-                timeout = 10
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Error testing {ip}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.stdout.flush()
+        job['error'] = str(e)
+    finally:
+        job['status'] = 'failed' if job.get('error') else 'completed'
+        job['end_time'] = datetime.now().isoformat()
+        job['finished_at'] = time.time()
+        with connectivity_jobs_lock:
+            if connectivity_job_by_ip.get(ip) == job['job_id']:
+                del connectivity_job_by_ip[ip]
+        job['event'].set()
 
-        screenshot_path = os.path.join(SCREENSHOTS_DIR, f"connectivity_{ip.replace('.', '_')}.jpg")
 
-        # Build FFmpeg command
-        cmd = ["ffmpeg", "-y"]
+def get_or_start_connectivity_job(ip):
+    """Return the running connectivity job for an IP, starting one if needed
 
-        # Add timeout parameter for network streams (in microseconds)
-        cmd.extend(["-timeout", str(timeout * 1000000)])
+    A client that reconnects while its probe is still running is attached
+    to the existing job instead of starting a new probe.
+    """
+    with connectivity_jobs_lock:
+        # Forget finished jobs nobody has polled for a while
+        now = time.time()
+        for job_id in [j for j, job in connectivity_jobs.items()
+                       if job['event'].is_set() and now - job['finished_at'] > CONNECTIVITY_JOB_RETENTION_SECONDS]:
+            del connectivity_jobs[job_id]
+
+        job_id = connectivity_job_by_ip.get(ip)
+        if job_id in connectivity_jobs:
+            return connectivity_jobs[job_id], False
+
+        job = {
+            'job_id': f"connectivity_job_{str(uuid.uuid4())}",
+            'ip': ip,
+            'status': 'running',
+            'result': None,
+            'error': None,
+            'start_time': datetime.now().isoformat(),
+            'end_time': None,
+            'finished_at': None,
+            'event': threading.Event()
+        }
+        connectivity_jobs[job['job_id']] = job
+        connectivity_job_by_ip[ip] = job['job_id']
 
-        cmd.extend([
-            "-analyzeduration", "3000000",
-            "-probesize", "5000000"
-        ])
+    thread = threading.Thread(target=run_connectivity_job, args=(job,), daemon=True)
+    thread.start()
+    return job, True
 
-        if "rtp" in url.lower():
-            cmd.extend(["-rw_timeout", str(timeout * 1000000)])
 
-        custom_params = config.get("custom_params", "")
-        if custom_params and custom_params.strip():
-            import shlex
-            try:
-                custom_args = shlex.split(custom_params)
-                cmd.extend(custom_args)
-            except Exception as e:
-                print(f"[Connectivity Test Sync] Error parsing custom params: {e}")
+def connectivity_job_response(job, wait):
+    """Long-poll a connectivity job for up to `wait` seconds and build the response"""
+    try:
+        wait = float(wait)
+    except (TypeError, ValueError):
+        wait = CONNECTIVITY_JOB_DEFAULT_WAIT
+    wait = max(0, min(wait, CONNECTIVITY_JOB_MAX_WAIT))
 
-        # Probe for 4K detection
-        probe_cmd = [
-            "ffmpeg", "-hide_banner",
-            "-analyzeduration", "5000000",
-            "-probesize", "10000000",
-            "-t", "3", "-i", url,
-            "-f", "null", "-"
-        ]
+    job['event'].wait(timeout=wait)
 
-        detected_resolution = None
-        is_4k = False
-        try:
-            probe_process = subprocess.Popen(probe_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-            probe_stdout, probe_stderr = probe_process.communicate(timeout=8)
+    if job['status'] == 'running':
+        return jsonify({
+            "status": "pending",
+            "job_id": job['job_id'],
+            "ip": job['ip'],
+            "start_time": job['start_time']
+        }), 202
 
-            if probe_stderr:
-                import re
-                resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
-                match = re.search(resolution_pattern, probe_stderr)
-                if match:
-                    detected_resolution = match.group(1)
-                    width, height = map(int, detected_resolution.split('x'))
-                    is_4k = width >= 3840
-        except Exception as e:
-            print(f"[Connectivity Test Sync] Probe failed: {e}")
+    if job['status'] == 'failed':
+        return jsonify({"status": "error", "job_id": job['job_id'], "message": job.get('error') or 'Test failed'}), 500
 
-        cmd.extend(["-i", url])
+    return jsonify({"status": "success", "job_id": job['job_id'], "result": job['result']})
 
-        if is_4k:
-            # For 4K streams, capture first frame without scaling (keep original resolution)
-            cmd.extend(["-frames:v", "1", "-q:v", "1", "-vf", "yadif", "-f", "image2", screenshot_path])
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Using 4K capture mode (no scaling)")
-            sys.stdout.flush()
-        else:
-            # For standard streams, scale to 1080p
-            cmd.extend(["-frames:v", "1", "-q:v", "1", "-vf", "yadif", "-s", "1920x1080", "-f", "image2", screenshot_path])
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Using standard capture mode (1080p)")
-            sys.stdout.flush()
 
-        # Print the actual command for debugging
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] FFmpeg command: {' '.join(cmd)}")
-        sys.stdout.flush()
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Executing FFmpeg command...")
-        sys.stdout.flush()
+@app.route('/api/channels/test-connectivity-sync', methods=['POST'])
+def test_channel_connectivity_sync():
+    """Test connectivity of a single channel as a job, long-polling for the result
 
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    Waits up to `wait` seconds (bounded by CONNECTIVITY_JOB_MAX_WAIT) and
+    returns the result as soon as the probe finishes. If the probe is still
+    running, responds 202 with a job_id to poll via the status endpoint.
+    """
+    data = request.json
+    ip = data.get('ip', '')
 
-        try:
-            stdout, stderr = process.communicate(timeout=timeout)
+    if not ip:
+        return jsonify({"status": "error", "message": "No IP provided"}), 400
 
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] FFmpeg return code: {process.returncode}")
-            sys.stdout.flush()
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Screenshot exists: {os.path.exists(screenshot_path)}")
-            sys.stdout.flush()
+    if ip not in tv_channels:
+        return jsonify({"status": "error", "message": "Channel not found"}), 404
 
-            # Parse resolution from stderr first
-            resolution = None
-            if stderr:
-                import re
-                resolution_pattern = r'Stream.*Video.*\s(\d{3,4}x\d{3,4})'
-                match = re.search(resolution_pattern, stderr)
-                if match:
-                    resolution = match.group(1)
-                    try:
-                        width, height = map(int, resolution.split('x'))
-                        if width > 0 and height > 0:
-                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Detected resolution from FFmpeg: {resolution}")
-                            sys.stdout.flush()
-                        else:
-                            resolution = None
-                    except:
-                        resolution = None
+    job, started = get_or_start_connectivity_job(ip)
+    if not started:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Reattached to running job {job['job_id']} for {ip}")
+        sys.stdout.flush()
 
-            # For 4K streams, if we detected resolution in stderr, consider it successful even without screenshot
-            if is_4k and resolution and not os.path.exists(screenshot_path):
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] 4K stream: FFmpeg detected stream info, marking as online even without screenshot")
-                sys.stdout.flush()
-                tv_channels[ip]['connectivity'] = 'online'
-                tv_channels[ip]['resolution'] = resolution
-                tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                save_channels()
-                return jsonify({
-                    "status": "success",
-                    "result": {
-                        "ip": ip,
-                        "connectivity": "online",
-                        "screenshot": None,
-                        "resolution": resolution,
-                        "name": tv_channels[ip].get('name', ''),
-                        "timestamp": tv_channels[ip]['timestamp'],
-                        "message": "4K stream detected (no screenshot)"
-                    }
-                })
+    return connectivity_job_response(job, data.get('wait', CONNECTIVITY_JOB_DEFAULT_WAIT))
 
-            if process.returncode == 0 and os.path.exists(screenshot_path):
-                tv_channels[ip]['screenshot'] = f"/screenshots/{os.path.basename(screenshot_path)}"
-
-                # Use the resolution we already parsed above
-                if resolution:
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Success! Resolution: {resolution}")
-                    sys.stdout.flush()
-                    tv_channels[ip]['connectivity'] = 'online'
-                    tv_channels[ip]['resolution'] = resolution
-                    tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                    tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                    save_channels()
-                    return jsonify({
-                        "status": "success",
-                        "result": {
-                            "ip": ip,
-                            "connectivity": "online",
-                            "screenshot": tv_channels[ip]['screenshot'],
-                            "resolution": resolution,
-                            "name": tv_channels[ip].get('name', ''),
-                            "timestamp": tv_channels[ip]['timestamp']
-                        }
-                    })
-                else:
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Screenshot captured but no resolution detected")
-                    sys.stdout.flush()
-                    if stderr:
-                        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] FFmpeg stderr (first 500 chars): {stderr[:500]}")
-                        sys.stdout.flush()
-                    previous_connectivity = channel.get('connectivity', 'untested')
-                    new_connectivity = 'offline' if previous_connectivity == 'online' else previous_connectivity
-                    tv_channels[ip]['connectivity'] = new_connectivity
-                    tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                    tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                    save_channels()
-                    return jsonify({"status": "success", "result": {"ip": ip, "connectivity": new_connectivity, "timestamp": tv_channels[ip]['timestamp'], "message": "No resolution detected"}})
-            else:
-                # FFmpeg failed or screenshot not created
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] FFmpeg failed or screenshot not created")
-                sys.stdout.flush()
-                if stderr:
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] FFmpeg stderr:\n{stderr}")
-                    sys.stdout.flush()
-                previous_connectivity = channel.get('connectivity', 'untested')
-                new_connectivity = 'offline' if previous_connectivity == 'online' else previous_connectivity
-                tv_channels[ip]['connectivity'] = new_connectivity
-                tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-                tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-                save_channels()
-                return jsonify({"status": "success", "result": {"ip": ip, "connectivity": new_connectivity, "timestamp": tv_channels[ip]['timestamp'], "message": "FFmpeg failed"}})
 
-        except subprocess.TimeoutExpired:
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Test timed out after {timeout} seconds")
-            sys.stdout.flush()
-            process.kill()
-            previous_connectivity = channel.get('connectivity', 'untested')
-            new_connectivity = 'offline' if previous_connectivity == 'online' else previous_connectivity
-            tv_channels[ip]['connectivity'] = new_connectivity
-            tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-            tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-            save_channels()
-            return jsonify({"status": "success", "result": {"ip": ip, "connectivity": new_connectivity, "timestamp": tv_channels[ip]['timestamp'], "message": "Timeout"}})
+@app.route('/api/channels/test-connectivity-sync/<job_id>', methods=['GET'])
+def get_connectivity_job(job_id):
+    """Long-poll a single-channel connectivity job started by test-connectivity-sync"""
+    job = connectivity_jobs.get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
 
-    except Exception as e:
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Connectivity Sync] Error testing {ip}: {str(e)}")
-        sys.stdout.flush()
-        import traceback
-        traceback.print_exc()
-        sys.stdout.flush()
-        previous_connectivity = channel.get('connectivity', 'untested')
-        new_connectivity = 'offline' if previous_connectivity == 'online' else previous_connectivity
-        tv_channels[ip]['connectivity'] = new_connectivity
-        tv_channels[ip]['connectivity_time'] = datetime.now().isoformat()
-        tv_channels[ip]['timestamp'] = datetime.now().isoformat()
-        save_channels()
-        return jsonify({"status": "success", "result": {"ip": ip, "connectivity": new_connectivity, "timestamp": tv_channels[ip]['timestamp'], "message": str(e)}})
+    return connectivity_job_response(job, request.args.get('wait', CONNECTIVITY_JOB_DEFAULT_WAIT))
 
 
 @app.route('/api/channels/clear-names', methods=['POST'])
@@ -2892,9 +3786,9 @@ def clear_channel_names():
     global tv_channels
 
     cleared_count = 0
-    for ip in tv_channels:
+    for ip in list(tv_channels):
         if tv_channels[ip].get('name'):
-            tv_channels[ip]['name'] = ''
+            update_channel_record(ip, {'name': ''})
             cleared_count += 1
 
     save_channels()
@@ -3052,7 +3946,7 @@ def recognize_channels():
 
                     # Update channel name if valid
                     if channel_name and channel_name != "未知频道" and channel_name != "":
-                        tv_channels[ip]['name'] = channel_name
+                        update_channel_record(ip, {'name': channel_name})
                         recognized_count += 1
                         print(f"[AI Recognition] Successfully set channel name for {ip}: {channel_name}")
                     else:
@@ -3089,11 +3983,14 @@ if __name__ == '__main__':
     # Initialize database
     config = load_config()
     db = Database(config)
+    db_writer = DatabaseWriter(db)
+    atexit.register(db_writer.flush, 10)
 
     # Load previous results and channels
     test_results = load_results()
     tv_channels = load_channels()
     groups = load_groups()
+    rebuild_channel_group_index()
 
     # Initialize scheduled tasks
     init_scheduled_tasks()
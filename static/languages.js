@@ -25,6 +25,8 @@ const translations = {
         failed: '失败',
         resolution: '分辨率',
         retry: '重试',
+        retryFailed: '重试失败项',
+        retrying: '重试中',
 
         // Channels Tab
         channelsLibrary: '电视频道库',
@@ -35,6 +37,7 @@ const translations = {
         clearNames: '清空频道名',
         exportM3u: '导出M3U',
         totalChannels: '共',
+        loadMore: '加载更多',
         channels: '个频道',
         ungrouped: '未分组',
         filterByGroup: '按分组筛选',
@@ -95,6 +98,8 @@ const translations = {
         timeoutHint: '等待流响应的最大时间',
         queueSize: '并发队列大小',
         queueSizeHint: '同时测试的流数量（默认：5）',
+        secondPass: '自动二次扫描',
+        secondPassHint: '扫描结束后以一半并发、两倍超时重新测试超时的流',
 //        customParams: '自定义FFmpeg参数',
 //        customParamsHint: '附加的FFmpeg参数（如硬件加速）',
 
@@ -207,6 +212,8 @@ const translations = {
         failed: 'Failed',
         resolution: 'Resolution',
         retry: 'Retry',
+        retryFailed: 'Retry Failed',
+        retrying: 'Retrying',
 
         // Channels Tab
         channelsLibrary: 'TV Channels Library',
@@ -217,6 +224,7 @@ const translations = {
         clearNames: 'Clear Names',
         exportM3u: 'Export M3U',
         totalChannels: 'Total',
+        loadMore: 'Load More',
         channels: 'channels',
         ungrouped: 'Ungrouped',
         filterByGroup: 'Filter by Group',
@@ -277,6 +285,8 @@ const translations = {
         timeoutHint: 'Maximum time to wait for stream response',
         queueSize: 'Concurrent Queue Size',
         queueSizeHint: 'Number of streams to test simultaneously (default: 5)',
+        secondPass: 'Automatic Second Pass',
+        secondPassHint: 'Retest timed-out streams after a scan with half the concurrency and double the timeout',
         customParams: 'Custom FFmpeg Parameters',
         customParamsHint: 'Additional FFmpeg parameters (e.g., hardware acceleration)',
 
@@ -120,6 +120,9 @@ document.getElementById('config-form').addEventListener('submit', async (e) => {
 
     // Get AI model configuration
     const aiEnabled = document.getElementById('ai-enabled').checked;
+
+    // Get second pass setting
+    const secondPass = document.getElementById('second-pass-enabled').checked;
     const aiApiUrl = document.getElementById('ai-api-url').value;
     const aiApiKey = document.getElementById('ai-api-key').value;
     const aiModel = document.getElementById('ai-model').value;
@@ -149,6 +152,7 @@ document.getElementById('config-form').addEventListener('submit', async (e) => {
             body: JSON.stringify({
                 timeout: timeout,
                 queue_size: queueSize,
+                second_pass: secondPass,
                 custom_params: customParams,
                 metadata_source_url: metadataSourceUrl,
                 epg_url: epgUrl,
@@ -294,6 +298,9 @@ async function loadConfig() {
             document.getElementById('queue-size').value = '';
         }
 
+        // Load second pass setting
+        document.getElementById('second-pass-enabled').checked = config.second_pass || false;
+
         // Load custom params if element exists (currently commented out in HTML)
         const customParamsElement = document.getElementById('custom-params');
         if (customParamsElement) {
@@ -461,8 +468,11 @@ async function checkTestStatus() {
             }
         }
 
+        const retryRunning = (data.retry && data.retry.status === 'running') ||
+            (data.second_pass && data.second_pass.status === 'running');
+
         // Stop checking only if test is completed AND no results are in 'testing' status
-        if (data.status === 'completed' && !hasTestingStatus) {
+        if (data.status === 'completed' && !hasTestingStatus && !retryRunning) {
             console.log('All tests completed, stopping status check');
             clearInterval(statusCheckInterval);
             statusCheckInterval = null;
@@ -474,6 +484,16 @@ async function checkTestStatus() {
 
 // Update progress bar
 function updateProgress(data) {
+    // Show bulk retry or second pass progress while one is running
+    const retry = [data.retry, data.second_pass].find(r => r && r.status === 'running');
+    if (retry) {
+        const percentage = retry.total > 0 ? (retry.completed / retry.total) * 100 : 0;
+        document.getElementById('progress-fill').style.width = percentage + '%';
+        document.getElementById('progress-text').textContent =
+            `${i18n.get('retrying')}: ${retry.completed} / ${retry.total} (${i18n.get('success')}: ${retry.recovered})`;
+        return;
+    }
+
     const completed = data.completed || 0;
     const total = data.total || 0;
     const percentage = total > 0 ? (completed / total) * 100 : 0;
@@ -481,6 +501,40 @@ function updateProgress(data) {
     document.getElementById('progress-text').textContent = `Testing: ${completed} / ${total}`;
 }
 
+// Retry all failed IPs of the current test through the server-side queue
+async function retryFailedTests() {
+    if (!currentTestId) return;
+
+    const btn = document.getElementById('retry-failed-btn');
+    btn.disabled = true;
+
+    try {
+        const response = await fetch('/api/test/retry-bulk', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                test_id: currentTestId,
+                filter: 'failed'
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.status === 'retrying') {
+            startStatusCheck();
+        } else if (data.status === 'error') {
+            alert(data.message);
+        }
+    } catch (error) {
+        console.error('Failed to start bulk retry:', error);
+        alert('Failed to retry tests: ' + error.message);
+    } finally {
+        btn.disabled = false;
+    }
+}
+
 // Update results display
 function updateResults(results) {
     const resultsGrid = document.getElementById('results-grid');
@@ -1014,6 +1068,11 @@ function addTestSelector(sortedTests) {
 // Global variable to store all channels and groups
 let allChannels = {};
 let allChannelsCache = null;  // Cache all channels (without filters) to avoid duplicate API calls
+let allChannelsCacheVersion = null;  // Library version the cache was loaded at
+const CHANNEL_PAGE_SIZE = 200;  // Channels fetched per page of the list
+let channelsNextCursor = null;  // Cursor of the next page, null when the list is complete
+let channelsTotal = 0;  // Number of channels matching the current filters
+let libraryVersion = null;  // Library version of the last loaded page
 let allGroupsCache = {};  // Cache groups data for sorting
 let channelStats = null;  // Statistics from backend
 let currentGroupFilter = 'all';
@@ -1036,9 +1095,6 @@ async function loadChannels() {
 
     isLoadingChannels = true;
 
-    // Clear cache to ensure fresh data is loaded
-    allChannelsCache = null;
-
     try {
         // Restore saved filters or use defaults
         const savedConnectivityFilter = localStorage.getItem('connectivityFilter');
@@ -1067,7 +1123,8 @@ async function loadChannels() {
             group: currentGroupFilter,
             resolution: currentChannelResolutionFilter,
             connectivity: currentConnectivityFilter,
-            search: currentIPFilter
+            search: currentIPFilter,
+            limit: CHANNEL_PAGE_SIZE
         });
 
         // Load groups first if not cached (avoid duplicate API calls)
@@ -1098,6 +1155,9 @@ async function loadChannels() {
         if (data.status === 'success') {
             allChannels = data.channels;
             channelStats = data.stats;  // Save statistics from backend
+            channelsNextCursor = data.next_cursor;
+            channelsTotal = data.total;
+            libraryVersion = data.version;
             updateGroupFilterButtons();
 
             // Restore filter button states after buttons are created
@@ -1131,6 +1191,7 @@ async function loadChannels() {
             }, 100);
 
             displayChannels(allChannels);
+            updateLoadMoreButton();
         }
     } catch (error) {
         console.error('Failed to load channels:', error);
@@ -1139,6 +1200,63 @@ async function loadChannels() {
     }
 }
 
+// Append the next page of the channel list
+async function loadMoreChannels() {
+    if (!channelsNextCursor || isLoadingChannels) return;
+
+    isLoadingChannels = true;
+    try {
+        const params = new URLSearchParams({
+            group: currentGroupFilter,
+            resolution: currentChannelResolutionFilter,
+            connectivity: currentConnectivityFilter,
+            search: currentIPFilter,
+            limit: CHANNEL_PAGE_SIZE,
+            cursor: channelsNextCursor
+        });
+        const response = await fetch(`/api/channels?${params}`);
+        const data = await response.json();
+
+        if (data.status === 'success') {
+            const channelsTbody = document.getElementById('channels-tbody');
+            data.channels.forEach(channel => {
+                allChannels.push(channel);
+                channelsTbody.appendChild(createChannelRow(channel.ip, channel));
+            });
+            channelsNextCursor = data.next_cursor;
+            channelsTotal = data.total;
+            libraryVersion = data.version;
+            updateLoadMoreButton();
+        }
+    } catch (error) {
+        console.error('Failed to load more channels:', error);
+    } finally {
+        isLoadingChannels = false;
+    }
+}
+
+// Show the load more button while pages remain
+function updateLoadMoreButton() {
+    const button = document.getElementById('channels-load-more');
+    if (!button) return;
+
+    button.style.display = channelsNextCursor ? 'block' : 'none';
+    button.textContent = `${i18n.get('loadMore')} (${allChannels.length} / ${channelsTotal})`;
+}
+
+// Fetch all channels for the group dialogs, reusing the cache while the library is unchanged
+async function getAllChannelsCached() {
+    if (!allChannelsCache || allChannelsCacheVersion !== libraryVersion) {
+        const response = await fetch('/api/channels');
+        const data = await response.json();
+        if (data.status === 'success') {
+            allChannelsCache = data.channels;
+            allChannelsCacheVersion = data.version;
+        }
+    }
+    return allChannelsCache;
+}
+
 // Update group filter buttons using backend statistics
 function updateGroupFilterButtons() {
     if (!channelStats) return;  // Wait for stats from backend
@@ -1167,6 +1285,7 @@ function updateGroupFilterButtons() {
     document.getElementById('resolution-count-4k').textContent = resolutionCounts['4k'] || 0;
     document.getElementById('resolution-count-1080').textContent = resolutionCounts['1080'] || 0;
     document.getElementById('resolution-count-720').textContent = resolutionCounts['720'] || 0;
+    document.getElementById('resolution-count-other').textContent = resolutionCounts['other'] || 0;
     document.getElementById('resolution-count-unknown').textContent = resolutionCounts['unknown'] || 0;
 
     // Update connectivity counts
@@ -2522,14 +2641,18 @@ async function testSingleChannelConnectivity(ip) {
             }
         }
 
-        // Call synchronous API for single channel test
+        // Start (or reattach to) the connectivity job and long-poll until it finishes
         const response = await fetch('/api/channels/test-connectivity-sync', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ ip: ip })
         });
 
-        const data = await response.json();
+        let data = await response.json();
+        while (data.status === 'pending' && data.job_id) {
+            const pollResponse = await fetch(`/api/channels/test-connectivity-sync/${data.job_id}?wait=20`);
+            data = await pollResponse.json();
+        }
 
         if (data.status === 'success' && data.result) {
             const result = data.result;
@@ -2651,10 +2774,20 @@ async function testAllChannelsConnectivity() {
         const testingText = i18n.get('testing') || 'Testing';
         btn.innerHTML = `<span>⏳</span> <span>${testingText}...</span>`;
 
-        // Get all channel IPs from the current filtered view
-        const allChannelIps = Array.isArray(allChannels)
-            ? allChannels.map(ch => ch.ip)
-            : Object.keys(allChannels);
+        // Get all channel IPs of the current filtered view, including pages not loaded yet
+        const params = new URLSearchParams({
+            group: currentGroupFilter,
+            resolution: currentChannelResolutionFilter,
+            connectivity: currentConnectivityFilter,
+            search: currentIPFilter,
+            fields: 'ip'
+        });
+        const channelsResponse = await fetch(`/api/channels?${params}`);
+        const channelsData = await channelsResponse.json();
+        if (channelsData.status !== 'success') {
+            throw new Error(channelsData.message || 'Failed to load channels');
+        }
+        const allChannelIps = channelsData.channels.map(ch => ch.ip);
 
         if (allChannelIps.length === 0) {
             alert('没有频道可测试');
@@ -3044,24 +3177,17 @@ async function displayGroupChannels() {
         return;
     }
 
-    // Get full channel info (use cache to avoid duplicate API calls)
+    // Get full channel info of the group members only
     try {
-        // Load all channels if not cached
-        if (!allChannelsCache) {
-            const response = await fetch('/api/channels');
-            const data = await response.json();
-            if (data.status === 'success') {
-                allChannelsCache = data.channels;
-            }
-        }
+        const response = await fetch(`/api/channels?${new URLSearchParams({group: currentGroupId, fields: 'name,screenshot,resolution'})}`);
+        const data = await response.json();
+        const groupChannels = data.status === 'success' ? data.channels : null;
 
-        if (allChannelsCache) {
+        if (groupChannels) {
             channelsList.innerHTML = '';
 
             // Convert channels array to object for quick lookup
-            const channelsMap = Array.isArray(allChannelsCache)
-                ? Object.fromEntries(allChannelsCache.map(ch => [ch.ip, ch]))
-                : allChannelsCache;
+            const channelsMap = Object.fromEntries(groupChannels.map(ch => [ch.ip, ch]));
 
             group.channels.forEach(ip => {
                 const channel = channelsMap[ip];
@@ -3198,14 +3324,7 @@ async function showAddChannelsModal() {
 
     // Load available channels (use cache to avoid duplicate API calls)
     try {
-        // Load all channels if not cached
-        if (!allChannelsCache) {
-            const response = await fetch('/api/channels');
-            const data = await response.json();
-            if (data.status === 'success') {
-                allChannelsCache = data.channels;
-            }
-        }
+        await getAllChannelsCached();
 
         if (allChannelsCache) {
             const group = allGroups[currentGroupId];
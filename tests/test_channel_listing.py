@@ -0,0 +1,44 @@
+import pytest
+
+import main
+from db import Database, DatabaseWriter
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    database = Database({'database': {'sqlite_path': str(tmp_path / 'iptv.db')}})
+    database.save_channels({f'239.1.1.{i}': {'name': f'CCTV-{i}'} for i in range(1, 6)})
+    monkeypatch.setattr(main, 'db', database)
+    monkeypatch.setattr(main, 'db_writer', DatabaseWriter(database))
+    return main.app.test_client()
+
+
+@pytest.mark.parametrize('query', ['limit=-1', 'limit=0', 'limit=ten', 'offset=-5'])
+def test_database_listing_rejects_invalid_paging(client, query):
+    response = client.get(f'/api/channels?source=db&{query}')
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+def test_database_listing_clamps_limit(client, monkeypatch):
+    monkeypatch.setattr(main, 'CHANNEL_PAGE_MAX_SIZE', 2)
+    body = client.get('/api/channels?source=db&limit=1000&offset=1').get_json()
+    assert (body['limit'], body['offset'], body['total']) == (2, 1, 5)
+    assert len(body['channels']) == 2
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=-3', 'limit=all'])
+def test_listing_rejects_invalid_limit(client, query):
+    response = client.get(f'/api/channels?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+def test_listing_clamps_limit(client, monkeypatch):
+    monkeypatch.setattr(main, 'CHANNEL_PAGE_MAX_SIZE', 2)
+    monkeypatch.setattr(main, 'tv_channels', main.db.get_all_channels())
+    main.rebuild_channel_group_index()
+
+    body = client.get('/api/channels?limit=1000').get_json()
+    assert len(body['channels']) == 2
+    assert body['next_cursor'] is not None
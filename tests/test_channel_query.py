@@ -0,0 +1,47 @@
+import pytest
+
+from db import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database({'database': {'sqlite_path': str(tmp_path / 'iptv.db')}})
+    database.save_channels({
+        '10.0.0.1': {'name': '湖南卫视', 'tvg_id': 'HunanTV'},
+        '10.0.0.2': {'name': 'CCTV-1', 'tvg_id': 'cctv1'}
+    })
+    return database
+
+
+def search(database, query):
+    return [ip for ip, _ in database.query_channels({'search': query})[1]]
+
+
+def test_search_matches_tvg_id(database):
+    assert search(database, 'hunantv') == ['10.0.0.1']
+    assert search(database, '10.0.0.2') == ['10.0.0.2']
+
+
+def test_search_matches_pinyin(database):
+    pytest.importorskip('pypinyin')
+    assert search(database, 'hnws') == ['10.0.0.1']
+
+    database.update_channel('10.0.0.2', {'name': '北京卫视'})
+    assert search(database, 'beijing') == ['10.0.0.2']
+
+
+def test_listing_orders_by_first_group_once_per_channel(database):
+    database.save_channels({'10.0.0.3': {'name': 'CCTV-5'}})
+    database.save_groups({
+        'news': {'name': 'News', 'sort_order': 2, 'channels': ['10.0.0.1', '10.0.0.2']},
+        'sports': {'name': 'Sports', 'sort_order': 1, 'channels': ['10.0.0.3', '10.0.0.2']}
+    })
+
+    total, page = database.query_channels({}, limit=2, offset=0)
+    assert total == 3
+    assert [ip for ip, _ in page] == ['10.0.0.2', '10.0.0.3']
+    assert [group['id'] for group in page[0][1]['groups']] == ['sports', 'news']
+
+    total, page = database.query_channels({}, limit=2, offset=2, count=False)
+    assert total is None
+    assert [ip for ip, _ in page] == ['10.0.0.1']
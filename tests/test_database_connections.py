@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+from db import SQLITE_POOL_SIZE, Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    return Database({'database': {'sqlite_path': str(tmp_path / 'iptv.db')}})
+
+
+def test_connections_are_reused_across_threads(database):
+    database.save_channels({'10.0.0.1': {'name': 'CCTV-1', 'url': 'http://x/1'}})
+    opened = database.get_pool_stats()['connections_opened']
+
+    # Flask serves every request on a new thread
+    for _ in range(20):
+        thread = threading.Thread(target=database.get_all_channels)
+        thread.start()
+        thread.join()
+
+    assert database.get_pool_stats()['connections_opened'] == opened
+
+
+def test_failed_query_releases_and_rolls_back(database):
+    with pytest.raises(Exception):
+        with database._connection() as conn:
+            conn.execute("INSERT INTO groups (id, name, sort_order) VALUES ('g1', 'News', 1)")
+            conn.execute('SELECT * FROM missing_table')
+
+    assert database.get_all_groups() == {}
+    assert len(database._idle) == 1
+
+
+def test_idle_pool_is_bounded(database):
+    connections = [database._get_connection() for _ in range(SQLITE_POOL_SIZE + 2)]
+    for conn in connections:
+        database._release_connection(conn)
+
+    assert len(database._idle) == SQLITE_POOL_SIZE
@@ -0,0 +1,91 @@
+import main
+from db import DatabaseWriter
+
+
+class RecordingDatabase:
+    """Stands in for a database backend and records the writes it receives"""
+
+    def __init__(self, fail_channels=False):
+        self.fail_channels = fail_channels
+        self.calls = []
+
+    def save_channels(self, channels):
+        if self.fail_channels:
+            raise RuntimeError('database is locked')
+        self.calls.append(('save_channels', dict(channels)))
+
+    def add_group_channels(self, group_id, ips):
+        self.calls.append(('add_group_channels', group_id, list(ips)))
+
+    def delete_channel(self, ip):
+        self.calls.append(('delete_channel', ip))
+
+
+def test_merged_channel_upsert_keeps_its_position():
+    database = RecordingDatabase()
+    writer = DatabaseWriter(database, max_latency=10)
+
+    writer.save_channels({'10.0.0.1': {'name': 'old'}})
+    writer.submit(database.add_group_channels, 'g1', ['10.0.0.1'])
+    writer.save_channels({'10.0.0.1': {'name': 'new'}})
+    assert writer.flush(timeout=5)
+
+    assert database.calls == [
+        ('save_channels', {'10.0.0.1': {'name': 'new'}}),
+        ('add_group_channels', 'g1', ['10.0.0.1'])
+    ]
+
+
+def test_merged_delete_runs_after_intents_queued_before_it():
+    database = RecordingDatabase()
+    writer = DatabaseWriter(database, max_latency=10)
+
+    writer.save_channels({'10.0.0.1': {'name': 'old'}})
+    writer.submit(database.add_group_channels, 'g1', ['10.0.0.1'])
+    writer.submit(database.delete_channel, '10.0.0.1', key=('channel', '10.0.0.1'))
+    assert writer.flush(timeout=5)
+
+    assert database.calls == [('add_group_channels', 'g1', ['10.0.0.1']), ('delete_channel', '10.0.0.1')]
+
+
+def test_failed_channel_upsert_is_reported():
+    writer = DatabaseWriter(RecordingDatabase(fail_channels=True), max_latency=10)
+    failed = []
+
+    writer.save_channels({'10.0.0.1': {}, '10.0.0.2': {}}, on_error=failed.extend)
+    assert writer.flush(timeout=5)
+
+    assert sorted(failed) == ['10.0.0.1', '10.0.0.2']
+    assert writer.get_stats()['errors'] == 1
+
+
+def test_failed_channel_save_stays_dirty(monkeypatch):
+    monkeypatch.setattr(main, 'db_writer', DatabaseWriter(RecordingDatabase(fail_channels=True), max_latency=10))
+    monkeypatch.setattr(main, 'tv_channels', {'10.0.0.1': {'name': 'CCTV-1'}})
+    monkeypatch.setattr(main, 'dirty_channels', {'10.0.0.1'})
+
+    main.save_channels()
+    assert main.db_writer.flush(timeout=5)
+
+    assert main.dirty_channels == {'10.0.0.1'}
+
+
+def test_upsert_after_pending_delete_keeps_both_in_order():
+    database = RecordingDatabase()
+    writer = DatabaseWriter(database, max_latency=10)
+
+    writer.submit(database.delete_channel, '10.0.0.1', key=('channel', '10.0.0.1'))
+    writer.save_channels({'10.0.0.1': {'name': 'old'}})
+    writer.save_channels({'10.0.0.1': {'name': 'new'}})
+    assert writer.flush(timeout=5)
+
+    assert database.calls == [('delete_channel', '10.0.0.1'), ('save_channels', {'10.0.0.1': {'name': 'new'}})]
+    database.calls.clear()
+
+    writer.submit(database.delete_channel, '10.0.0.1', key=('channel', '10.0.0.1'))
+    writer.save_channels({'10.0.0.1': {'name': 'old'}})
+    writer.submit(database.delete_channel, '10.0.0.1', key=('channel', '10.0.0.1'))
+    writer.save_channels({'10.0.0.1': {'name': 'new'}})
+    assert writer.flush(timeout=5)
+
+    assert database.calls == [('delete_channel', '10.0.0.1'), ('save_channels', {'10.0.0.1': {'name': 'new'}})]
@@ -0,0 +1,46 @@
+import io
+
+import pytest
+
+import main
+from db import Database, DatabaseWriter
+
+
+PLAYLIST = '''#EXTM3U
+#EXTINF:-1 tvg-id="CCTV1" group-title="央视",CCTV-1
+http://192.168.2.2:7788/rtp/239.1.1.1:8000
+#EXTINF:-1 tvg-id="HunanTV" group-title="卫视",湖南卫视
+http://192.168.2.2:7788/rtp/239.1.1.2:8000
+'''
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    database = Database({'database': {'sqlite_path': str(tmp_path / 'iptv.db')}})
+    database.save_channels({'239.1.1.1': {'name': 'CCTV-1'}, '239.1.1.3': {'name': 'CCTV-5'}})
+    database.save_groups({'news': {'name': '卫视', 'sort_order': 1, 'channels': ['239.1.1.1', '239.1.1.3']}})
+    monkeypatch.setattr(main, 'db', database)
+    monkeypatch.setattr(main, 'db_writer', DatabaseWriter(database))
+    monkeypatch.setattr(main, 'tv_channels', database.get_all_channels())
+    monkeypatch.setattr(main, 'groups', database.get_all_groups())
+    monkeypatch.setattr(main, 'channel_group_index', {})
+    monkeypatch.setattr(main, 'dirty_channels', set())
+    main.rebuild_channel_group_index()
+    return database
+
+
+def test_import_writes_only_changed_memberships(database, monkeypatch):
+    monkeypatch.setattr(database, 'save_groups', lambda groups: pytest.fail('full group rewrite'))
+
+    response = main.app.test_client().post('/api/channels/import', data={
+        'file': (io.BytesIO(PLAYLIST.encode('utf-8')), 'channels.m3u')
+    }, content_type='multipart/form-data')
+    assert response.get_json()['groups_created'] == 1
+    assert main.db_writer.flush(timeout=5)
+
+    stored = database.get_all_groups()
+    created_id = next(g_id for g_id, group in stored.items() if group['name'] == '央视')
+    assert stored[created_id]['channels'] == ['239.1.1.1']
+    assert sorted(stored['news']['channels']) == ['239.1.1.2', '239.1.1.3']
+    assert {g_id: sorted(group['channels']) for g_id, group in stored.items()} == \
+        {g_id: sorted(group['channels']) for g_id, group in main.groups.items()}
@@ -0,0 +1,140 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import main
+
+
+URL = 'http://192.168.2.2:7788/rtp/239.1.1.1:8000'
+CONFIG = {'timeout': 10}
+
+
+@pytest.fixture(autouse=True)
+def clear_probe_flights():
+    main.probe_flights.clear()
+    yield
+    main.probe_flights.clear()
+
+
+def quick_probe_stream(url, config):
+    pass
+
+
+def capture_stream(url, ip, screenshot_path, config):
+    pass
+
+
+def test_quick_probe_does_not_stand_in_for_capture():
+    quick_started = threading.Event()
+    release_quick = threading.Event()
+
+    def slow_quick_probe():
+        quick_started.set()
+        release_quick.wait(5)
+        return {'status': 'success', 'screenshot': None, 'resolution': None}
+
+    quick_outcome = {}
+    quick_thread = threading.Thread(target=lambda: quick_outcome.update(
+        zip(('outcome', 'shared'), main.run_coalesced_probe(main.probe_key(quick_probe_stream, URL, CONFIG), slow_quick_probe)))
+    )
+    quick_thread.start()
+    assert quick_started.wait(5)
+
+    # The capture of the same stream runs its own probe while the quick probe is in flight
+    capture_calls = []
+
+    def capture():
+        capture_calls.append(1)
+        return {'status': 'success', 'screenshot': '/screenshots/t1.jpg', 'resolution': '1920x1080'}
+
+    outcome, shared = main.run_coalesced_probe(main.probe_key(capture_stream, URL, CONFIG, 't1.jpg'), capture)
+    release_quick.set()
+    quick_thread.join(5)
+
+    assert capture_calls == [1]
+    assert not shared
+    assert outcome['screenshot'] == '/screenshots/t1.jpg'
+    assert outcome['resolution'] == '1920x1080'
+    assert quick_outcome['outcome']['screenshot'] is None
+    assert not quick_outcome['shared']
+
+
+def test_capture_answers_quick_probe_of_the_same_stream():
+    calls = []
+    main.run_coalesced_probe(main.probe_key(capture_stream, URL, CONFIG, 't1.jpg'),
+                             lambda: calls.append('capture') or {'status': 'success', 'screenshot': 't1.jpg'})
+    outcome, shared = main.run_coalesced_probe(main.probe_key(quick_probe_stream, URL, CONFIG),
+                                               lambda: calls.append('quick') or {'status': 'success'},
+                                               lightweight=True)
+
+    assert calls == ['capture']
+    assert shared
+    # Only the reachability part of the capture is passed on
+    assert outcome == {'status': 'success'}
+
+
+def test_quick_probe_waits_for_running_capture():
+    capture_started = threading.Event()
+    release_capture = threading.Event()
+
+    def slow_capture():
+        capture_started.set()
+        release_capture.wait(5)
+        return {'status': 'failed', 'error': 'Stream not accessible', 'screenshot': None}
+
+    capture_thread = threading.Thread(target=lambda: main.run_coalesced_probe(
+        main.probe_key(capture_stream, URL, CONFIG, 't1.jpg'), slow_capture))
+    capture_thread.start()
+    assert capture_started.wait(5)
+
+    quick_outcome = {}
+    quick_thread = threading.Thread(target=lambda: quick_outcome.update(zip(('outcome', 'shared'), main.run_coalesced_probe(
+        main.probe_key(quick_probe_stream, URL, CONFIG), lambda: {'status': 'success'}, lightweight=True))))
+    quick_thread.start()
+    release_capture.set()
+    capture_thread.join(5)
+    quick_thread.join(5)
+
+    assert quick_outcome['shared']
+    assert quick_outcome['outcome'] == {'status': 'failed', 'error': 'Stream not accessible'}
+
+
+def test_captures_for_different_screenshots_are_not_shared():
+    calls = []
+
+    def capture(path):
+        calls.append(path)
+        return {'status': 'success', 'screenshot': path}
+
+    first, _ = main.run_coalesced_probe(main.probe_key(capture_stream, URL, CONFIG, 'a.jpg'), lambda: capture('a.jpg'))
+    second, shared = main.run_coalesced_probe(main.probe_key(capture_stream, URL, CONFIG, 'b.jpg'), lambda: capture('b.jpg'))
+
+    assert calls == ['a.jpg', 'b.jpg']
+    assert not shared
+    assert second['screenshot'] == 'b.jpg'
+
+
+def test_only_successes_are_reused():
+    key = main.probe_key(quick_probe_stream, URL, CONFIG)
+    calls = []
+
+    main.run_coalesced_probe(key, lambda: calls.append(1) or {'status': 'failed', 'error': 'Timeout after 10 seconds'})
+    outcome, shared = main.run_coalesced_probe(key, lambda: calls.append(2) or {'status': 'success'})
+    assert calls == [1, 2]
+    assert not shared
+
+    outcome, shared = main.run_coalesced_probe(key, lambda: calls.append(3) or {'status': 'success'})
+    assert calls == [1, 2]
+    assert shared
+    assert outcome['status'] == 'success'
+
+
+def test_quick_probe_tolerates_invalid_timeout(monkeypatch):
+    commands = []
+    monkeypatch.setattr(main.subprocess, 'run',
+                        lambda cmd, **kwargs: commands.append((cmd, kwargs)) or SimpleNamespace(returncode=0))
+
+    assert main.quick_probe_stream(URL, {'timeout': 'ten'}) == {'status': 'success'}
+    assert commands[0][0][commands[0][0].index('-timeout') + 1] == '10000000'
+    assert commands[0][1]['timeout'] == 15
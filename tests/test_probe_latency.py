@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+import pytest
+
+import main
+
+
+# Stands in for FFmpeg: reads the input, then writes the first frame a bit later
+FAKE_FFMPEG = '''
+import sys, time
+time.sleep(0.2)
+sys.stderr.write("[mpegts @ 0x1] Before avformat_find_stream_info() pos: 0 bytes read:32768\\n")
+sys.stderr.flush()
+print("frame=0\\nprogress=continue", flush=True)
+time.sleep(0.3)
+print("frame=1\\nprogress=end", flush=True)
+time.sleep(0.3)
+'''
+
+
+def test_latencies_are_timed_within_the_same_run():
+    returncode, stdout, stderr, ttfb_ms, ttff_ms = main.run_timed_ffmpeg([sys.executable, '-c', FAKE_FFMPEG], 10)
+
+    assert returncode == 0
+    assert 'progress=end' in stdout
+    assert main.FIRST_BYTE_MARKER in stderr
+    assert 150 <= ttfb_ms < ttff_ms
+    assert ttff_ms - ttfb_ms >= 250
+    # The first frame is reported before the process exits, not at its end
+    assert ttff_ms < 750
+
+
+def test_timeout_kills_the_run():
+    with pytest.raises(subprocess.TimeoutExpired):
+        main.run_timed_ffmpeg([sys.executable, '-c', 'import time; time.sleep(30)'], 0.5)
+
+
+def test_probe_without_measurement_keeps_stored_latency(monkeypatch):
+    monkeypatch.setattr(main, 'tv_channels', {'239.1.1.1': {'name': 'CCTV1', 'connectivity': 'online',
+                                                            'ttfb_ms': 120, 'ttff_ms': 900}})
+    monkeypatch.setattr(main, 'mark_channel_dirty', lambda ip: None)
+
+    main.apply_connectivity_outcome('239.1.1.1', {'status': 'failed', 'error': 'Timeout',
+                                                  'ttfb_ms': None, 'ttff_ms': None})
+    assert main.tv_channels['239.1.1.1']['ttff_ms'] == 900
+
+    main.apply_connectivity_outcome('239.1.1.1', {'status': 'success', 'resolution': '1920x1080',
+                                                  'ttfb_ms': 80, 'ttff_ms': 600})
+    assert (main.tv_channels['239.1.1.1']['ttfb_ms'], main.tv_channels['239.1.1.1']['ttff_ms']) == (80, 600)
@@ -0,0 +1,63 @@
+import pytest
+
+import main
+from db import Database, DatabaseWriter
+
+
+TEST_ID = '20240101120000'
+BASE_URL = 'http://192.168.2.2:7788/rtp/{ip}:8000'
+IPS = ['239.1.1.1', '239.1.1.2', '239.1.1.3', '239.1.1.4']
+
+
+@pytest.fixture(autouse=True)
+def scan_state(tmp_path, monkeypatch):
+    database = Database({'database': {'sqlite_path': str(tmp_path / 'iptv.db')}})
+    monkeypatch.setattr(main, 'db', database)
+    monkeypatch.setattr(main, 'db_writer', DatabaseWriter(database))
+    monkeypatch.setattr(main, 'test_results', {TEST_ID: {
+        'base_url': BASE_URL, 'status': 'running', 'total': len(IPS), 'completed': 0, 'results': {}
+    }})
+    main.probe_flights.clear()
+    yield
+    main.db_writer.flush(timeout=5)
+    main.probe_flights.clear()
+
+
+def test_second_pass_probes_again_right_after_the_first_pass(monkeypatch):
+    probes = []
+
+    def fake_capture(url, ip, screenshot_path, config):
+        probes.append((ip, config['timeout']))
+        # Fails under the load of the scan, works on the second attempt
+        if sum(1 for probed_ip, _ in probes if probed_ip == ip) == 1:
+            return {'status': 'failed', 'error': f"Timeout after {config['timeout']} seconds"}
+        return {'status': 'success', 'resolution': '1920x1080'}
+
+    monkeypatch.setattr(main, 'capture_stream', fake_capture)
+    config = {'timeout': '10'}
+
+    for ip in IPS:
+        main.test_iptv_stream(BASE_URL, ip, TEST_ID, config)
+    progress = main.run_second_pass(TEST_ID, config, queue_size=4)
+
+    assert len(probes) == 2 * len(IPS)
+    assert progress['recovered'] == len(IPS)
+    assert sorted(timeout for _, timeout in probes[len(IPS):]) == [20] * len(IPS)
+
+
+def test_retry_does_not_take_a_finished_success(monkeypatch):
+    probes = []
+    monkeypatch.setattr(main, 'capture_stream',
+                        lambda url, ip, screenshot_path, config: probes.append(ip) or {'status': 'success'})
+
+    main.test_iptv_stream(BASE_URL, IPS[0], TEST_ID, {})
+    main.test_iptv_stream(BASE_URL, IPS[0], TEST_ID, {}, is_retry=True)
+
+    assert probes == [IPS[0], IPS[0]]
+
+
+def test_second_pass_timeout_from_config_strings():
+    assert main.parse_timeout('10') == 10
+    assert main.parse_timeout('', 20) == 20
+    assert main.parse_timeout('abc') == 10
+    assert main.parse_timeout(None, 20) == 20
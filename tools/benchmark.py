@@ -0,0 +1,265 @@
+"""
+Benchmarks for the database and API hot paths of IPTV Sniffer
+
+Every scenario builds a synthetic library (channels spread over groups, one
+membership each, plus one large test) and times the code under test. With
+--compare OLD the same scenario also runs against main.py/db.py of a git
+revision, and --compare OLD..NEW runs two revisions instead of the working
+tree, so a change can be measured against its parent. For the change
+checked out at HEAD (use <commit>^..<commit> for an older one):
+
+    python tools/benchmark.py load --compare HEAD^..HEAD
+    python tools/benchmark.py snapshots --compare HEAD^..HEAD
+    python tools/benchmark.py bulk-write --postgresql "host=localhost dbname=iptv_bench user=postgres" --compare HEAD^..HEAD
+
+--postgresql needs a scratch database: its channel and group tables are
+emptied first.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ('load', 'bulk-write', 'snapshots')
+REPEAT = 3  # Runs per measurement, the best one is reported
+
+
+def synthetic_library(channel_count, group_count, seed=1):
+    """Channels and groups (one membership per channel) generated from a fixed seed"""
+    rng = random.Random(seed)
+    resolutions = ['3840x2160', '1920x1080', '1280x720', '720x576', '']
+    channels = {}
+    for i in range(channel_count):
+        ip = f'10.{i // 65536}.{i // 256 % 256}.{i % 256}'
+        channels[ip] = {
+            'name': f'CH {rng.randint(1, channel_count)}',
+            'url': f'http://192.168.2.2:7788/rtp/{ip}:8000',
+            'resolution': rng.choice(resolutions),
+            'connectivity': rng.choice(['online', 'offline', 'untested']),
+            'test_status': 'success',
+            'timestamp': '2024-01-01T12:00:00'
+        }
+    groups = {f'g{i}': {'name': f'Group {i}', 'sort_order': i, 'channels': []} for i in range(group_count)}
+    for i, ip in enumerate(channels):
+        groups[f'g{i % group_count}']['channels'].append(ip)
+    return channels, groups
+
+
+def synthetic_test(result_count):
+    """A finished scan with result_count per-IP results"""
+    results = {}
+    for i in range(result_count):
+        ip = f'172.16.{i // 256 % 256}.{i % 256}' if i < 65536 else f'172.17.{i // 256 % 256}.{i % 256}'
+        results[ip] = {
+            'ip': ip,
+            'url': f'http://192.168.2.2:7788/rtp/{ip}:8000',
+            'status': 'success' if i % 3 else 'failed',
+            'timestamp': '2024-01-01T12:00:00',
+            'screenshot': None,
+            'error': None if i % 3 else 'Timeout after 10 seconds'
+        }
+    return {
+        'base_url': 'http://192.168.2.2:7788/rtp/{ip}:8000',
+        'start_ip': '172.16.0.0',
+        'end_ip': '172.16.255.255',
+        'status': 'completed',
+        'total': result_count,
+        'completed': result_count,
+        'start_time': '2024-01-01T12:00:00',
+        'results': results
+    }
+
+
+def measure(func, repeat=REPEAT):
+    """Best wall time in ms of func over repeat runs, and its peak traced memory in MB
+
+    Memory is traced in one extra run, so tracing does not slow down the timed ones.
+    """
+    best_ms = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+
+    tracemalloc.start()
+    func()
+    peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return {'ms': round(best_ms, 1), 'mb': round(peak_mb, 1)}
+
+
+def database_config(args, work_dir):
+    if args.postgresql:
+        options = dict(option.split('=', 1) for option in args.postgresql.split())
+        return {'database': {'type': 'postgresql', 'postgresql': {
+            'host': options.get('host', 'localhost'),
+            'port': int(options.get('port', 5432)),
+            'database': options.get('dbname', 'iptv_bench'),
+            'user': options.get('user', 'postgres'),
+            'password': options.get('password', '')
+        }}}
+    return {'database': {'sqlite_path': os.path.join(work_dir, 'bench.db')}}
+
+
+def empty_tables(database):
+    """Clear the scratch database so each run starts from the same state"""
+    conn = database._get_connection()
+    cursor = conn.cursor()
+    for table in ('channel_groups', 'groups', 'channels'):
+        cursor.execute(f'DELETE FROM {table}')
+    conn.commit()
+    if hasattr(database, '_release_connection'):
+        database._release_connection(conn)
+
+
+def run_load(args, work_dir):
+    """Startup load of channels and groups (get_all_channels / get_all_groups)"""
+    from db import Database
+    channels, groups = synthetic_library(args.channels, args.groups)
+    config = database_config(args, work_dir)
+    database = Database(config)
+    empty_tables(database.db)
+    database.save_channels(channels)
+    database.save_groups(groups)
+
+    database = Database(config)
+    return {
+        'get_all_channels': measure(database.get_all_channels),
+        'get_all_groups': measure(database.get_all_groups)
+    }
+
+
+def run_bulk_write(args, work_dir):
+    """Bulk writes: saving the whole library and adding members to a group"""
+    from db import Database
+    channels, groups = synthetic_library(args.channels, args.groups)
+    database = Database(database_config(args, work_dir))
+
+    def save_channels():
+        empty_tables(database.db)
+        database.save_channels(channels)
+
+    results = {'save_channels': measure(save_channels)}
+    results['save_groups'] = measure(lambda: database.save_groups(groups))
+    if hasattr(database.db, 'add_group_channels'):
+        def add_group_channels():
+            database.save_groups({'g0': {'name': 'Group 0', 'sort_order': 0, 'channels': []}})
+            database.add_group_channels('g0', list(channels))
+        results['add_group_channels'] = measure(add_group_channels)
+    return results
+
+
+def run_snapshots(args, work_dir):
+    """Serializing channel, group and test views and saving every channel"""
+    import main
+    from db import Database
+
+    channels, groups = synthetic_library(args.channels, args.groups)
+    database = Database(database_config(args, work_dir))
+    empty_tables(database.db)
+    database.save_channels(channels)
+    database.save_groups(groups)
+
+    main.db = database
+    if hasattr(main, 'DatabaseWriter'):
+        main.db_writer = main.DatabaseWriter(database)
+    main.tv_channels = database.get_all_channels()
+    main.groups = database.get_all_groups()
+    if hasattr(main, 'rebuild_channel_group_index'):
+        main.rebuild_channel_group_index()
+    main.test_results['bench'] = synthetic_test(args.results)
+
+    client = main.app.test_client()
+    client.get('/api/channels')  # Warm up caches built on first use
+
+    def save_all_channels():
+        main.dirty_channels.update(main.tv_channels)
+        main.save_channels()
+
+    results = {
+        '/api/channels': measure(lambda: client.get('/api/channels')),
+        '/api/channels?limit=200': measure(lambda: client.get('/api/channels?limit=200')),
+        '/api/groups': measure(lambda: client.get('/api/groups')),
+        '/api/test/status/<id>': measure(lambda: client.get('/api/test/status/bench')),
+        'save_channels (all dirty)': measure(save_all_channels)
+    }
+    if hasattr(main, 'db_writer') and main.db_writer is not None:
+        main.db_writer.flush(timeout=60)
+    return results
+
+
+RUNNERS = {'load': run_load, 'bulk-write': run_bulk_write, 'snapshots': run_snapshots}
+
+
+def run_in(source_dir, args):
+    """Run a scenario in a subprocess importing main.py/db.py from source_dir"""
+    command = [sys.executable, os.path.abspath(__file__), args.scenario, '--source-dir', source_dir,
+               '--channels', str(args.channels), '--groups', str(args.groups), '--results', str(args.results)]
+    if args.postgresql:
+        command += ['--postgresql', args.postgresql]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    # Application logging goes to stdout as well; the measurements are the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def checkout(ref, target_dir):
+    """Write main.py and db.py of a git revision into target_dir"""
+    for name in ('main.py', 'db.py'):
+        source = subprocess.run(['git', 'show', f'{ref}:{name}'], cwd=REPO_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        with open(os.path.join(target_dir, name), 'w', encoding='utf-8') as f:
+            f.write(source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenario', choices=SCENARIOS)
+    parser.add_argument('--channels', type=int, default=50000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--results', type=int, default=60000, help='Per-IP results of the test (snapshots)')
+    parser.add_argument('--postgresql', help='libpq-style options of a scratch PostgreSQL database')
+    parser.add_argument('--compare', metavar='OLD[..NEW]',
+                        help='Also run against main.py/db.py of OLD; with NEW, run both revisions instead of the working tree')
+    parser.add_argument('--source-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.source_dir:
+        # Worker: measure the modules in source_dir and print the results as JSON
+        sys.path.insert(0, args.source_dir)
+        os.chdir(args.source_dir)
+        with tempfile.TemporaryDirectory() as work_dir:
+            results = RUNNERS[args.scenario](args, work_dir)
+        print(json.dumps(results))
+        return
+
+    old_ref, _, new_ref = (args.compare or '').partition('..')
+    runs = []
+    for ref in (old_ref, new_ref):
+        if ref:
+            with tempfile.TemporaryDirectory() as ref_dir:
+                checkout(ref, ref_dir)
+                runs.append((ref, run_in(ref_dir, args)))
+    if not new_ref:
+        runs.append(('working tree', run_in(REPO_DIR, args)))
+
+    print(f"{args.scenario}: {args.channels} channels in {args.groups} groups"
+          f"{f', {args.results} test results' if args.scenario == 'snapshots' else ''}"
+          f", {'PostgreSQL' if args.postgresql else 'SQLite'}, best of {REPEAT}")
+    print(f"{'':28}" + ''.join(f'{label[:24]:>26}' for label, _ in runs))
+    for name in runs[-1][1]:
+        cells = []
+        for _, results in runs:
+            value = results.get(name)
+            cells.append(f"{value['ms']:>10.1f} ms {value['mb']:>8.1f} MB" if value else f"{'-':>26}")
+        print(f'{name:28}' + ''.join(f'{cell:>26}' for cell in cells))
+
+
+if __name__ == '__main__':
+    main()